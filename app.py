@@ -1,479 +1,302 @@
-from flask import Flask, request, render_template, send_file, flash
+from flask import Flask, Request, g, request, render_template, send_file, flash, jsonify, url_for
+import io
 import os
-import tempfile
+import threading
+import time
 from werkzeug.utils import secure_filename
-from datetime import datetime, timedelta
-import polars as pl
-from astral.sun import sun
-from astral import LocationInfo
-import pytz
-import airportsdata
+from datetime import datetime
 import argparse
-from functools import lru_cache
+
+from logbook_core import (CREW_POSITIONS, DEFAULT_JOB_DIR, DEFAULT_RESULT_CACHE_PATH, EXPOSITION_CONTENT_TYPE,
+                          SIZE_BUCKETS, JobQueue, MetricsRegistry, RunMetrics, configure_logging, convert_flights,
+                          get_sun_cache, job_status_counts, load_oe_frame)
+
+# Conversion logs and metrics as JSON lines on stderr, unless LOGBOOK_LOG_FORMAT says otherwise
+configure_logging(os.environ.get('LOGBOOK_LOG_FORMAT', 'json'))
+
+class InMemoryRequest(Request):
+    """
+    Request that keeps uploaded files in memory instead of spooling large ones
+    to the temp directory. Uploads are bounded by MAX_CONTENT_LENGTH.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
 
 app = Flask(__name__)
+app.request_class = InMemoryRequest
 app.secret_key = 'logbook-formatter-secret-key'  # Required for flash messages
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # Limit uploads to 16MB
-app.config['UPLOAD_FOLDER'] = tempfile.gettempdir()  # Use system temp directory for uploads
-
-# TODO: Add option to format output for logbook.aero (see format_logbook_aero.py for implementation)
+app.config['JOB_DIR'] = DEFAULT_JOB_DIR  # Job queue database and per-job files
+app.config['JOB_WORKERS'] = int(os.environ['LOGBOOK_JOB_WORKERS']) if os.environ.get('LOGBOOK_JOB_WORKERS') else None
 
 ALLOWED_EXTENSIONS = {'csv'}
 
-# Initialize the airports database
-airports = airportsdata.load('IATA')
-
-# Fallback dictionary for airports not found in the database
-# Define airport metadata: (Name, Timezone, Latitude, Longitude)
-fallback_airport_timezones = {
-    "CAN": ("Guangzhou", "Asia/Shanghai", 23.3924, 113.2988),
-    "BKK": ("Bangkok", "Asia/Bangkok", 13.6900, 100.7501),
-    "PEN": ("Penang", "Asia/Kuala_Lumpur", 5.2976, 100.2760),
-    "TPE": ("Taipei", "Asia/Taipei", 25.0777, 121.2330),
-    "KIX": ("Osaka", "Asia/Tokyo", 34.4347, 135.2440),
+# Output formats offered in the web form, with the download filename prefix for each
+OUTPUT_FORMATS = {
+    'faa': 'FAA_Logbook',
+    'logbook_aero': 'Logbook_Aero',
 }
 
-# FAA logbook column mapping - maps original columns to FAA standard columns
-FAA_COLUMN_MAPPING = {
-    'DEPT_DATE': 'Date',
-    'ORG': 'Route From',
-    'DEST': 'Route To',
-    'EQUIP': 'Aircraft Type',
-    'TAIL': 'Aircraft Ident.',
-    'OUT': 'Out',
-    'OFF': 'Off',
-    'ON': 'On',
-    'IN': 'In',
-    'FLT_HRS': 'Duration',
-    'BLK_HRS': 'Block',
-    'Night Time': 'Night',
-    'Day Landings': 'Day Landings',
-    'Night Landings': 'Night Landings',
-    'XC': 'Cross Country',
-    'Act Inst': 'Actual Instrument',
-    'Approaches': 'Approaches'
-}
+# Background conversion queue, created on first use so importing app starts no processes
+_job_queue = None
 
-# Crew position time distribution
-CREW_POSITION_DISTRIBUTION = {
-    'captain': {
-        'PIC': 1.0,    # 100% as PIC
-        'SIC': 0.0,
-        'Duration': 1.0
-    },
-    'first_officer': {
-        'PIC': 0.0,
-        'SIC': 1.0,    # 100% as SIC
-        'Duration': 1.0
-    },
-    'relief_first_officer': {
-        'PIC': 0.0,
-        'SIC': 0.5,    # 50% as SIC
-        'Duration': 0.5  # 50% of flight time
-    },
-    'relief_captain': {
-        'PIC': 0.5,    # 50% as PIC
-        'SIC': 0.0,
-        'Duration': 0.5  # 50% of flight time
-    }
-}
+# Sun-event lookups reported by finished jobs, which run in their own processes
+_job_sun_lookups = {'table_hit': 0, 'memory_hit': 0, 'miss': 0}
+_job_sun_lock = threading.Lock()
+
+def sun_cache_lookups():
+    """Sun-event lookups of this process and of the jobs it dispatched, by where they were answered."""
+    stats = get_sun_cache().stats()
+    with _job_sun_lock:
+        return {
+            ('table_hit',): stats['table_hits'] + _job_sun_lookups['table_hit'],
+            ('memory_hit',): stats['memory_hits'] + _job_sun_lookups['memory_hit'],
+            ('miss',): stats['misses'] + _job_sun_lookups['miss'],
+        }
+
+def sun_cache_hit_ratio():
+    """Share of sun-event lookups answered by the sun table or the in-memory cache (no sample before any lookup)."""
+    lookups = {key[0]: count for key, count in METRICS.values('logbook_sun_cache_lookups_total').items()}
+    total = sum(lookups.values())
+    return {(): (lookups['table_hit'] + lookups['memory_hit']) / total} if total else {}
+
+def job_counts():
+    """Jobs in the queue database by status (shared by every web process), without starting the queue."""
+    return {(status,): count for status, count in job_status_counts(app.config['JOB_DIR']).items()}
+
+# Metrics served at /metrics; serve.py shares them between its workers
+METRICS = MetricsRegistry()
+REQUEST_LATENCY = METRICS.histogram('logbook_http_request_duration_seconds', 'Request latency by endpoint',
+                                    ['endpoint', 'method'])
+REQUESTS = METRICS.counter('logbook_http_requests_total', 'Requests by endpoint and status code',
+                           ['endpoint', 'method', 'status'])
+UPLOAD_SIZE = METRICS.histogram('logbook_upload_size_bytes', 'Size of accepted uploads', ['file'], SIZE_BUCKETS)
+CONVERSIONS = METRICS.counter('logbook_conversions_total', 'Finished conversions by source and status',
+                              ['source', 'status'])
+ROWS_PROCESSED = METRICS.counter('logbook_rows_processed_total', 'Flight rows converted or quarantined',
+                                 ['source', 'result'])
+STAGE_DURATION = METRICS.histogram('logbook_stage_duration_seconds', 'Time per pipeline stage of a conversion',
+                                   ['source', 'stage'])
+CONVERSIONS_IN_FLIGHT = METRICS.gauge('logbook_conversions_in_flight', 'Conversions running inside /convert requests')
+CONVERSIONS_IN_FLIGHT.set(0)
+METRICS.gauge('logbook_jobs', 'Conversion jobs by status', ['status'], collect=job_counts,
+              per_process=False)
+METRICS.counter('logbook_sun_cache_lookups_total', 'Sunrise/sunset lookups by where they were answered',
+                ['result'], collect=sun_cache_lookups)
+METRICS.gauge('logbook_sun_cache_hit_ratio', 'Share of sunrise/sunset lookups answered without computing',
+              collect=sun_cache_hit_ratio, per_process=False)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def get_airport_data(code):
-    """Get airport data for a given IATA code."""
-    try:
-        airport = airports.get(code)
-        if airport and 'tz' in airport and 'lat' in airport and 'lon' in airport:
-            return (
-                airport.get('name', code), 
-                airport['tz'], 
-                float(airport['lat']), 
-                float(airport['lon'])
-            )
-    except (KeyError, ValueError):
-        pass
-    
-    # Fall back to hard-coded values if airport not found
-    if code in fallback_airport_timezones:
-        return fallback_airport_timezones[code]
-    
-    # If we can't find the airport, return None
-    return None
+def get_job_queue():
+    """Return the process-wide JobQueue."""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue(app.config['JOB_DIR'], workers=app.config['JOB_WORKERS'],
+                              result_cache_path=DEFAULT_RESULT_CACHE_PATH, on_finished=job_finished)
+    return _job_queue
 
-def parse_time(date_str, time_str):
-    """
-    Parse date and time strings into a datetime object.
-    Returns a datetime with UTC timezone.
-    Handles malformed time values gracefully.
-    """
-    try:
-        # Check for malformed or missing date strings
-        if date_str is None:
-            print(f"Warning: Date string is None, using current date")
-            date_str = datetime.now().strftime("%m/%d/%Y")
-            
-        # Check for malformed time strings
-        if time_str is None or time_str == '' or time_str == '.' or not isinstance(time_str, str):
-            # Default to noon for malformed times
-            time_str = "12:00"
-            print(f"Warning: Malformed time value '{time_str}' for date {date_str}, using {time_str} instead.")
-        
-        dt = datetime.strptime(f"{date_str} {time_str}", "%m/%d/%Y %H:%M")
-        return dt.replace(tzinfo=pytz.utc)
-    except ValueError as e:
-        # Print warning and use default time
-        print(f"Warning: Could not parse time '{time_str}' for date {date_str}: {e}")
-        # Return noon on that date as fallback
-        try:
-            dt = datetime.strptime(f"{date_str} 12:00", "%m/%d/%Y %H:%M")
-            return dt.replace(tzinfo=pytz.utc)
-        except ValueError:
-            # If even the date is invalid, use current date and time
-            print(f"Error: Could not parse date '{date_str}'. Using current datetime instead.")
-            return datetime.now(pytz.utc)
-
-@lru_cache(maxsize=128)
-def get_timezone_diff(tz1, tz2):
-    """
-    Calculate the time difference in hours between two timezones.
-    This function is cached to improve performance for repeated calls.
-    """
-    # Create a naive datetime for the pytz calculations
-    now = datetime.now(pytz.utc).replace(tzinfo=None)
-    
-    # Get timezone objects
-    tz1_obj = pytz.timezone(tz1)
-    tz2_obj = pytz.timezone(tz2)
-    
-    # Calculate offsets
-    offset1 = tz1_obj.utcoffset(now).total_seconds() / 3600
-    offset2 = tz2_obj.utcoffset(now).total_seconds() / 3600
-    
-    return abs(offset1 - offset2)
+def record_conversion(summary, source, status):
+    """Count a conversion's rows and observe its stage times (summary from RunMetrics.summary)."""
+    CONVERSIONS.inc(source=source, status=status)
+    ROWS_PROCESSED.inc(summary['counts'].get('rows_valid', 0), source=source, result='valid')
+    ROWS_PROCESSED.inc(summary['counts'].get('rows_quarantined', 0), source=source, result='quarantined')
+    for stage, seconds in summary['stages'].items():
+        STAGE_DURATION.observe(seconds, source=source, stage=stage)
 
-@lru_cache(maxsize=256)
-def get_sunrise_sunset(airport_code, date):
+def job_finished(result):
+    """Record a finished job's metrics (called by the JobQueue)."""
+    record_conversion(result, 'job', result['status'])
+    sun = result['caches']['sun']
+    with _job_sun_lock:
+        _job_sun_lookups['table_hit'] += sun['table_hits']
+        _job_sun_lookups['memory_hit'] += sun['memory_hits']
+        _job_sun_lookups['miss'] += sun['misses']
+
+def upload_size(upload):
+    """Size in bytes of an uploaded file, leaving its stream where it was."""
+    stream = upload.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+def read_upload():
     """
-    Get sunrise and sunset times for an airport on a specific date.
-    Returns UTC-timezone aware datetimes.
+    Validate the uploaded files and form fields of the current request.
+    Returns an (upload, error) tuple; upload is a dict of flights_file, oe_file (or None),
+    crew_position and output_format, or None when the upload was rejected.
     """
-    airport_data = get_airport_data(airport_code)
-    if not airport_data:
-        return None, None
-    
-    name, tzname, lat, lon = airport_data
-    location = LocationInfo(name=name, region="", timezone=tzname, latitude=lat, longitude=lon)
-    s = sun(location.observer, date=date.date(), tzinfo=pytz.timezone(tzname))
-    return s['sunrise'].astimezone(pytz.utc), s['sunset'].astimezone(pytz.utc)
+    flights_file = request.files.get('flights_file')
+    if flights_file is None or flights_file.filename == '':
+        return None, 'No flights file selected'
+    if not allowed_file(flights_file.filename):
+        return None, 'Invalid file type. Please upload CSV files.'
 
-def safe_float_conversion(value):
+    oe_file = request.files.get('oe_file')
+    if oe_file is not None and oe_file.filename == '':
+        oe_file = None
+    if oe_file is not None and not allowed_file(oe_file.filename):
+        return None, 'Invalid OE file type. Please upload CSV files.'
+
+    crew_position = request.form.get('crew_position', 'captain')
+    output_format = request.form.get('output_format', 'faa')
+    if crew_position not in CREW_POSITIONS:
+        return None, f"Invalid crew position: {crew_position}"
+    if output_format not in OUTPUT_FORMATS:
+        return None, f"Unknown output format: {output_format}"
+
+    UPLOAD_SIZE.observe(upload_size(flights_file), file='flights')
+    if oe_file is not None:
+        UPLOAD_SIZE.observe(upload_size(oe_file), file='oe')
+
+    return {'flights_file': flights_file, 'oe_file': oe_file,
+            'crew_position': crew_position, 'output_format': output_format}, None
+
+def submit_upload():
     """
-    Safely convert a value to float, returning 0.0 if conversion fails.
-    Handles None, empty strings, '.', and other invalid values.
+    Queue a conversion job for the upload in the current request.
+    Returns a (job_id, error) tuple; job_id is None when the upload was rejected.
     """
-    try:
-        # Check for invalid values
-        if value is None or value == '' or value == '.':
-            return 0.0
-        return float(value)
-    except (ValueError, TypeError):
-        return 0.0
-
-def format_tail_number(tail_number):
+    upload, error = read_upload()
+    if error:
+        return None, error
+    job_id = get_job_queue().submit(upload['flights_file'], upload['crew_position'], upload['output_format'],
+                                    upload['oe_file'])
+    return job_id, None
+
+def job_view(job):
+    """Job status as returned by the API, with links to poll and download."""
+    view = dict(job, status_url=url_for('job_status', job_id=job['id']))
+    if job['status'] == 'done':
+        view['download_url'] = url_for('job_download', job_id=job['id'])
+    return view
+
+def process_flight_data(flights_csv, output_csv, crew_position, oe_file=None, output_format='faa'):
     """
-    Convert a numeric tail number to a full aircraft ID in the format of NXXXFE.
-    Example: 115 -> N115FE
+    Web-friendly version of the flight data processing function.
+    Input, OE and output files may be paths or in-memory file objects.
+    Stage times and row counts are recorded in the /metrics registry. The
+    result cache is not used, so a request reads and writes nothing on disk;
+    jobs use it instead.
     """
-    try:
-        # If the tail number is numeric, format it as N{number}FE
-        if str(tail_number).isdigit():
-            return f"N{tail_number}FE"
-        # If it's already in the right format or not numeric, return as is
-        return str(tail_number)
-    except:
-        # If any error occurs, return the original value
-        return str(tail_number)
-
-def process_flight_data(flights_csv, output_csv, crew_position, oe_file=None):
-    """Web-friendly version of the flight data processing function."""
     
     # Validate crew position
-    if crew_position not in CREW_POSITION_DISTRIBUTION:
-        # If auto is specified but we don't have OE data, default to captain
-        if crew_position == 'auto':
-            crew_position = 'captain'
-        else:
-            raise ValueError(f"Invalid crew position: {crew_position}")
-    
-    # Load flight data
-    df = pl.read_csv(flights_csv)
-    rows_processed = len(df)
-    
-    # Format tail numbers
-    df = df.with_columns(pl.col("TAIL").map_elements(format_tail_number, return_dtype=pl.Utf8).alias("TAIL"))
-    
-    # Process each flight for night time, landings, etc.
-    results = []
-    
-    for row in df.iter_rows(named=True):
-        try:
-            # Get flight details - with validation
-            origin = row.get('ORG', '')
-            destination = row.get('DEST', '')
-            date_str = row.get('DEPT_DATE')
-            
-            # Skip rows with missing critical data
-            if not origin or not destination or not date_str:
-                print(f"Warning: Skipping row with missing critical data: ORG={origin}, DEST={destination}, DATE={date_str}")
-                continue
-                
-            try:
-                date = datetime.strptime(date_str, "%m/%d/%Y")
-            except (ValueError, TypeError):
-                print(f"Warning: Invalid date format '{date_str}', using current date")
-                date = datetime.now()
-            
-            # Parse times with better error handling
-            off_time = parse_time(date_str, row.get('OFF'))
-            on_time = parse_time(date_str, row.get('ON'))
-            
-            # Calculate flight times
-            flt_time = safe_float_conversion(row.get('FLT_HRS', 0))
-            blk_time = safe_float_conversion(row.get('BLK_HRS', 0))
-            
-            # Calculate night time
-            night_time = estimate_night_time(row, off_time, on_time, flt_time, origin, destination, date)
-            
-            # Calculate instrument time (50% of night time)
-            act_inst = night_time * 0.5
-            
-            # Process landings
-            day_landings, night_landings = process_landings(row, destination, off_time, on_time)
-            
-            # Record approaches
-            approaches = ""
-            if 'LANDING' in row and (row['LANDING'] == 1 or row['LANDING'] == '1'):
-                approaches = f"1;{destination}"
-            
-            # Determine crew time based on position
-            distribution = CREW_POSITION_DISTRIBUTION[crew_position]
-            pic_time = blk_time * distribution['PIC']
-            sic_time = blk_time * distribution['SIC']
-            duration = flt_time * distribution['Duration']
-            
-            # Create result row
-            result_row = dict(row)
-            result_row['Night Time'] = night_time
-            result_row['Act Inst'] = act_inst
-            result_row['Day Landings'] = day_landings
-            result_row['Night Landings'] = night_landings
-            result_row['Approaches'] = approaches
-            result_row['PIC'] = pic_time
-            result_row['SIC'] = sic_time
-            result_row['XC'] = blk_time
-            
-            results.append(result_row)
-            
-        except Exception as e:
-            # If a row fails to process, log it and continue with the next row
-            print(f"Warning: Error processing row: {e}")
-            continue
-    
-    if not results:
-        raise ValueError("No valid flight data could be processed")
-    
-    # Convert back to DataFrame
-    result_df = pl.DataFrame(results)
-    
-    # Rename columns to FAA format
-    for old_col, new_col in FAA_COLUMN_MAPPING.items():
-        if old_col in result_df.columns:
-            result_df = result_df.rename({old_col: new_col})
-    
-    # Format float columns with 1 decimal place
-    float_cols = ['Duration', 'Block', 'PIC', 'SIC', 'Cross Country', 'Night', 'Actual Instrument']
-    for col in float_cols:
-        if col in result_df.columns:
-            result_df = result_df.with_columns(pl.col(col).map_elements(
-                lambda x: round(safe_float_conversion(x), 1), 
-                return_dtype=pl.Float64
-            ).alias(col))
-    
-    # Write to CSV
-    result_df.write_csv(output_csv)
-    
-    return rows_processed
+    if crew_position not in CREW_POSITIONS:
+        raise ValueError(f"Invalid crew position: {crew_position}")
 
-def estimate_night_time(row, off_time, on_time, flt_time, origin, destination, date):
-    """Estimate night flying time."""
-    origin_data = get_airport_data(origin)
-    dest_data = get_airport_data(destination)
-    
-    if not origin_data or not dest_data:
-        return 0.0
-    
-    tz_diff = get_timezone_diff(origin_data[1], dest_data[1])
-    
-    if tz_diff <= 4:
-        # Simple rule based on destination
-        sunrise, sunset = get_sunrise_sunset(destination, date)
-        if not sunrise or not sunset:
-            return 0.0
-        
-        if off_time >= sunset or on_time <= sunrise:
-            return round(flt_time, 2)
-        elif (off_time < sunset < on_time) or (off_time < sunrise < on_time):
-            return round(flt_time * 0.5, 2)
-        else:
-            return 0.0
-    else:
-        # More complex calculation for long flights
-        increment_minutes = 10
-        total_night_minutes = 0
-        segments = int((on_time - off_time).total_seconds() / (increment_minutes * 60))
-        
-        if segments <= 0:
-            return 0.0
-            
-        for i in range(segments):
-            progress = i / segments
-            current_time = off_time + (on_time - off_time) * progress
-            
-            # Interpolate position
-            lat = origin_data[2] + progress * (dest_data[2] - origin_data[2])
-            lon = origin_data[3] + progress * (dest_data[3] - origin_data[3])
-            
-            try:
-                location = LocationInfo(latitude=lat, longitude=lon)
-                s = sun(location.observer, date=current_time.date(), tzinfo=pytz.timezone(dest_data[1]))
-                if current_time < s['sunrise'].astimezone(pytz.utc) or current_time > s['sunset'].astimezone(pytz.utc):
-                    total_night_minutes += increment_minutes
-            except Exception as e:
-                # Skip this segment if there's an error
-                print(f"Warning: Error calculating sun position at lat={lat}, lon={lon}: {e}")
-        
-        night_hours = round(total_night_minutes / 60.0, 2)
-        return min(night_hours, flt_time)
-
-def is_night_landing(landing_time, destination):
-    """Determine if landing occurred during night time."""
-    airport_data = get_airport_data(destination)
-    if not airport_data:
-        return False
-    
-    name, tzname, lat, lon = airport_data
-    location = LocationInfo(name=name, region="", timezone=tzname, latitude=lat, longitude=lon)
-    
-    s = sun(location.observer, date=landing_time.date(), tzinfo=pytz.timezone(tzname))
-    sunrise = s['sunrise'].astimezone(pytz.utc)
-    sunset = s['sunset'].astimezone(pytz.utc)
-    
-    # Civil twilight is 30 minutes after sunset
-    civil_twilight = sunset + timedelta(minutes=30)
-    
-    return landing_time >= civil_twilight or landing_time <= sunrise
-
-def process_landings(row, destination, off_time, on_time):
-    """Process landings to determine if day or night."""
-    # Check if landing was performed
-    performed_landing = False
-    try:
-        landing_val = row.get('LANDING', 0)
-        if landing_val == 1 or landing_val == '1':
-            performed_landing = True
-    except:
-        performed_landing = False
-    
-    if not performed_landing:
-        return 0, 0
+    # Load OE data if provided; 'auto' takes each leg's position from it
+    oe_data = load_oe_frame(oe_file) if oe_file is not None else None
+    if crew_position == 'auto' and oe_data is None:
+        crew_position = 'captain'  # Fallback to captain if auto requested but no OE data
     
+    run_metrics = RunMetrics()
+    status = 'failed'
+    CONVERSIONS_IN_FLIGHT.inc()
     try:
-        landing_time = on_time
-        if is_night_landing(landing_time, destination):
-            return 0, 1  # Night landing
-        else:
-            return 1, 0  # Day landing
-    except Exception as e:
-        print(f"Warning: Error determining landing type: {e}")
-        return 1, 0  # Default to day landing
+        rows = convert_flights(flights_csv, output_csv, crew_position, oe_data, output_format=output_format,
+                               result_cache=None, metrics=run_metrics)
+        status = 'done'
+        return rows
+    finally:
+        CONVERSIONS_IN_FLIGHT.dec()
+        record_conversion(run_metrics.summary(), 'convert', status)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    """Observe the latency and count the status of every request."""
+    endpoint = request.endpoint or 'unmatched'
+    started = g.get('request_started')
+    if started is not None:
+        REQUEST_LATENCY.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    return response
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
-        # Check if flight file is present
-        if 'flights_file' not in request.files:
-            flash('No flights file selected', 'error')
-            return render_template('index.html')
-        
-        flights_file = request.files['flights_file']
-        
-        if flights_file.filename == '':
-            flash('No flights file selected', 'error')
-            return render_template('index.html')
-            
-        if not allowed_file(flights_file.filename):
-            flash('Invalid file type. Please upload CSV files.', 'error')
+        # Queue the conversion; the page polls the job and downloads the result when it is done
+        job_id, error = submit_upload()
+        if error:
+            flash(error, 'error')
             return render_template('index.html')
-        
-        # Get crew position
-        crew_position = request.form.get('crew_position', 'captain')
-        
-        # Create temporary filenames
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        flights_filename = f"flights_{timestamp}.csv"
-        oe_filename = None
-        output_filename = f"FAA_Logbook_{timestamp}.csv"
-        
-        # Save uploaded flights file
-        flights_path = os.path.join(app.config['UPLOAD_FOLDER'], flights_filename)
-        flights_file.save(flights_path)
-        
-        # Check if OE data was uploaded
-        oe_path = None
-        if 'oe_file' in request.files and request.files['oe_file'].filename != '':
-            oe_file = request.files['oe_file']
-            if allowed_file(oe_file.filename):
-                oe_filename = f"oe_{timestamp}.csv"
-                oe_path = os.path.join(app.config['UPLOAD_FOLDER'], oe_filename)
-                oe_file.save(oe_path)
-            else:
-                os.unlink(flights_path)
-                flash('Invalid OE file type. Please upload CSV files.', 'error')
-                return render_template('index.html')
-        
-        # Process the files
-        output_path = os.path.join(app.config['UPLOAD_FOLDER'], output_filename)
-        
-        try:
-            # Call the processing function
-            process_flight_data(flights_path, output_path, crew_position, oe_path)
-            
-            # Send the processed file to the user
-            return send_file(output_path, as_attachment=True, 
-                            download_name=f"FAA_Logbook_{datetime.now().strftime('%Y-%m-%d')}.csv")
-            
-        except Exception as e:
-            flash(f"Error processing files: {str(e)}", 'error')
-            return render_template('index.html')
-        finally:
-            # Clean up temporary files
-            if os.path.exists(flights_path):
-                os.unlink(flights_path)
-            if oe_path and os.path.exists(oe_path):
-                os.unlink(oe_path)
-            if os.path.exists(output_path):
-                os.unlink(output_path)
+        return render_template('index.html', job_id=job_id)
         
     return render_template('index.html')
 
+@app.route('/convert', methods=['POST'])
+def convert():
+    """
+    Convert an upload within the request and stream the logbook back.
+
+    The upload is parsed from memory and the output is built in a memory buffer,
+    so nothing touches the disk. Suited to single downloads; use /jobs for
+    multi-year logbooks.
+    """
+    upload, error = read_upload()
+    if error:
+        return jsonify(error=error), 400
+
+    output = io.BytesIO()
+    oe_file = upload['oe_file'].stream if upload['oe_file'] is not None else None
+    try:
+        process_flight_data(upload['flights_file'].stream, output, upload['crew_position'], oe_file,
+                            upload['output_format'])
+    except Exception as e:
+        return jsonify(error=f"Error processing files: {e}"), 400
+
+    output.seek(0)
+    return send_file(output, as_attachment=True, mimetype='text/csv',
+                     download_name=f"{OUTPUT_FORMATS[upload['output_format']]}_{datetime.now().strftime('%Y-%m-%d')}.csv")
+
+@app.route('/metrics')
+def metrics():
+    """Metrics in the Prometheus text exposition format (of every worker under serve.py)."""
+    return app.response_class(METRICS.render(), content_type=EXPOSITION_CONTENT_TYPE)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Queue a conversion of the uploaded files and return the job id (202)."""
+    job_id, error = submit_upload()
+    if error:
+        return jsonify(error=error), 400
+    return jsonify(job_view(get_job_queue().get(job_id))), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status of a conversion job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify(error='Unknown job'), 404
+    return jsonify(job_view(job))
+
+@app.route('/jobs/<job_id>/download')
+def job_download(job_id):
+    """Download the output of a finished job."""
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        return jsonify(error='Unknown job'), 404
+    if job['status'] != 'done':
+        return jsonify(dict(job_view(job), error=f"Job is {job['status']}")), 409
+    return send_file(queue.output_path(job_id), as_attachment=True, mimetype='text/csv',
+                     download_name=f"{OUTPUT_FORMATS[job['output_format']]}_{datetime.now().strftime('%Y-%m-%d')}.csv")
+
 if __name__ == '__main__':
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Run the Logbook Formatter web application')
     parser.add_argument('--port', type=int, default=5000, help='Port to run the web server on')
     parser.add_argument('--host', type=str, default='127.0.0.1', help='Host to run the web server on')
+    parser.add_argument('--debug', action='store_true', default=os.environ.get('FLASK_DEBUG') == '1',
+                        help="Run with Flask's debugger and reloader (never on a public host; default: FLASK_DEBUG=1)")
     args = parser.parse_args()
     
     # Run the app
-    app.run(debug=True, host=args.host, port=args.port) 
\ No newline at end of file
+    app.run(debug=args.debug, host=args.host, port=args.port) 
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Generate synthetic Flightmart downloads for benchmarking.
+
+The logbooks mix short domestic legs, long-haul legs, polar routes and
+routes crossing the antimeridian, spread over several years, with ON/IN
+times that roll past midnight UTC like real downloads. A matching OE file
+covers a share of the legs.
+
+Usage:
+    python benchmarks/generate_logbook.py --legs 10000 --output DWNLD_1000000.csv --oe-output OE_1000000.csv
+"""
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+
+# (ORG, DEST, block hours, equipment, category)
+ROUTES = [
+    # Domestic hub-and-spoke
+    ('MEM', 'IND', 1.3, 'B757', 'short'),
+    ('MEM', 'OAK', 4.4, 'B767', 'short'),
+    ('MEM', 'EWR', 2.3, 'A300', 'short'),
+    ('IND', 'MEM', 1.4, 'B757', 'short'),
+    ('OAK', 'MEM', 3.9, 'B767', 'short'),
+    ('EWR', 'MEM', 2.6, 'A300', 'short'),
+    ('MEM', 'MIA', 2.0, 'B757', 'short'),
+    ('MIA', 'MEM', 2.2, 'B757', 'short'),
+    # Asia shuttles, including the fallback airports
+    ('CAN', 'BKK', 2.7, 'B767', 'short'),
+    ('BKK', 'PEN', 1.8, 'B767', 'short'),
+    ('PEN', 'CAN', 3.9, 'B767', 'short'),
+    ('TPE', 'KIX', 2.6, 'MD11', 'short'),
+    # Long-haul
+    ('MEM', 'CDG', 8.7, 'B777', 'long'),
+    ('CDG', 'DXB', 6.7, 'MD11', 'long'),
+    ('DXB', 'HKG', 7.8, 'B777', 'long'),
+    ('CDG', 'MEM', 9.8, 'B777', 'long'),
+    # Polar
+    ('ANC', 'CGN', 9.5, 'MD11', 'polar'),
+    ('CGN', 'ANC', 10.0, 'MD11', 'polar'),
+    ('HKG', 'ORD', 14.5, 'B777', 'polar'),
+    ('ANC', 'HKG', 15.0, 'B777', 'polar'),
+    # Antimeridian
+    ('HKG', 'ANC', 9.8, 'B777', 'antimeridian'),
+    ('ANC', 'NRT', 7.5, 'MD11', 'antimeridian'),
+    ('LAX', 'SYD', 15.2, 'B777', 'antimeridian'),
+    ('SYD', 'LAX', 13.6, 'B777', 'antimeridian'),
+    ('ICN', 'ANC', 8.3, 'MD11', 'antimeridian'),
+]
+
+FLIGHT_COLUMNS = ['FLIGHT', 'DEPT_DATE', 'EQUIP', 'TAIL', 'ORG', 'DEST', 'OUT', 'OFF', 'ON', 'IN',
+                  'FLT_HRS', 'BLK_HRS', 'LANDING']
+
+OE_COLUMNS = ['FLIGHT', 'FLT_DT', 'ORG', 'DEST', 'FLEET', 'SEAT', 'ROLE', 'LANDING',
+              'PIC_OE', 'SIC_OE', 'PIC_RFO_OE', 'SIC_RFO_OE', 'EMPNUM']
+
+OE_SEATS = ['CAPT', 'FO', 'RFO', 'RC']
+
+
+def _hhmm(minutes):
+    """Minutes after midnight as H:MM, wrapped to one day like Flightmart times."""
+    minutes = int(minutes) % (24 * 60)
+    return f"{minutes // 60}:{minutes % 60:02d}"
+
+
+def generate_legs(legs, start_year=2021, years=4, seed=1):
+    """
+    Generate synthetic flight legs.
+
+    Returns:
+        List of row dicts with FLIGHT_COLUMNS keys
+    """
+    rng = random.Random(seed)
+    first_day = date(start_year, 1, 1)
+    span = (date(start_year + years, 1, 1) - first_day).days
+
+    rows = []
+    for _ in range(legs):
+        org, dest, block, equip, _category = rng.choice(ROUTES)
+        day = first_day + timedelta(days=rng.randrange(span))
+        block = round(block * rng.uniform(0.92, 1.08), 2)
+        taxi_out = rng.randint(8, 25)
+        taxi_in = rng.randint(5, 15)
+        flight = max(round(block - (taxi_out + taxi_in) / 60.0, 2), 0.3)
+
+        out_min = rng.randrange(24 * 60)
+        off_min = out_min + taxi_out
+        on_min = off_min + round(flight * 60)
+        in_min = on_min + taxi_in
+
+        rows.append({
+            'FLIGHT': str(rng.randint(1, 9999)),
+            'DEPT_DATE': day.strftime('%m/%d/%Y'),
+            'EQUIP': equip,
+            'TAIL': str(rng.randint(100, 999)),
+            'ORG': org,
+            'DEST': dest,
+            'OUT': _hhmm(out_min),
+            'OFF': _hhmm(off_min),
+            'ON': _hhmm(on_min),
+            'IN': _hhmm(in_min),
+            'FLT_HRS': f"{flight:.2f}",
+            'BLK_HRS': f"{block:.2f}",
+            'LANDING': '1' if rng.random() < 0.5 else '0',
+        })
+    return rows
+
+
+def generate_oe(rows, share=0.1, empnum='1000000', seed=2):
+    """
+    Generate OE rows for a share of the given legs.
+
+    Returns:
+        List of row dicts with OE_COLUMNS keys
+    """
+    rng = random.Random(seed)
+    oe_rows = []
+    for row in rows:
+        if rng.random() >= share:
+            continue
+        month, day, year = row['DEPT_DATE'].split('/')
+        seat = rng.choice(OE_SEATS)
+        block = row['BLK_HRS']
+        oe_rows.append({
+            'FLIGHT': row['FLIGHT'],
+            'FLT_DT': date(int(year), int(month), int(day)).strftime('%d%b%Y').upper(),
+            'ORG': row['ORG'],
+            'DEST': row['DEST'],
+            'FLEET': row['EQUIP'],
+            'SEAT': seat,
+            'ROLE': 'PIC' if seat in ('CAPT', 'RC') else 'SIC',
+            'LANDING': row['LANDING'],
+            'PIC_OE': block if seat == 'CAPT' else '0.00',
+            'SIC_OE': block if seat == 'FO' else '0.00',
+            'PIC_RFO_OE': f"{float(block) / 2:.2f}" if seat == 'RC' else '0.00',
+            'SIC_RFO_OE': f"{float(block) / 2:.2f}" if seat == 'RFO' else '0.00',
+            'EMPNUM': empnum,
+        })
+    return oe_rows
+
+
+def write_csv(path, columns, rows):
+    """Write row dicts to a CSV file."""
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic Flightmart download (and OE file) for benchmarking.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--legs', type=int, default=10000, help='Number of flight legs')
+    parser.add_argument('--output', type=str, default='DWNLD_1000000.csv', help='Flight data CSV to write')
+    parser.add_argument('--oe-output', type=str, help='Optional OE CSV to write')
+    parser.add_argument('--start-year', type=int, default=2021, help='First year of the logbook')
+    parser.add_argument('--years', type=int, default=4, help='Number of years covered')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    rows = generate_legs(args.legs, args.start_year, args.years, args.seed)
+    write_csv(args.output, FLIGHT_COLUMNS, rows)
+    print(f"Wrote {len(rows)} legs to {args.output}")
+    if args.oe_output:
+        oe_rows = generate_oe(rows)
+        write_csv(args.oe_output, OE_COLUMNS, oe_rows)
+        print(f"Wrote {len(oe_rows)} OE rows to {args.oe_output}")
+
+
+if __name__ == "__main__":
+    main()
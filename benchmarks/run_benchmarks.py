@@ -0,0 +1,221 @@
+"""
+Benchmark the converters on synthetic logbooks.
+
+For each logbook size this times the three entry points end to end
+(format.py main, format_logbook_aero.main and app.process_flight_data) and
+the pipeline stages separately (parse, night, landings, crew, write). Every
+measurement runs in a fresh process so peak RSS and cold-start costs are
+reported per measurement. Results are written as JSON; pass an earlier
+result file with --compare to print the change against it.
+
+Usage:
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/before.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_logbook import FLIGHT_COLUMNS, OE_COLUMNS, generate_legs, generate_oe, write_csv  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+ENTRY_POINTS = ['format.main', 'format_logbook_aero.main', 'app.process_flight_data']
+
+STAGES = ['parse', 'night', 'landings', 'crew', 'write']
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    import resource
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+@contextmanager
+def timed(timings, name):
+    """Record the wall time of a block in timings[name]."""
+    started = time.perf_counter()
+    yield
+    timings[name] = round(time.perf_counter() - started, 4)
+
+
+def _run_entry_point(entry_point, flights_csv, oe_csv, output_csv, quiet):
+    """Run one entry point end to end with an empty result cache. Executed in a fresh process."""
+    os.environ['LOGBOOK_RESULT_CACHE'] = os.path.splitext(output_csv)[0] + '_results.sqlite'
+    os.environ['LOGBOOK_LOG_FORMAT'] = 'text'  # Logs go to stdout, which quiet mode discards
+    started = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull if quiet else sys.stdout):
+        if entry_point == 'app.process_flight_data':
+            import app
+            app.process_flight_data(flights_csv, output_csv, 'first_officer', oe_csv)
+        else:
+            module_name = entry_point.split('.')[0]
+            sys.argv = [f"{module_name}.py", '--flights', flights_csv, '--output', output_csv,
+                        '--position', 'auto', '--oe-data', oe_csv]
+            module = __import__(module_name)
+            module.main()
+    return {'seconds': round(time.perf_counter() - started, 4), 'peak_rss_mb': peak_rss_mb()}
+
+
+def _run_stages(flights_csv, oe_csv, output_csv, quiet):
+    """Time each pipeline stage on its own. Executed in a fresh process."""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull if quiet else sys.stdout):
+        return _time_stages(flights_csv, oe_csv, output_csv)
+
+
+def _time_stages(flights_csv, oe_csv, output_csv):
+    """Run parse, night, landings, crew and write one after another, timing each."""
+    import polars as pl
+
+    from logbook_core import (build_timeline, classify_operations, crew_time_columns, enrich_flights,
+                              estimate_night_time, flight_time_arrays, flight_time_columns, join_oe,
+                              load_flights, load_oe_frame, to_faa)
+
+    timings = {}
+    with timed(timings, 'parse'):
+        df = load_flights(flights_csv)
+        df = df.with_columns(
+            pl.col('FLT_HRS').cast(pl.Float64, strict=False).fill_null(0.0),
+            pl.col('BLK_HRS').cast(pl.Float64, strict=False).fill_null(0.0),
+            pl.col('LANDING').cast(pl.Int64, strict=False).fill_null(0),
+            *flight_time_columns(df.columns),
+        )
+        df = build_timeline(df)
+        date_s, off_s, on_s = flight_time_arrays(df)
+
+    with timed(timings, 'night'):
+        estimate_night_time(df, off_s, on_s, date_s)
+
+    with timed(timings, 'landings'):
+        performed = df['LANDING'].to_numpy() == 1
+        classify_operations(performed, off_s, on_s, df['ORG'].to_list(), df['DEST'].to_list())
+
+    with timed(timings, 'crew'):
+        oe_data = load_oe_frame(oe_csv)
+        join_oe(df.lazy(), oe_data).with_columns(crew_time_columns('auto')).collect()
+
+    enriched = enrich_flights(load_flights(flights_csv), 'auto', oe_data)
+    with timed(timings, 'write'):
+        to_faa(enriched).write_csv(output_csv)
+
+    return {'stages': timings, 'peak_rss_mb': peak_rss_mb()}
+
+
+def _in_fresh_process(func, *args):
+    """Run func(*args) in a newly spawned interpreter and return its result."""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(func, args)
+
+
+def benchmark_size(legs, work_dir, quiet=True):
+    """
+    Generate a logbook of the given size and run every measurement on it.
+
+    Returns:
+        Result dictionary for this size
+    """
+    flights_csv = os.path.join(work_dir, f"DWNLD_{legs}.csv")
+    oe_csv = os.path.join(work_dir, f"OE_{legs}.csv")
+    rows = generate_legs(legs)
+    write_csv(flights_csv, FLIGHT_COLUMNS, rows)
+    write_csv(oe_csv, OE_COLUMNS, generate_oe(rows))
+
+    result = {'legs': legs, 'end_to_end': {}}
+    for entry_point in ENTRY_POINTS:
+        output_csv = os.path.join(work_dir, f"{entry_point}_{legs}.csv")
+        measured = _in_fresh_process(_run_entry_point, entry_point, flights_csv, oe_csv, output_csv, quiet)
+        measured['legs_per_second'] = round(legs / measured['seconds'], 1) if measured['seconds'] else None
+        result['end_to_end'][entry_point] = measured
+        print(f"  {entry_point}: {measured['seconds']}s, {measured['legs_per_second']} legs/s, "
+              f"peak RSS {measured['peak_rss_mb']} MB")
+
+    stages_csv = os.path.join(work_dir, f"stages_{legs}.csv")
+    stages = _in_fresh_process(_run_stages, flights_csv, oe_csv, stages_csv, quiet)
+    result['stages'] = stages['stages']
+    result['stages_peak_rss_mb'] = stages['peak_rss_mb']
+    print("  stages: " + ", ".join(f"{name} {stages['stages'][name]}s" for name in STAGES))
+    return result
+
+
+def compare(current, baseline):
+    """Print the end-to-end and stage time ratios of current vs. baseline results."""
+    previous = {r['legs']: r for r in baseline['results']}
+    print(f"\nCompared with {baseline.get('created', 'baseline')} (ratio < 1 is faster):")
+    for result in current['results']:
+        before = previous.get(result['legs'])
+        if not before:
+            continue
+        for entry_point, measured in result['end_to_end'].items():
+            old = before['end_to_end'].get(entry_point)
+            if old and old['seconds']:
+                print(f"  {result['legs']:>7} legs {entry_point}: {measured['seconds'] / old['seconds']:.2f}x time, "
+                      f"{measured['peak_rss_mb'] - old['peak_rss_mb']:+.1f} MB peak RSS")
+        for stage, seconds in result['stages'].items():
+            old = before['stages'].get(stage)
+            if old:
+                print(f"  {result['legs']:>7} legs stage {stage}: {seconds / old:.2f}x time")
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Benchmark the logbook converters on synthetic logbooks.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Logbook sizes in legs')
+    parser.add_argument('--output', type=str,
+                        default=os.path.join(REPO_ROOT, 'benchmarks', 'results',
+                                             f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"),
+                        help='JSON file for the results')
+    parser.add_argument('--compare', type=str, help='Earlier result JSON to compare against')
+    parser.add_argument('--verbose', action='store_true', help='Show the converters\' own output')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    import numpy
+    import polars
+
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'polars': polars.__version__,
+        'numpy': numpy.__version__,
+        'results': [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for legs in args.sizes:
+            print(f"{legs} legs:")
+            report['results'].append(benchmark_size(legs, work_dir, quiet=not args.verbose))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
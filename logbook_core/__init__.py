@@ -0,0 +1,37 @@
+"""
+Shared computation core for the logbook converters.
+
+format.py (FAA CSV), format_logbook_aero.py (logbook.aero CSV) and app.py
+(Flask) all run the same polars pipeline from this package, so airport data,
+sun tables and caches are loaded once per process.
+"""
+from .airports import (FALLBACK_AIRPORTS, AirportTable, build_airport_table, get_airport_data, get_airport_table,
+                       get_timezone_diff, known_airport_codes, lookup_airports, timezone_diffs, timezone_transitions,
+                       utc_offsets)
+from .batch import find_batch_jobs, run_batch
+from .crew import (CREW_POSITION_DISTRIBUTION, CREW_POSITIONS, OE_COLUMNS, OE_SEATS, crew_time_columns,
+                   flight_key_expr, join_oe, load_oe_data, load_oe_frame, oe_frame, oe_match_report)
+from .daylight import get_sunrise_sunset, is_night_landing, is_night_time
+from .formats import (FAA_COLUMN_MAPPING, LOGBOOK_AERO_COLUMN_MAPPING, WRITERS, column_names, get_writer,
+                      parse_output_spec, register_writer, source_columns, to_faa, to_logbook_aero, write_outputs)
+from .jobs import DEFAULT_JOB_DIR, JOB_STATUSES, JobQueue, job_status_counts, run_job
+from .night import NIGHT_MODES, estimate_night_time_batch
+from .parsing import DATE_FORMATS, parse_date_expr, parse_date_flexible, parse_time_expr, parse_utc_datetime_expr
+from .pipeline import (ENRICHED_COLUMNS, LOGBOOK_KEY_COLUMNS, LOGBOOK_KEY_FALLBACK, TIME_COLUMNS, append_flights,
+                       build_timeline, classify_day_night, classify_operations, convert_flights, enrich_flights,
+                       estimate_night_time, flight_time_arrays, flight_time_columns, load_flights, logbook_key_expr,
+                       night_flags, quarantined_flights, scan_flights, scan_logbook, valid_flights,
+                       validate_flights)
+from .prometheus import (DURATION_BUCKETS, EXPOSITION_CONTENT_TYPE, SIZE_BUCKETS, Counter, Gauge, Histogram,
+                         MetricsRegistry)
+from .result_cache import (DEFAULT_RESULT_CACHE_PATH, ENGINE_VERSION, ResultCache, get_result_cache,
+                           open_result_cache, row_keys)
+from .route import RouteTracks, great_circle_points, route_waypoints
+from .solar import solar_elevation, sunrise_sunset
+from .sun_table import (SUN_CACHE_SIZE, SunEventCache, SunTable, build_sun_table, get_sun_cache, get_sun_table,
+                        sun_events, sun_events_many)
+from .telemetry import (LOG_FORMATS, STAGES, JsonFormatter, RunMetrics, TextFormatter, configure_logging, get_logger,
+                        log_event, warn)
+from .validation import (CRITICAL_COLUMNS, OPTIONAL_COLUMNS, QUARANTINE_REASON, REQUIRED_COLUMNS, VALIDATION_REASONS,
+                         default_quarantine_path, reason_counts, validation_reasons, with_required_columns,
+                         write_quarantine)
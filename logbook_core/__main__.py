@@ -0,0 +1,59 @@
+"""
+Maintenance commands for logbook_core.
+
+Usage:
+    python -m logbook_core build-airport-table
+    python -m logbook_core build-sun-table --start-year 2020 --end-year 2026
+"""
+import argparse
+from datetime import datetime
+
+from .airports import DEFAULT_AIRPORT_TABLE_PATH, build_airport_table
+from .sun_table import DEFAULT_TABLE_PATH, build_sun_table
+
+
+def parse_args():
+    """Parse command line arguments."""
+    this_year = datetime.now().year
+    parser = argparse.ArgumentParser(
+        prog='python -m logbook_core',
+        description='Build the lookup tables used by the logbook converters.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    airport_parser = commands.add_parser(
+        'build-airport-table',
+        help='Write the compact memory-mapped airport table',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    airport_parser.add_argument('--output', type=str, default=DEFAULT_AIRPORT_TABLE_PATH,
+                                help='Output path without extension')
+
+    sun_parser = commands.add_parser(
+        'build-sun-table',
+        help='Precompute sunrise, sunset and civil twilight for every airport',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    sun_parser.add_argument('--start-year', type=int, default=this_year - 2, help='First year in the table')
+    sun_parser.add_argument('--end-year', type=int, default=this_year + 1, help='Last year in the table (inclusive)')
+    sun_parser.add_argument('--output', type=str, default=DEFAULT_TABLE_PATH, help='Output path without extension')
+
+    return parser.parse_args()
+
+
+def main():
+    """Run the selected maintenance command."""
+    args = parse_args()
+
+    if args.command == 'build-airport-table':
+        count = build_airport_table(args.output)
+        print(f"Wrote airport table for {count} airports to {args.output}.npy")
+
+    elif args.command == 'build-sun-table':
+        count = build_sun_table(args.output, args.start_year, args.end_year)
+        print(f"Wrote sun table for {count} airports ({args.start_year}-{args.end_year}) to {args.output}.npy")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Airport metadata and timezone helpers.
+
+Airport data is served from a compact table generated by a build step:
+
+    python -m logbook_core build-airport-table
+
+The table is one NumPy structured array (IATA code, latitude, longitude,
+interned timezone id and name) memory-mapped at startup, plus a small JSON
+file holding the timezone names. Lookups are a dict hit into the arrays, and
+whole columns of codes are resolved at once with lookup_airports(). When the
+table has not been built, airportsdata is loaded on first use instead.
+
+UTC offsets come from each timezone's transition table in the pytz data, so
+they follow the flight's own date (DST included) rather than today's, and
+whole columns of (timezone, UTC instant) are resolved with utc_offsets().
+"""
+import json
+import os
+import time
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pytz
+
+DEFAULT_AIRPORT_TABLE_PATH = os.environ.get(
+    'LOGBOOK_AIRPORT_TABLE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'airports')
+)
+
+# Fallback dictionary for airports not found in the database
+# Define airport metadata: (Name, Timezone, Latitude, Longitude)
+FALLBACK_AIRPORTS = {
+    "CAN": ("Guangzhou", "Asia/Shanghai", 23.3924, 113.2988),
+    "BKK": ("Bangkok", "Asia/Bangkok", 13.6900, 100.7501),
+    "PEN": ("Penang", "Asia/Kuala_Lumpur", 5.2976, 100.2760),
+    "TPE": ("Taipei", "Asia/Taipei", 25.0777, 121.2330),
+    "KIX": ("Osaka", "Asia/Tokyo", 34.4347, 135.2440),
+}
+
+_table = None
+_table_loaded = False
+_airportsdata = None
+
+
+class AirportTable:
+    """
+    Memory-mapped airport store.
+
+    Records are sorted by IATA code, so a column of codes can be resolved
+    with one searchsorted call; single codes go through a code -> index dict.
+    """
+
+    def __init__(self, path=DEFAULT_AIRPORT_TABLE_PATH):
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        self.timezones = meta['timezones']
+        self.records = np.load(f"{path}.npy", mmap_mode='r')
+        self.codes = self.records['code']
+        self.lat = self.records['lat']
+        self.lon = self.records['lon']
+        self.tz = self.records['tz']
+        self.index = {code: i for i, code in enumerate(self.codes.astype(str).tolist())}
+
+    def __len__(self):
+        return len(self.codes)
+
+    def get(self, code):
+        """
+        Airport data for one IATA code.
+
+        Returns:
+            Tuple of (name, timezone, latitude, longitude), or None if unknown
+        """
+        i = self.index.get(code)
+        if i is None:
+            return None
+        record = self.records[i]
+        return (record['name'].decode('utf-8'), self.timezones[record['tz']],
+                float(record['lat']), float(record['lon']))
+
+    def find_many(self, codes):
+        """
+        Table rows for a sequence of IATA codes.
+
+        Returns:
+            Integer array of row indices, -1 for unknown codes
+        """
+        keys = np.array([str(code or '') for code in codes], dtype=self.codes.dtype)
+        rows = np.searchsorted(self.codes, keys)
+        rows = np.minimum(rows, len(self.codes) - 1)
+        return np.where(self.codes[rows] == keys, rows, -1)
+
+
+def get_airport_table():
+    """Return the process-wide AirportTable, or None if it has not been built."""
+    global _table, _table_loaded
+    if not _table_loaded:
+        _table_loaded = True
+        try:
+            _table = AirportTable(DEFAULT_AIRPORT_TABLE_PATH)
+        except (OSError, ValueError, KeyError):
+            _table = None
+    return _table
+
+
+def _load_airportsdata():
+    """The airportsdata IATA dictionary, loaded on first use."""
+    global _airportsdata
+    if _airportsdata is None:
+        import airportsdata
+        _airportsdata = airportsdata.load('IATA')
+    return _airportsdata
+
+
+def get_airport_data(code):
+    """
+    Get airport data for a given IATA code.
+
+    Returns:
+        Tuple of (name, timezone, latitude, longitude), or None if unknown
+    """
+    table = get_airport_table()
+    if table is not None:
+        return table.get(code)
+
+    try:
+        airport = _load_airportsdata().get(code)
+        if airport and 'tz' in airport and 'lat' in airport and 'lon' in airport:
+            return (
+                airport.get('name', code),
+                airport['tz'],
+                float(airport['lat']),
+                float(airport['lon'])
+            )
+    except (KeyError, ValueError):
+        pass
+
+    # Fall back to hard-coded values if airport not found
+    if code in FALLBACK_AIRPORTS:
+        return FALLBACK_AIRPORTS[code]
+
+    # If we can't find the airport, return None
+    return None
+
+
+def known_airport_codes():
+    """Sorted list of every IATA code with coordinates and a timezone (see lookup_airports)."""
+    table = get_airport_table()
+    if table is not None:
+        return table.codes.astype(str).tolist()
+    codes = {code for code, airport in _load_airportsdata().items()
+             if airport.get('tz') and airport.get('lat') is not None and airport.get('lon') is not None}
+    return sorted(codes | set(FALLBACK_AIRPORTS))
+
+
+def lookup_airports(codes):
+    """
+    Coordinates and timezones for a column of IATA codes.
+
+    Returns:
+        Tuple of (lat, lon, tz) where lat/lon are float arrays (NaN for
+        unknown airports) and tz is a list of timezone names (None if unknown)
+    """
+    table = get_airport_table()
+    if table is not None:
+        rows = table.find_many(codes)
+        known = rows >= 0
+        lat = np.where(known, table.lat[rows], np.nan)
+        lon = np.where(known, table.lon[rows], np.nan)
+        tz_ids = table.tz[rows]
+        tz = [table.timezones[t] if k else None for t, k in zip(tz_ids.tolist(), known.tolist())]
+        return lat, lon, tz
+
+    data = [get_airport_data(code) for code in codes]
+    lat = np.array([a[2] if a else np.nan for a in data], dtype=np.float64)
+    lon = np.array([a[3] if a else np.nan for a in data], dtype=np.float64)
+    return lat, lon, [a[1] if a else None for a in data]
+
+
+def build_airport_table(path=DEFAULT_AIRPORT_TABLE_PATH):
+    """
+    Write the airport table from airportsdata plus FALLBACK_AIRPORTS.
+
+    Args:
+        path: Output path without extension (.npy and .json are written)
+
+    Returns:
+        Number of airports written
+    """
+    entries = {code: fallback for code, fallback in FALLBACK_AIRPORTS.items()}
+    for code, airport in _load_airportsdata().items():
+        if airport.get('tz') and airport.get('lat') is not None and airport.get('lon') is not None:
+            entries[code] = (airport.get('name') or code, airport['tz'],
+                             float(airport['lat']), float(airport['lon']))
+
+    codes = sorted(entries)
+    timezones = sorted({entries[code][1] for code in codes})
+    tz_ids = {tz: i for i, tz in enumerate(timezones)}
+    names = [entries[code][0].encode('utf-8') for code in codes]
+
+    records = np.zeros(len(codes), dtype=[
+        ('code', f"S{max(len(code) for code in codes)}"),
+        ('lat', np.float64),
+        ('lon', np.float64),
+        ('tz', np.uint16),
+        ('name', f"S{max(len(name) for name in names)}"),
+    ])
+    records['code'] = codes
+    records['lat'] = [entries[code][2] for code in codes]
+    records['lon'] = [entries[code][3] for code in codes]
+    records['tz'] = [tz_ids[entries[code][1]] for code in codes]
+    records['name'] = names
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    np.save(f"{path}.npy", records)
+    with open(f"{path}.json", 'w') as f:
+        json.dump({'timezones': timezones, 'count': len(codes)}, f)
+    return len(codes)
+
+
+@lru_cache(maxsize=None)
+def timezone_transitions(tz_name):
+    """
+    UTC offset transition table of a timezone, from the pytz data.
+
+    Returns:
+        Tuple of (starts, offsets): Unix seconds from which each offset
+        applies (the first is -inf) and the offset in hours
+    """
+    tz = pytz.timezone(tz_name)
+    transitions = getattr(tz, '_utc_transition_times', None)
+    if not transitions:
+        # Fixed-offset zone (e.g. UTC, Etc/GMT+5)
+        return np.array([-np.inf]), np.array([tz.utcoffset(datetime(2000, 1, 1)).total_seconds() / 3600])
+
+    epoch = datetime(1970, 1, 1)
+    starts = np.array([(t - epoch).total_seconds() for t in transitions])
+    starts[0] = -np.inf
+    offsets = np.array([info[0].total_seconds() for info in tz._transition_info]) / 3600
+    return starts, offsets
+
+
+def utc_offsets(tz_names, utc_s):
+    """
+    UTC offsets for columns of timezones and instants.
+
+    Args:
+        tz_names: Timezone name per row (None if unknown)
+        utc_s: UTC instants as Unix seconds
+
+    Returns:
+        Float array of offsets in hours, NaN for unknown timezones or times
+    """
+    utc_s = np.asarray(utc_s, dtype=np.float64)
+    groups = {}
+    ids = np.array([groups.setdefault(name, len(groups)) for name in tz_names], dtype=np.int64)
+
+    offsets = np.full(len(utc_s), np.nan)
+    for name, group in groups.items():
+        if not name:
+            continue
+        try:
+            starts, values = timezone_transitions(name)
+        except pytz.UnknownTimeZoneError:
+            continue
+        rows = ids == group
+        offsets[rows] = values[np.searchsorted(starts, utc_s[rows], side='right') - 1]
+    return np.where(np.isfinite(utc_s), offsets, np.nan)
+
+
+def timezone_diffs(tz1_names, tz2_names, utc_s):
+    """
+    Absolute UTC offset differences in hours between two timezone columns at given instants.
+    Unknown timezones give 0.0.
+    """
+    diff = np.abs(utc_offsets(tz1_names, utc_s) - utc_offsets(tz2_names, utc_s))
+    return np.where(np.isfinite(diff), diff, 0.0)
+
+
+def get_timezone_diff(tz1, tz2, when=None):
+    """
+    Calculate the time difference in hours between two timezones.
+
+    Args:
+        tz1, tz2: Timezone names
+        when: UTC instant as a datetime (naive means UTC) or Unix seconds; default now
+
+    Returns:
+        Absolute offset difference in hours at that instant
+    """
+    if when is None:
+        when = time.time()
+    elif isinstance(when, datetime):
+        when = (when if when.tzinfo else when.replace(tzinfo=timezone.utc)).timestamp()
+    return float(timezone_diffs([tz1], [tz2], [when])[0])
@@ -0,0 +1,168 @@
+"""
+Batch conversion of many pilots' Flightmart downloads at once.
+
+Each DWNLD_<empnum>.csv is paired with its OE file (if any) and converted in
+a process pool. Workers are started with spawn (forking a process that has
+used polars' thread pool can deadlock) and load the airport data and sun
+table once in the pool initializer. The sun table is memory-mapped read-only,
+so every worker shares the same pages of the file through the OS page cache.
+A manifest with per-file timings, stage times and row counts is written next
+to the outputs.
+"""
+import glob
+import json
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from .airports import get_airport_data, get_airport_table
+from .crew import load_oe_frame
+from .pipeline import convert_flights
+from .result_cache import open_result_cache
+from .sun_table import get_sun_cache
+from .telemetry import RunMetrics
+from .validation import default_quarantine_path
+
+# Flightmart download names; the employee number identifies the pilot
+DOWNLOAD_PATTERN = re.compile(r'^DWNLD_(\d+)\.csv$', re.IGNORECASE)
+
+# OE file names tried for each download, in order ({emp} is the employee number)
+OE_FILE_PATTERNS = ['OE_{emp}.csv', 'DWNLD_{emp}_OE.csv']
+
+MANIFEST_NAME = 'manifest.json'
+
+# Result cache opened by _init_worker in each worker process (batch and job queue pools)
+_worker_cache = None
+
+
+def find_batch_jobs(source):
+    """
+    Find flight/OE file pairs in a directory or glob.
+
+    Args:
+        source: Directory containing DWNLD_<empnum>.csv files, or a glob
+            pattern such as "exports/2024-11/DWNLD_*.csv"
+
+    Returns:
+        List of dicts with pilot (employee number), flights and oe paths,
+        sorted by employee number. oe is None when no OE file was found.
+    """
+    pattern = os.path.join(source, '*.csv') if os.path.isdir(source) else source
+
+    jobs = []
+    for path in sorted(glob.glob(pattern)):
+        match = DOWNLOAD_PATTERN.match(os.path.basename(path))
+        if not match:
+            continue
+        emp = match.group(1)
+        oe_path = None
+        for oe_pattern in OE_FILE_PATTERNS:
+            candidate = os.path.join(os.path.dirname(path), oe_pattern.format(emp=emp))
+            if os.path.exists(candidate):
+                oe_path = candidate
+                break
+        jobs.append({'pilot': emp, 'flights': path, 'oe': oe_path})
+    return jobs
+
+
+def _init_worker(result_cache_path=None):
+    """Load the shared read-only tables and open the result cache once per worker process."""
+    global _worker_cache
+    if get_airport_table() is None:
+        get_airport_data('MEM')  # Loads airportsdata instead
+    get_sun_cache()
+    if result_cache_path:
+        _worker_cache = open_result_cache(result_cache_path)
+
+
+def _convert_job(job, output_dir, output_prefix, crew_position, output_format, pilot_name, night_mode):
+    """
+    Convert one pilot's download. Runs in a worker process.
+
+    Returns:
+        Manifest entry for the file; failures are recorded rather than raised
+        so one bad download does not stop the batch.
+    """
+    started = time.perf_counter()
+    input_base = os.path.splitext(os.path.basename(job['flights']))[0]
+    output_csv = os.path.join(output_dir, f"{output_prefix}_{input_base}_{datetime.now().strftime('%Y-%m-%d')}.csv")
+
+    quarantine_csv = default_quarantine_path(output_csv)
+    entry = dict(job, output=output_csv, position=crew_position, oe_flights=0, rows=0, quarantined=0, quarantine=None,
+                 status='ok', error=None, stages={})
+    metrics = RunMetrics()
+    try:
+        oe_data = load_oe_frame(job['oe']) if job['oe'] else None
+        position = crew_position
+        if position == 'auto' and oe_data is None:
+            position = 'captain'  # Fallback to captain if auto requested but no OE data
+        entry['position'] = position
+        entry['oe_flights'] = oe_data.height if oe_data is not None else 0
+        entry['rows'] = convert_flights(job['flights'], output_csv, position, oe_data,
+                                        output_format=output_format, pilot_name=pilot_name,
+                                        night_mode=night_mode, result_cache=_worker_cache,
+                                        quarantine_file=quarantine_csv, metrics=metrics)
+        entry['quarantined'] = metrics.counts.get('rows_quarantined', 0)
+        if os.path.exists(quarantine_csv):
+            entry['quarantine'] = quarantine_csv
+    except Exception as e:
+        entry['status'] = 'error'
+        entry['error'] = str(e)
+        entry['output'] = None
+    entry['stages'] = metrics.summary()['stages']
+    entry['seconds'] = round(time.perf_counter() - started, 3)
+    return entry
+
+
+def run_batch(jobs, output_dir, crew_position='captain', output_format='faa', output_prefix='FAA',
+              pilot_name='SELF', workers=None, night_mode='sampled', result_cache_path=None):
+    """
+    Convert every job in a process pool and write a manifest.
+
+    Args:
+        jobs: List of jobs from find_batch_jobs
+        output_dir: Directory for the per-pilot outputs and manifest.json
+        crew_position: Crew position, or 'auto' to use each pilot's OE data
+        output_format: Name of a registered writer (see formats.WRITERS)
+        output_prefix: Output filename prefix, e.g. FAA or Logbook_Aero
+        pilot_name: Name used for PIC_Name/SIC_Name in logbook.aero output
+        workers: Number of worker processes (default: one per CPU)
+        night_mode: Long-haul night method, one of night.NIGHT_MODES
+        result_cache_path: Optional SQLite result cache shared by all workers
+
+    Returns:
+        The manifest dictionary that was written
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(result_cache_path,)) as pool:
+        futures = [
+            pool.submit(_convert_job, job, output_dir, output_prefix, crew_position, output_format, pilot_name,
+                        night_mode)
+            for job in jobs
+        ]
+        files = [future.result() for future in futures]
+
+    manifest = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'output_format': output_format,
+        'crew_position': crew_position,
+        'night_mode': night_mode,
+        'result_cache': result_cache_path,
+        'workers': workers or os.cpu_count(),
+        'seconds': round(time.perf_counter() - started, 3),
+        'files': len(files),
+        'failed': sum(1 for f in files if f['status'] != 'ok'),
+        'rows': sum(f['rows'] for f in files),
+        'quarantined': sum(f['quarantined'] for f in files),
+        'results': files,
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
@@ -0,0 +1,324 @@
+"""
+Crew position handling and Operating Experience (OE) data.
+"""
+import logging
+import os
+
+import polars as pl
+
+from .parsing import DATE_FORMATS
+from .telemetry import warn
+
+# Crew position time distribution
+CREW_POSITION_DISTRIBUTION = {
+    'captain': {
+        'PIC': 1.0,    # 100% as PIC
+        'SIC': 0.0,
+        'Duration': 1.0
+    },
+    'first_officer': {
+        'PIC': 0.0,
+        'SIC': 1.0,    # 100% as SIC
+        'Duration': 1.0
+    },
+    'relief_first_officer': {
+        'PIC': 0.0,
+        'SIC': 0.5,    # 50% as SIC
+        'Duration': 0.5  # 50% of flight time
+    },
+    'relief_captain': {
+        'PIC': 0.5,    # 50% as PIC
+        'SIC': 0.0,
+        'Duration': 0.5  # 50% of flight time
+    }
+}
+
+CREW_POSITIONS = list(CREW_POSITION_DISTRIBUTION) + ['auto']
+
+# Positions that log the pilot as PIC_Name / SIC_Name in logbook.aero
+PIC_POSITIONS = ['captain', 'relief_captain']
+SIC_POSITIONS = ['first_officer', 'relief_first_officer']
+
+
+# Seat codes in OE files and the crew position each one means
+OE_SEATS = {
+    'captain': ['CAPT', 'CPT', 'CAPTAIN'],
+    'first_officer': ['FO', 'F/O', 'FIRST OFFICER'],
+    'relief_first_officer': ['RFO', 'RF/O', 'R/FO', 'RELIEF FIRST OFFICER'],
+    'relief_captain': ['RF2', 'RC', 'RELIEF CAPTAIN'],
+}
+
+# Columns of an OE frame (see load_oe_frame) used for matching and crew time
+OE_COLUMNS = ['OE Key', 'OE Flight', 'OE Role', 'OE PIC', 'OE SIC']
+
+
+def _oe_role_and_times(names):
+    """
+    Expressions for OE Role, OE PIC and OE SIC of every OE row.
+
+    Seat takes precedence over ROLE. OE times override the position's share
+    of block time; a null time means no override. Seat-based times of zero or
+    less are treated as missing.
+    """
+    def hours(column):
+        if column not in names:
+            return None
+        return pl.col(column).str.strip_chars().cast(pl.Float64, strict=False).fill_null(0.0)
+
+    def positive(column):
+        value = hours(column)
+        return None if value is None else pl.when(value > 0).then(value)
+
+    none = pl.lit(None, dtype=pl.Float64)
+    zero = pl.lit(0.0)
+    role = pl.lit('captain')
+    pic = sic = none
+
+    if 'SEAT' in names:
+        seat = pl.col('SEAT').fill_null('').str.strip_chars().str.to_uppercase()
+        is_capt = seat.is_in(OE_SEATS['captain'])
+        is_fo = seat.is_in(OE_SEATS['first_officer'])
+        is_rfo = seat.is_in(OE_SEATS['relief_first_officer'])
+        is_rc = seat.is_in(OE_SEATS['relief_captain'])
+
+        role = (pl.when(is_fo).then(pl.lit('first_officer'))
+                .when(is_rfo).then(pl.lit('relief_first_officer'))
+                .when(is_rc).then(pl.lit('relief_captain'))
+                .otherwise(pl.lit('captain')))
+        pic_oe, sic_oe = positive('PIC_OE'), positive('SIC_OE')
+        pic = (pl.when(is_capt).then(pic_oe if pic_oe is not None else none)
+               .when(is_fo).then(zero if sic_oe is not None else none)
+               .when(is_rfo).then(zero)
+               .when(is_rc).then(positive('PIC_RFO_OE') if 'PIC_RFO_OE' in names else none))
+        sic = (pl.when(is_capt).then(zero if pic_oe is not None else none)
+               .when(is_fo).then(sic_oe if sic_oe is not None else none)
+               .when(is_rfo).then(positive('SIC_RFO_OE') if 'SIC_RFO_OE' in names else none)
+               .when(is_rc).then(zero))
+
+    elif 'ROLE' in names:
+        value = pl.col('ROLE').fill_null('').str.strip_chars().str.to_uppercase()
+        role = pl.when(value == 'SIC').then(pl.lit('first_officer')).otherwise(pl.lit('captain'))
+        pic = (pl.when(value == 'PIC').then(hours('PIC_OE') if 'PIC_OE' in names else zero)
+               .when(value == 'SIC').then(zero))
+        sic = (pl.when(value == 'PIC').then(zero)
+               .when(value == 'SIC').then(hours('SIC_OE') if 'SIC_OE' in names else zero))
+
+    # Fall back to the plain PIC_OE/SIC_OE columns when no time was set
+    unset = pic.is_null() & sic.is_null()
+    if 'PIC_OE' in names:
+        fallback = unset & (role == 'captain') & (hours('PIC_OE') > 0)
+        pic, sic = (pl.when(fallback).then(hours('PIC_OE')).otherwise(pic),
+                    pl.when(fallback).then(zero).otherwise(sic))
+    if 'SIC_OE' in names:
+        fallback = unset & (role == 'first_officer') & (hours('SIC_OE') > 0)
+        pic, sic = (pl.when(fallback).then(zero).otherwise(pic),
+                    pl.when(fallback).then(hours('SIC_OE')).otherwise(sic))
+
+    return [role.alias('OE Role'), pic.cast(pl.Float64).alias('OE PIC'), sic.cast(pl.Float64).alias('OE SIC')]
+
+
+def load_oe_frame(oe_file):
+    """
+    Load Operating Experience data from a CSV file as a DataFrame.
+
+    Every OE row gets OE_COLUMNS: its flight key (see flight_key_expr), the bare
+    flight number, and the crew role and PIC/SIC times it implies. The
+    original columns are kept for reporting.
+
+    Args:
+        oe_file: Path or file-like object (e.g. an in-memory upload)
+
+    Returns:
+        DataFrame, or None if the file is missing or unusable
+    """
+    if isinstance(oe_file, (str, os.PathLike)) and not os.path.exists(oe_file):
+        warn('oe_file_missing', f"OE data file {oe_file} not found.", file=oe_file)
+        return None
+
+    try:
+        oe_df = pl.read_csv(oe_file, infer_schema_length=0)
+
+        # Check for required columns
+        if 'FLIGHT' not in oe_df.columns:
+            warn('oe_file_invalid', "OE data file must have FLIGHT column.")
+            return None
+
+        def text(column):
+            if column not in oe_df.columns:
+                return pl.lit('')
+            return pl.col(column).fill_null('').str.strip_chars().str.to_uppercase()
+
+        # OE dates look like "02DEC2025"; unparseable dates are kept as they are
+        oe_date = text('FLT_DT')
+        flight_num = pl.col('FLIGHT').fill_null('').str.strip_chars().str.zfill(4)
+        return oe_df.with_columns(
+            pl.concat_str([
+                flight_num,
+                text('ORG'),
+                text('DEST'),
+                oe_date.str.strptime(pl.Date, '%d%b%Y', strict=False).dt.strftime('%Y-%m-%d').fill_null(oe_date),
+            ], separator='_').alias('OE Key'),
+            flight_num.alias('OE Flight'),
+            *_oe_role_and_times(oe_df.columns),
+        )
+    except Exception as e:
+        warn('oe_file_error', f"Could not load OE data: {e}", level=logging.ERROR)
+        return None
+
+
+def load_oe_data(oe_file):
+    """
+    Load Operating Experience data from CSV file.
+    Returns a dictionary mapping flight keys (see flight_key_expr) to crew roles and times.
+    """
+    oe = load_oe_frame(oe_file)
+    if oe is None:
+        return {}
+
+    oe_data = {}
+    for key, role, pic_time, sic_time in oe.select('OE Key', 'OE Role', 'OE PIC', 'OE SIC').iter_rows():
+        oe_data[key] = {'role': role, 'pic_time': pic_time, 'sic_time': sic_time}
+    return oe_data
+
+
+def oe_frame(oe_data):
+    """
+    OE data as a frame with OE_COLUMNS.
+
+    Accepts a frame from load_oe_frame, a dictionary from load_oe_data, or
+    None. Returns None when there is no OE data.
+    """
+    if oe_data is None:
+        return None
+    if isinstance(oe_data, pl.DataFrame):
+        return None if oe_data.is_empty() else oe_data
+    if not oe_data:
+        return None
+    keys = list(oe_data)
+    return pl.DataFrame({
+        'OE Key': keys,
+        'OE Flight': [key.split('_', 1)[0] for key in keys],
+        'OE Role': [oe_data[key]['role'] for key in keys],
+        'OE PIC': [oe_data[key]['pic_time'] for key in keys],
+        'OE SIC': [oe_data[key]['sic_time'] for key in keys],
+    }, schema={'OE Key': pl.Utf8, 'OE Flight': pl.Utf8, 'OE Role': pl.Utf8,
+               'OE PIC': pl.Float64, 'OE SIC': pl.Float64})
+
+
+def flight_key_expr():
+    """
+    Polars expression building the OE key of every row of a flight frame:
+    zero-padded flight number, origin, destination and DEPT_DATE normalized to
+    YYYY-MM-DD (left as it is if no DATE_FORMATS match), joined with '_'.
+    """
+    date = pl.col('DEPT_DATE').str.strip_chars()
+    normalized = (
+        pl.coalesce([date.str.strptime(pl.Date, fmt, strict=False) for fmt in DATE_FORMATS])
+        .dt.strftime('%Y-%m-%d')
+        .fill_null(date)
+    )
+    return pl.concat_str([
+        pl.col('FLIGHT').fill_null('').str.strip_chars().str.zfill(4),
+        pl.col('ORG').fill_null('').str.strip_chars().str.to_uppercase(),
+        pl.col('DEST').fill_null('').str.strip_chars().str.to_uppercase(),
+        normalized,
+    ], separator='_')
+
+
+def join_oe(lf, oe_data):
+    """
+    Add OE Role, OE PIC and OE SIC to a flight frame.
+
+    An OE row is matched on the full flight key, otherwise on the flight
+    number alone, which keeps OE files with missing or shuffled ORG/DEST/date
+    columns usable (the last OE row wins in both cases). Flights without an
+    OE entry get nulls; without OE data all three columns are null. The OE
+    values are looked up with replace_strict rather than joined, so rows keep
+    their order and the plan keeps streaming.
+
+    Args:
+        lf: Flight LazyFrame with FLIGHT, ORG, DEST and DEPT_DATE
+        oe_data: OE frame from load_oe_frame, dictionary from load_oe_data, or None
+
+    Returns:
+        LazyFrame with the three OE columns added, rows in their original order
+    """
+    oe = oe_frame(oe_data)
+    fields = OE_COLUMNS[2:]
+    if oe is None:
+        return lf.with_columns(pl.lit(None, dtype=pl.Utf8).alias('OE Role'),
+                               pl.lit(None, dtype=pl.Float64).alias('OE PIC'),
+                               pl.lit(None, dtype=pl.Float64).alias('OE SIC'))
+
+    by_key = oe.unique('OE Key', keep='last', maintain_order=True)
+    by_flight = oe.unique('OE Flight', keep='last', maintain_order=True)
+
+    key = flight_key_expr()
+    flight = key.str.split('_').list.first()
+    matched = key.is_in(by_key['OE Key'].implode())
+    return lf.with_columns([
+        pl.when(matched)
+        .then(key.replace_strict(by_key['OE Key'], by_key[c], default=None, return_dtype=oe.schema[c]))
+        .otherwise(flight.replace_strict(by_flight['OE Flight'], by_flight[c], default=None,
+                                         return_dtype=oe.schema[c]))
+        .alias(c)
+        for c in fields
+    ])
+
+
+def oe_match_report(lf, oe_data):
+    """
+    OE rows and flights that did not match each other.
+
+    Args:
+        lf: Flight frame (lazy or eager) with FLIGHT, ORG, DEST and DEPT_DATE
+        oe_data: OE frame from load_oe_frame or dictionary from load_oe_data
+
+    Returns:
+        Tuple of (OE rows that matched no flight as a DataFrame, number of
+        flights without an OE entry), or None without OE data
+    """
+    oe = oe_frame(oe_data)
+    if oe is None:
+        return None
+
+    key = flight_key_expr()
+    flights = lf.lazy().select(key.alias('key'), key.str.split('_').list.first().alias('flight')).collect()
+    unmatched_oe = oe.filter(~pl.col('OE Key').is_in(flights['key'].implode())
+                             & ~pl.col('OE Flight').is_in(flights['flight'].implode()))
+    unmatched_flights = flights.filter(~pl.col('key').is_in(oe['OE Key'].implode())
+                                       & ~pl.col('flight').is_in(oe['OE Flight'].implode())).height
+    return unmatched_oe, unmatched_flights
+
+
+def crew_time_columns(crew_position):
+    """
+    Polars expressions for CrewPosition, PIC and SIC.
+
+    Evaluated on a frame with the OE columns from join_oe: the OE role sets
+    the position in auto mode, OE PIC/SIC times override the position
+    distribution, and both are capped at block time.
+
+    Args:
+        crew_position: One of CREW_POSITION_DISTRIBUTION, or 'auto' to take
+            the OE role (captain for flights without one)
+
+    Returns:
+        List of expressions producing CrewPosition, PIC and SIC
+    """
+    block = pl.col('BLK_HRS')
+
+    if crew_position == 'auto':
+        position = pl.col('OE Role').fill_null('captain')
+    else:
+        position = pl.lit(crew_position)
+
+    def share(field):
+        mapping = {p: d[field] for p, d in CREW_POSITION_DISTRIBUTION.items()}
+        return position.replace_strict(mapping, return_dtype=pl.Float64)
+
+    return [
+        position.cast(pl.Utf8).alias('CrewPosition'),
+        pl.min_horizontal(pl.coalesce(pl.col('OE PIC'), block * share('PIC')), block).alias('PIC'),
+        pl.min_horizontal(pl.coalesce(pl.col('OE SIC'), block * share('SIC')), block).alias('SIC'),
+    ]
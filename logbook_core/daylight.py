@@ -0,0 +1,73 @@
+"""
+Per-airport day/night checks backed by the sun table.
+"""
+from datetime import datetime
+
+import numpy as np
+import pytz
+
+from .airports import get_airport_data
+from .sun_table import sun_events
+
+# Minutes after sunset treated as the end of civil twilight
+CIVIL_TWILIGHT_MINUTES = 30
+
+
+def get_sunrise_sunset(airport_code, date):
+    """
+    Get sunrise and sunset times for an airport on a specific date.
+    Returns UTC-timezone aware datetimes.
+
+    Args:
+        airport_code: IATA airport code
+        date: datetime object for the day to calculate
+
+    Returns:
+        Tuple of (sunrise, sunset) datetimes in UTC timezone, or (None, None) if data not available
+
+    Note:
+        Times are read from the precomputed sun table (see logbook_core.sun_table).
+    """
+    airport_data = get_airport_data(airport_code)
+    if not airport_data:
+        return None, None
+
+    name, tzname, lat, lon = airport_data
+    events = sun_events(airport_code, lat, lon, date)
+    if not np.isfinite(events['sunrise']) or not np.isfinite(events['sunset']):
+        return None, None
+    return datetime.fromtimestamp(events['sunrise'], pytz.utc), datetime.fromtimestamp(events['sunset'], pytz.utc)
+
+
+def is_night_time(time_dt, airport_code):
+    """
+    Determine if a given time occurs during night at an airport, using the
+    sun events of the local calendar date at that instant.
+
+    Args:
+        time_dt: UTC datetime of the takeoff or landing
+        airport_code: IATA code of the airport
+
+    Returns:
+        True if it's night, False otherwise (including unknown airports)
+    """
+    airport_data = get_airport_data(airport_code)
+    if not airport_data:
+        return False  # Default to day if airport data not available
+
+    name, tzname, lat, lon = airport_data
+    if time_dt.tzinfo is None:
+        time_dt = pytz.utc.localize(time_dt)
+    events = sun_events(airport_code, lat, lon, time_dt.astimezone(pytz.timezone(tzname)).date())
+
+    # Civil twilight is approximately 30 minutes after sunset
+    civil_twilight = events['sunset'] + CIVIL_TWILIGHT_MINUTES * 60
+
+    # If the time is after sunset/civil twilight or before sunrise, it's night
+    time_s = time_dt.timestamp()
+    return time_s >= civil_twilight or time_s <= events['sunrise']
+
+
+def is_night_landing(landing_time, destination):
+    """Determine if a landing occurs during night time."""
+    return is_night_time(landing_time, destination)
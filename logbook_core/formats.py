@@ -0,0 +1,305 @@
+"""
+Output formats built from an enriched flight frame (see pipeline.enrich_flights).
+
+Each writer only projects, renames and rounds columns with polars
+expressions; none of them recomputes night time, landings or crew time.
+Writers accept a DataFrame or a LazyFrame and return the same kind, so a lazy
+pipeline can be streamed straight to disk with sink_csv. Writers are looked
+up by name in WRITERS, so one enriched frame can be written in several formats:
+
+    @register_writer('my_format', 'My logbook CSV')
+    def to_my_format(df, **options):
+        return df.select(...)
+"""
+import os
+import tempfile
+
+import polars as pl
+
+from .crew import PIC_POSITIONS, SIC_POSITIONS
+from .parsing import DATE_FORMATS
+from .telemetry import timed
+
+# Stages that run inside a streamed write and are timed on their own
+STREAMED_STAGES = ('night', 'landings')
+
+# FAA logbook column mapping - maps original columns to FAA standard columns
+FAA_COLUMN_MAPPING = {
+    'DEPT_DATE': 'Date',
+    'ORG': 'Route From',
+    'DEST': 'Route To',
+    'EQUIP': 'Aircraft Type',
+    'TAIL': 'Aircraft Ident.',
+    'OUT': 'Out',
+    'OFF': 'Off',
+    'ON': 'On',
+    'IN': 'In',
+    'FLT_HRS': 'Duration',
+    'BLK_HRS': 'Block',
+    'Night Time': 'Night',
+    'Day Landings': 'Day Landings',
+    'Night Landings': 'Night Landings',
+    'XC': 'Cross Country',
+    'Act Inst': 'Actual Instrument',
+    'Approaches': 'Approaches'
+}
+
+# FAA logbook column order
+FAA_COLUMN_ORDER = [
+    'Date', 'Aircraft Type', 'Aircraft Ident.',
+    'Route From', 'Route To',
+    'Out', 'Off', 'On', 'In',
+    'Duration', 'Block', 'PIC', 'SIC', 'Cross Country', 'Night', 'Actual Instrument',
+    'Day Landings', 'Night Landings', 'Approaches'
+]
+
+# logbook.aero column mapping - maps original columns to logbook.aero standard columns
+LOGBOOK_AERO_COLUMN_MAPPING = {
+    'DEPT_DATE': 'Date',
+    'ORG': 'Departure_Airfield',
+    'DEST': 'Arrival_Airfield',
+    'EQUIP': 'Aircraft_Type',
+    'TAIL': 'Aircraft_Registration',
+    'OUT': 'Departure_Time',
+    'IN': 'Arrival_Time',
+    'BLK_HRS': 'Total_Time',
+    'Night Time': 'Night_Time',
+    'Day Landings': 'Landing_Day',
+    'Night Landings': 'Landing_Night',
+    'Day Takeoffs': 'Takeoff_Day',
+    'Night Takeoffs': 'Takeoff_Night',
+    'XC': 'XC_Time',
+    'Act Inst': 'IFR_Time',
+    'Approaches': 'Instrument_Approach',
+    'PIC': 'PIC_Time',
+    'SIC': 'CoPilot_Time',
+}
+
+# logbook.aero column order
+LOGBOOK_AERO_COLUMN_ORDER = [
+    'Date',
+    'Departure_Airfield',
+    'Arrival_Airfield',
+    'Route',
+    'Departure_Time',
+    'Arrival_Time',
+    'Aircraft_Type',
+    'Aircraft_Registration',
+    'Total_Time',
+    'MultiPilot_Time',
+    'PIC_Name',
+    'SIC_Name',
+    'Takeoff_Day',
+    'Takeoff_Night',
+    'Landing_Day',
+    'Landing_Night',
+    'Night_Time',
+    'IFR_Time',
+    'PIC_Time',
+    'CoPilot_Time',
+    'XC_Time',
+    'Instrument_Approach',
+]
+
+# Columns added by enrich_flights that are not passed through as extra columns
+COMPUTED_COLUMNS = {
+    'Flight Date', 'Out UTC', 'Off UTC', 'On UTC', 'In UTC', 'Parse Issues',
+    'Night Time', 'Act Inst', 'Day Landings', 'Night Landings', 'Day Takeoffs',
+    'Night Takeoffs', 'Approaches', 'CrewPosition', 'PIC', 'SIC', 'XC'
+}
+
+# Registered output writers: name -> (function, description, column mapping)
+WRITERS = {}
+
+
+def register_writer(name, description, column_mapping=None):
+    """
+    Register a function that projects an enriched frame into an output format.
+    The function receives the enriched frame plus keyword options (e.g. pilot_name)
+    and returns the frame to write. column_mapping (input column -> output
+    column) lets a written logbook be read back, e.g. for --append-to.
+    """
+    def decorator(func):
+        WRITERS[name] = (func, description, column_mapping or {})
+        return func
+    return decorator
+
+
+def get_writer(name):
+    """Return the writer function registered under name."""
+    if name not in WRITERS:
+        raise ValueError(f"Unknown output format: {name}. Available formats: {', '.join(sorted(WRITERS))}")
+    return WRITERS[name][0]
+
+
+def source_columns(name):
+    """Output column -> input column mapping of a registered writer."""
+    get_writer(name)
+    return {new: old for old, new in WRITERS[name][2].items()}
+
+
+def parse_output_spec(spec):
+    """
+    Parse a FORMAT=PATH command line value into a (format, path) tuple.
+    Intended as an argparse type for --extra-output.
+    """
+    import argparse
+
+    name, sep, path = spec.partition('=')
+    if not sep or not path:
+        raise argparse.ArgumentTypeError(f"Expected FORMAT=PATH, got '{spec}'")
+    if name not in WRITERS:
+        raise argparse.ArgumentTypeError(f"Unknown output format '{name}'. Available formats: {', '.join(sorted(WRITERS))}")
+    return name, path
+
+
+def write_outputs(df, outputs, metrics=None, **options):
+    """
+    Write one enriched frame in several formats.
+
+    A LazyFrame is streamed to each output with sink_csv. When it feeds more
+    than one output it is first sunk to a temporary Arrow IPC file, so the
+    enrichment runs once and memory stays flat.
+
+    Args:
+        df: Enriched flight frame (DataFrame or LazyFrame)
+        outputs: Dict mapping format name -> output CSV path (or file-like object)
+        metrics: Optional telemetry.RunMetrics; the writers' projections are
+            timed as 'rename' and the writes as 'write' (less the night and
+            landing work that runs inside a streamed write)
+        options: Passed to every writer (e.g. pilot_name)
+    """
+    # Resolve every writer first so a bad name fails before anything is written
+    writers = {name: get_writer(name) for name in outputs}
+
+    if isinstance(df, pl.LazyFrame) and len(outputs) > 1:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            enriched_path = os.path.join(tmp_dir, 'enriched.arrow')
+            with timed(metrics, 'write', exclude=STREAMED_STAGES):
+                df.sink_ipc(enriched_path)
+            for name, output_csv in outputs.items():
+                _write_output(writers[name], pl.scan_ipc(enriched_path), output_csv, metrics, options)
+        return
+
+    for name, output_csv in outputs.items():
+        _write_output(writers[name], df, output_csv, metrics, options)
+
+
+def _write_output(writer, df, output_csv, metrics, options):
+    """Project a frame with a writer and write it, timing both."""
+    with timed(metrics, 'rename'):
+        projected = writer(df, **options)
+    with timed(metrics, 'write', exclude=STREAMED_STAGES):
+        _write_csv(projected, output_csv)
+
+
+def _write_csv(df, output_csv):
+    """Write a DataFrame, or stream a LazyFrame to a path with sink_csv."""
+    if isinstance(df, pl.LazyFrame):
+        if isinstance(output_csv, (str, os.PathLike)):
+            df.sink_csv(output_csv)
+            return
+        df = df.collect()
+    df.write_csv(output_csv)
+
+
+def column_names(df):
+    """Column names of a DataFrame or LazyFrame (without running a lazy query)."""
+    return df.collect_schema().names()
+
+
+def _round_columns(df, columns, decimals=1):
+    """Round the float columns that exist in the frame."""
+    names = column_names(df)
+    return df.with_columns([pl.col(c).round(decimals) for c in columns if c in names])
+
+
+def _blank_to_null(df):
+    """Turn empty strings into nulls so they are written as empty CSV fields rather than ""."""
+    return df.with_columns(pl.col(pl.Utf8).replace('', None))
+
+
+@register_writer('faa', 'FAA logbook CSV', FAA_COLUMN_MAPPING)
+def to_faa(df, **options):
+    """
+    Project an enriched flight frame into the FAA logbook layout.
+    Input columns that have no FAA equivalent are kept after the FAA columns.
+    """
+    df = df.with_columns(
+        # Record approaches in the format 1;XXX where XXX is the destination
+        pl.when(pl.col('Approaches') > 0)
+        .then(pl.lit('1;') + pl.col('DEST'))
+        .otherwise(pl.lit(''))
+        .alias('Approaches')
+    )
+    df = df.rename({old: new for old, new in FAA_COLUMN_MAPPING.items() if old in column_names(df) and old != new})
+
+    # Reorganize columns in a logical FAA logbook order, then any other input columns
+    names = column_names(df)
+    final_columns = [col for col in FAA_COLUMN_ORDER if col in names]
+    for col in names:
+        if col not in final_columns and col not in COMPUTED_COLUMNS:
+            final_columns.append(col)
+
+    df = df.select(final_columns)
+
+    # Format float columns with 1 decimal place
+    df = _round_columns(df, ['Duration', 'Block', 'PIC', 'SIC', 'Cross Country', 'Night', 'Actual Instrument'])
+    return _blank_to_null(df)
+
+
+@register_writer('logbook_aero', 'logbook.aero import CSV', LOGBOOK_AERO_COLUMN_MAPPING)
+def to_logbook_aero(df, pilot_name='SELF', **options):
+    """
+    Project an enriched flight frame into the logbook.aero import layout.
+    """
+    date = pl.col('DEPT_DATE')
+    df = df.with_columns(
+        # Dates as YYYY-MM-DD, accepting any of the supported input formats
+        pl.coalesce([date.str.strptime(pl.Date, fmt, strict=False) for fmt in DATE_FORMATS])
+        .dt.strftime('%Y-%m-%d')
+        .fill_null(date)
+        .alias('DEPT_DATE'),
+        # Times as HH:mm
+        *[
+            pl.col(c).str.strptime(pl.Time, '%H:%M', strict=False).dt.strftime('%H:%M')
+            .fill_null(pl.when(pl.col(c) == '.').then(pl.lit('')).otherwise(pl.col(c)))
+            .fill_null('')
+            .alias(c)
+            for c in ['OUT', 'IN']
+        ],
+        # Multi-pilot time equals total time for multi-crew aircraft
+        pl.col('BLK_HRS').alias('MultiPilot_Time'),
+        # The pilot's own name goes in PIC_Name or SIC_Name depending on the seat
+        pl.when(pl.col('CrewPosition').is_in(PIC_POSITIONS)).then(pl.lit(pilot_name)).otherwise(pl.lit('')).alias('PIC_Name'),
+        pl.when(pl.col('CrewPosition').is_in(SIC_POSITIONS)).then(pl.lit(pilot_name)).otherwise(pl.lit('')).alias('SIC_Name'),
+        # Cap Night Time and IFR Time to not exceed Total Time (block hours)
+        pl.min_horizontal('Night Time', 'BLK_HRS').alias('Night Time'),
+        pl.min_horizontal('Act Inst', 'BLK_HRS').alias('Act Inst'),
+    )
+
+    df = df.rename({old: new for old, new in LOGBOOK_AERO_COLUMN_MAPPING.items() if old in column_names(df)})
+
+    # Build route column (Departure-Arrival)
+    df = df.with_columns((pl.col('Departure_Airfield') + '-' + pl.col('Arrival_Airfield')).alias('Route'))
+
+    names = column_names(df)
+    df = df.select([col for col in LOGBOOK_AERO_COLUMN_ORDER if col in names])
+
+    # Format float columns with 1 decimal place and ensure integer columns are integers
+    df = _round_columns(df, ['Total_Time', 'MultiPilot_Time', 'Night_Time', 'IFR_Time',
+                             'PIC_Time', 'CoPilot_Time', 'XC_Time'])
+    int_columns = ['Takeoff_Day', 'Takeoff_Night', 'Landing_Day', 'Landing_Night', 'Instrument_Approach']
+    names = column_names(df)
+    df = df.with_columns([pl.col(c).cast(pl.Int64) for c in int_columns if c in names])
+    return _blank_to_null(df)
+
+
+@register_writer('enriched', 'All input and computed columns, unrenamed')
+def to_enriched(df, **options):
+    """
+    Write the enriched frame as-is, with computed values rounded like the other formats.
+    Useful for auditing the calculations behind a logbook.
+    """
+    df = _round_columns(df, ['FLT_HRS', 'BLK_HRS', 'Night Time', 'Act Inst', 'PIC', 'SIC', 'XC'], decimals=2)
+    return _blank_to_null(df)
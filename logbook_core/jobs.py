@@ -0,0 +1,312 @@
+"""
+Background conversion jobs for the web app.
+
+An upload is copied into its own job directory and recorded in a SQLite
+table, then converted in a local process pool, so the request that submitted
+it returns immediately regardless of logbook size. Clients poll the job's
+status and download the output once it is done. Because the queue lives in
+SQLite, every web process sees every job, and jobs still queued when the
+server stopped are picked up again when it restarts; jobs it stopped in the
+middle of are marked failed once they are STALE_JOB_SECONDS old. No external
+broker is needed.
+"""
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from functools import partial
+
+from . import batch
+from .crew import load_oe_frame
+from .pipeline import convert_flights
+from .telemetry import RunMetrics
+
+DEFAULT_JOB_DIR = os.environ.get('LOGBOOK_JOB_DIR', os.path.join(tempfile.gettempdir(), 'logbook_jobs'))
+
+# Jobs and their files are deleted this many seconds after they finished
+# (or were created, for jobs that never finished)
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+# Jobs still running after this many seconds have lost their worker (e.g. the
+# server stopped mid-conversion) and are marked failed
+STALE_JOB_SECONDS = 30 * 60
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+# Job columns returned by JobQueue.get, in table order
+JOB_FIELDS = ['id', 'status', 'crew_position', 'output_format', 'pilot_name', 'night_mode', 'has_oe',
+              'created', 'started', 'finished', 'rows', 'error']
+
+DB_NAME = 'jobs.sqlite'
+FLIGHTS_NAME = 'flights.csv'
+OE_NAME = 'oe.csv'
+OUTPUT_NAME = 'output.csv'
+
+
+def _connect(db_path):
+    """Open the job database, creating the table on first use."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute(
+        'CREATE TABLE IF NOT EXISTS jobs ('
+        'id TEXT PRIMARY KEY, status TEXT NOT NULL, crew_position TEXT, output_format TEXT, pilot_name TEXT, '
+        'night_mode TEXT, has_oe INTEGER, created REAL, started REAL, finished REAL, rows INTEGER, error TEXT)'
+    )
+    return conn
+
+
+def job_status_counts(job_dir=DEFAULT_JOB_DIR):
+    """
+    Number of jobs in each of JOB_STATUSES, read straight from the job database.
+
+    Unlike JobQueue.status_counts(), this starts no queue or workers, so it
+    is safe to call from a metrics scrape.
+    """
+    db_path = os.path.join(job_dir, DB_NAME)
+    counts = {}
+    if os.path.exists(db_path):
+        conn = _connect(db_path)
+        try:
+            counts = dict(conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status'))
+        finally:
+            conn.close()
+    return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+
+def _copy_upload(source, path):
+    """Copy an upload (path, file-like object or werkzeug FileStorage) to path."""
+    if isinstance(source, (str, os.PathLike)):
+        shutil.copyfile(source, path)
+    elif hasattr(source, 'save'):
+        source.save(path)
+    else:
+        with open(path, 'wb') as f:
+            shutil.copyfileobj(source, f)
+
+
+def run_job(job_dir, job_id):
+    """
+    Convert one queued job. Runs in a worker process.
+
+    The job is claimed by switching it from queued to running, so a job
+    submitted to several pools (e.g. after a restart) is converted once.
+    Failures are stored on the job rather than raised.
+
+    Returns:
+        Dict of id, status, rows and the conversion's RunMetrics summary, or
+        None if another pool claimed the job
+    """
+    db_path = os.path.join(job_dir, DB_NAME)
+    conn = _connect(db_path)
+    try:
+        with conn:
+            claimed = conn.execute("UPDATE jobs SET status = 'running', started = ? WHERE id = ? AND status = 'queued'",
+                                   (time.time(), job_id)).rowcount
+        if not claimed:
+            return None
+
+        crew_position, output_format, pilot_name, night_mode, has_oe = conn.execute(
+            'SELECT crew_position, output_format, pilot_name, night_mode, has_oe FROM jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        path = os.path.join(job_dir, job_id)
+
+        metrics = RunMetrics()
+        try:
+            oe_data = load_oe_frame(os.path.join(path, OE_NAME)) if has_oe else None
+            if crew_position == 'auto' and oe_data is None:
+                crew_position = 'captain'  # Fallback to captain if auto requested but no OE data
+            rows = convert_flights(os.path.join(path, FLIGHTS_NAME), os.path.join(path, OUTPUT_NAME), crew_position,
+                                   oe_data, output_format=output_format, pilot_name=pilot_name,
+                                   night_mode=night_mode, result_cache=batch._worker_cache, metrics=metrics)
+            status, error = 'done', None
+        except Exception as e:
+            rows, status, error = None, 'failed', str(e)
+
+        with conn:
+            conn.execute('UPDATE jobs SET status = ?, finished = ?, rows = ?, error = ? WHERE id = ?',
+                         (status, time.time(), rows, error, job_id))
+        return dict(metrics.summary(), id=job_id, status=status, rows=rows)
+    finally:
+        conn.close()
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue with a local process pool.
+
+    Workers are started with spawn (see batch) when the first job arrives and
+    load the sun table and result cache once each.
+    """
+
+    def __init__(self, job_dir=DEFAULT_JOB_DIR, workers=None, result_cache_path=None, on_finished=None):
+        """
+        Args:
+            job_dir: Directory for the job database and per-job files
+            workers: Number of worker processes (default: one per CPU)
+            result_cache_path: Optional SQLite result cache shared by the workers
+            on_finished: Optional function called with run_job's result for
+                every job this queue dispatched, from a pool callback thread
+        """
+        self.job_dir = job_dir
+        self.db_path = os.path.join(job_dir, DB_NAME)
+        os.makedirs(job_dir, exist_ok=True)
+        _connect(self.db_path).close()
+
+        self.workers = workers
+        self.result_cache_path = result_cache_path
+        self.on_finished = on_finished
+        self._pool = None
+
+        # Jobs queued before a restart are picked up again; jobs left running are failed
+        self.cleanup()
+        for job_id in self._ids('queued'):
+            self._dispatch(job_id)
+
+    def _dispatch(self, job_id):
+        """Hand a queued job to the pool, replacing the pool if a worker died."""
+        for _ in range(2):
+            if self._pool is None:
+                context = multiprocessing.get_context('spawn')
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                                 initializer=batch._init_worker, initargs=(self.result_cache_path,))
+            try:
+                future = self._pool.submit(run_job, self.job_dir, job_id)
+                future.add_done_callback(partial(self._finished, job_id))
+                return
+            except BrokenProcessPool:
+                self._pool = None
+        raise RuntimeError('Could not start conversion workers')
+
+    def _finished(self, job_id, future):
+        """
+        Record a job whose worker crashed (e.g. BrokenProcessPool) as failed,
+        and pass other results to on_finished (jobs claimed elsewhere have none).
+        """
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            conn = _connect(self.db_path)
+            try:
+                with conn:
+                    conn.execute("UPDATE jobs SET status = 'failed', finished = ?, error = ? "
+                                 "WHERE id = ? AND status IN ('queued', 'running')",
+                                 (time.time(), f"Conversion worker failed: {error or type(error).__name__}", job_id))
+            finally:
+                conn.close()
+            return
+        result = future.result()
+        if result is not None and self.on_finished is not None:
+            self.on_finished(result)
+
+    def _ids(self, status):
+        """Ids of the jobs with a given status."""
+        conn = _connect(self.db_path)
+        try:
+            return [row[0] for row in conn.execute('SELECT id FROM jobs WHERE status = ?', (status,))]
+        finally:
+            conn.close()
+
+    def submit(self, flights_file, crew_position='captain', output_format='faa', oe_file=None,
+               pilot_name='SELF', night_mode='sampled'):
+        """
+        Queue a conversion.
+
+        Args:
+            flights_file: Flight data upload (path, file-like object or FileStorage)
+            crew_position: Crew position, or 'auto' to use the OE data
+            output_format: Name of a registered writer (see formats.WRITERS)
+            oe_file: Optional OE data upload
+            pilot_name: Name used for PIC_Name/SIC_Name in logbook.aero output
+            night_mode: Long-haul night method, one of night.NIGHT_MODES
+
+        Returns:
+            The new job id
+        """
+        self.cleanup()
+
+        job_id = uuid.uuid4().hex
+        path = os.path.join(self.job_dir, job_id)
+        os.makedirs(path)
+        _copy_upload(flights_file, os.path.join(path, FLIGHTS_NAME))
+        if oe_file is not None:
+            _copy_upload(oe_file, os.path.join(path, OE_NAME))
+
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, status, crew_position, output_format, pilot_name, night_mode, has_oe, created) "
+                    "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                    (job_id, crew_position, output_format, pilot_name, night_mode, int(oe_file is not None), time.time())
+                )
+        finally:
+            conn.close()
+
+        self._dispatch(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """
+        Status of a job.
+
+        Returns:
+            Dict of JOB_FIELDS with times as ISO strings, or None for unknown ids
+        """
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+
+        job = dict(zip(JOB_FIELDS, row))
+        job['has_oe'] = bool(job['has_oe'])
+        for field in ('created', 'started', 'finished'):
+            if job[field] is not None:
+                job[field] = datetime.fromtimestamp(job[field]).isoformat(timespec='seconds')
+        return job
+
+    def status_counts(self):
+        """Number of jobs in each of JOB_STATUSES."""
+        return job_status_counts(self.job_dir)
+
+    def output_path(self, job_id):
+        """Path of a finished job's output CSV, or None if it is not done."""
+        job = self.get(job_id)
+        if job is None or job['status'] != 'done':
+            return None
+        return os.path.join(self.job_dir, job_id, OUTPUT_NAME)
+
+    def cleanup(self, max_age=JOB_RETENTION_SECONDS):
+        """
+        Delete jobs of any status older than max_age seconds, with their files,
+        and fail jobs running for longer than STALE_JOB_SECONDS.
+        """
+        now = time.time()
+        conn = _connect(self.db_path)
+        try:
+            with conn:
+                expired = [row[0] for row in conn.execute(
+                    'SELECT id FROM jobs WHERE COALESCE(finished, created) < ?', (now - max_age,))]
+                conn.executemany('DELETE FROM jobs WHERE id = ?', [(job_id,) for job_id in expired])
+                conn.execute("UPDATE jobs SET status = 'failed', finished = ?, "
+                             "error = 'Conversion was interrupted; please submit the file again' "
+                             "WHERE status = 'running' AND started < ?", (now, now - STALE_JOB_SECONDS))
+        finally:
+            conn.close()
+        for job_id in expired:
+            shutil.rmtree(os.path.join(self.job_dir, job_id), ignore_errors=True)
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
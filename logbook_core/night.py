@@ -0,0 +1,249 @@
+"""
+Batched night-time engine.
+
+Computes night flying hours for every flight of a logbook at once. Inputs are
+whole columns (NumPy arrays) rather than rows.
+
+Long-haul flights use one of two modes:
+
+- 'sampled': sun elevation every 10 minutes along the route; each night
+  sample counts as 10 minutes of night.
+- 'analytic': sun elevation at coarse brackets along the route, then
+  root-finding on the elevation inside every bracket whose ends disagree
+  to locate the exact instants the aircraft crosses the terminator. Night
+  time is integrated between those crossings, so it is not quantized and
+  needs far fewer solar evaluations per leg.
+"""
+import numpy as np
+
+from .route import RouteTracks
+from .solar import SUNRISE_ELEVATION, sunrise_sunset, solar_elevation
+from .sun_table import sun_events_many
+
+# Flights whose endpoints differ by more than this many hours of UTC offset
+# are sampled along the route instead of using the destination rule
+TZ_DIFF_THRESHOLD = 4
+
+# Upper bound on samples evaluated per NumPy pass, to keep memory flat on
+# very large logbooks
+MAX_SAMPLES_PER_CHUNK = 1_000_000
+
+NIGHT_MODES = ('sampled', 'analytic')
+
+# Spacing of the elevation brackets searched for terminator crossings in
+# analytic mode. Two crossings closer together than this (a brief grazing
+# dip into night on a polar route) can be missed.
+BRACKET_MINUTES = 60
+
+# Illinois root-finding iterations per crossing; convergence is superlinear,
+# so this resolves a 60-minute bracket to well under a second
+ROOT_ITERATIONS = 6
+
+
+def estimate_night_time_batch(off_s, on_s, flt_hrs, org_lat, org_lon, dst_lat, dst_lon,
+                              tz_diff, date_s, dst_sunrise=None, dst_sunset=None,
+                              increment_minutes=10, decimals=2, mode='sampled', route_keys=None,
+                              metrics=None):
+    """
+    Estimate night flying hours for many flights at once.
+
+    Args:
+        off_s: OFF times as Unix seconds
+        on_s: ON times as Unix seconds
+        flt_hrs: Flight hours
+        org_lat, org_lon: Origin coordinates (NaN when the airport is unknown)
+        dst_lat, dst_lon: Destination coordinates (NaN when the airport is unknown)
+        tz_diff: Absolute UTC offset difference between origin and destination, in hours
+        date_s: UTC midnight of the departure date as Unix seconds
+        dst_sunrise, dst_sunset: Optional precomputed destination sunrise/sunset,
+            shape (n, 2): on the destination's local date at OFF and at ON
+            (a 1-D array is used for both); when omitted they are taken for
+            the departure date, read through the sun-event cache if
+            route_keys is given, else computed
+        increment_minutes: Sample spacing for long-haul flights in sampled mode
+        decimals: Rounding applied to the result
+        mode: Long-haul method, one of NIGHT_MODES
+        route_keys: Optional (ORG, DEST) pair per flight, used to reuse cached
+            great-circle waypoints for repeated city pairs (see route.RouteTracks)
+        metrics: Optional telemetry.RunMetrics counting the flights per rule
+
+    Returns:
+        Array of night hours, one per flight
+    """
+    if mode not in NIGHT_MODES:
+        raise ValueError(f"Unknown night mode: {mode}. Available modes: {', '.join(NIGHT_MODES)}")
+
+    off_s = np.asarray(off_s, dtype=np.float64)
+    on_s = np.asarray(on_s, dtype=np.float64)
+    flt_hrs = np.asarray(flt_hrs, dtype=np.float64)
+    org_lat = np.asarray(org_lat, dtype=np.float64)
+    org_lon = np.asarray(org_lon, dtype=np.float64)
+    dst_lat = np.asarray(dst_lat, dtype=np.float64)
+    dst_lon = np.asarray(dst_lon, dtype=np.float64)
+    tz_diff = np.asarray(tz_diff, dtype=np.float64)
+    date_s = np.asarray(date_s, dtype=np.float64)
+
+    night = np.zeros(len(off_s), dtype=np.float64)
+    known = np.isfinite(org_lat) & np.isfinite(dst_lat) & np.isfinite(off_s) & np.isfinite(on_s)
+
+    # Simple rule, based on sunrise/sunset at the destination
+    simple = known & (tz_diff <= TZ_DIFF_THRESHOLD)
+    if simple.any():
+        if (dst_sunrise is None or dst_sunset is None) and route_keys is not None:
+            codes = [route_keys[i][1] for i in np.flatnonzero(simple)]
+            events = sun_events_many(codes, dst_lat[simple], dst_lon[simple], date_s[simple])
+            sunrise, sunset = events[:, 0], events[:, 1]
+        elif dst_sunrise is None or dst_sunset is None:
+            sunrise, sunset = sunrise_sunset(date_s[simple], dst_lat[simple], dst_lon[simple])
+        else:
+            sunrise = np.asarray(dst_sunrise, dtype=np.float64)[simple]
+            sunset = np.asarray(dst_sunset, dtype=np.float64)[simple]
+        if sunrise.ndim == 1:
+            sunrise, sunset = np.column_stack([sunrise, sunrise]), np.column_stack([sunset, sunset])
+        night[simple] = _simple_night(off_s[simple], on_s[simple], flt_hrs[simple],
+                                      sunrise, sunset, decimals)
+
+    # Advanced method, following the sun elevation along the route
+    advanced = known & (tz_diff > TZ_DIFF_THRESHOLD)
+    if metrics is not None:
+        metrics.count('night_simple', simple.sum())
+        metrics.count('night_advanced', advanced.sum())
+        metrics.count('night_unknown', (~known).sum())
+    if advanced.any():
+        keys = None if route_keys is None else [route_keys[i] for i in np.flatnonzero(advanced)]
+        tracks = RouteTracks(org_lat[advanced], org_lon[advanced], dst_lat[advanced], dst_lon[advanced], keys)
+        route = (off_s[advanced], on_s[advanced], flt_hrs[advanced], tracks)
+        if mode == 'analytic':
+            night[advanced] = _analytic_night(*route, BRACKET_MINUTES, decimals)
+        else:
+            night[advanced] = _sampled_night(*route, increment_minutes, decimals)
+    return night
+
+
+def _simple_night(off_s, on_s, flt_hrs, sunrise, sunset, decimals):
+    """
+    All night, half night or no night depending on the destination's sunrise/sunset.
+
+    sunrise and sunset have two columns, for the destination's local date at
+    OFF and at ON, so a leg that crosses local midnight is judged against
+    the day each end is actually flown on. A leg that is at night at both
+    ends is all night, at one end half night.
+    """
+    off_night = (off_s >= sunset[:, 0]) | (off_s <= sunrise[:, 0])
+    on_night = (on_s >= sunset[:, 1]) | (on_s <= sunrise[:, 1])
+    return np.round(np.where(off_night & on_night, flt_hrs,
+                             np.where(off_night | on_night, flt_hrs * 0.5, 0.0)), decimals)
+
+
+def _sampled_night(off_s, on_s, flt_hrs, tracks, increment_minutes, decimals):
+    """Count night samples taken every increment_minutes from OFF until ON along each great-circle track."""
+    increment_s = increment_minutes * 60.0
+    duration = on_s - off_s
+    counts = np.where(duration > 0, np.ceil(duration / increment_s), 0).astype(np.int64)
+
+    night_minutes = np.zeros(len(off_s), dtype=np.float64)
+    for start, stop in _chunks(counts, MAX_SAMPLES_PER_CHUNK):
+        chunk_counts = counts[start:stop]
+        total = int(chunk_counts.sum())
+        if total == 0:
+            continue
+
+        # Flatten every sample of every flight in the chunk into one array
+        flight = np.repeat(np.arange(start, stop), chunk_counts)
+        first = np.repeat(np.cumsum(chunk_counts) - chunk_counts, chunk_counts)
+        sample_time = off_s[flight] + (np.arange(total) - first) * increment_s
+        progress = (sample_time - off_s[flight]) / duration[flight]
+        lat, lon = tracks.position(flight, progress)
+
+        is_night = solar_elevation(sample_time, lat, lon) < SUNRISE_ELEVATION
+        night_minutes[start:stop] = np.bincount(flight - start, weights=is_night * increment_minutes,
+                                                minlength=stop - start)
+
+    return np.minimum(np.round(night_minutes / 60.0, decimals), flt_hrs)
+
+
+def _analytic_night(off_s, on_s, flt_hrs, tracks, bracket_minutes, decimals):
+    """
+    Integrate night time between the exact terminator crossings of each route.
+
+    The elevation (relative to SUNRISE_ELEVATION) is evaluated at bracket
+    nodes from OFF to ON along each great-circle track. Brackets entirely below the threshold are night;
+    brackets whose ends straddle it contain a crossing, which is located
+    with the Illinois variant of regula falsi, all crossings at once.
+    """
+    bracket_s = bracket_minutes * 60.0
+    duration = on_s - off_s
+    counts = np.where(duration > 0, np.ceil(duration / bracket_s), 0).astype(np.int64)
+
+    def elevation(t, flight):
+        lat, lon = tracks.position(flight, (t - off_s[flight]) / duration[flight])
+        return solar_elevation(t, lat, lon) - SUNRISE_ELEVATION
+
+    night_seconds = np.zeros(len(off_s), dtype=np.float64)
+    for start, stop in _chunks(counts + 1, MAX_SAMPLES_PER_CHUNK):
+        chunk_counts = counts[start:stop]
+        if not chunk_counts.any():
+            continue
+
+        # Bracket nodes of every flight in the chunk, OFF and ON included
+        nodes = chunk_counts + 1
+        flight = np.repeat(np.arange(start, stop), nodes)
+        first = np.repeat(np.cumsum(nodes) - nodes, nodes)
+        step = np.arange(int(nodes.sum())) - first
+        node_time = np.minimum(off_s[flight] + step * bracket_s, on_s[flight])
+        node_elev = elevation(node_time, flight)
+
+        # Brackets join consecutive nodes of the same flight
+        left = np.flatnonzero(step < counts[flight])
+        seg_flight = flight[left]
+        t0, t1 = node_time[left], node_time[left + 1]
+        f0, f1 = node_elev[left], node_elev[left + 1]
+
+        seg_night = np.where((f0 < 0) & (f1 < 0), t1 - t0, 0.0)
+
+        crossing = np.flatnonzero((f0 < 0) != (f1 < 0))
+        if len(crossing):
+            root = _illinois(elevation, seg_flight[crossing], t0[crossing], t1[crossing],
+                             f0[crossing], f1[crossing])
+            # Night from the bracket start until sunrise, or from sunset until the bracket end
+            seg_night[crossing] = np.where(f0[crossing] < 0, root - t0[crossing], t1[crossing] - root)
+
+        night_seconds[start:stop] = np.bincount(seg_flight - start, weights=seg_night,
+                                                minlength=stop - start)
+
+    return np.minimum(np.round(night_seconds / 3600.0, decimals), flt_hrs)
+
+
+def _illinois(func, flight, a, b, fa, fb, iterations=ROOT_ITERATIONS):
+    """
+    Vectorized Illinois (modified regula falsi) root search.
+
+    Every (a, b) bracket must have fa and fb of opposite sign.
+    Returns the estimated root of func(t, flight) in each bracket.
+    """
+    side = np.zeros(len(a), dtype=np.int8)
+    c = a
+    for _ in range(iterations):
+        c = b - fb * (b - a) / (fb - fa)
+        fc = func(c, flight)
+        replace_b = np.sign(fc) == np.sign(fb)
+
+        # Halve the end that has been kept twice in a row so it stops stalling
+        fa = np.where(replace_b & (side == -1), fa * 0.5, fa)
+        fb = np.where(~replace_b & (side == 1), fb * 0.5, fb)
+        a, fa = np.where(replace_b, a, c), np.where(replace_b, fa, fc)
+        b, fb = np.where(replace_b, c, b), np.where(replace_b, fc, fb)
+        side = np.where(replace_b, -1, 1).astype(np.int8)
+    return c
+
+
+def _chunks(counts, max_samples):
+    """Yield (start, stop) flight ranges whose total sample count stays under max_samples."""
+    start = 0
+    cumulative = np.cumsum(counts)
+    while start < len(counts):
+        offset = cumulative[start - 1] if start else 0
+        stop = int(np.searchsorted(cumulative, offset + max_samples, side='right'))
+        stop = max(stop, start + 1)
+        yield start, stop
+        start = stop
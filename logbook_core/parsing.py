@@ -0,0 +1,49 @@
+"""
+Parsing and formatting helpers for Flightmart flight data.
+"""
+from datetime import datetime
+
+import polars as pl
+
+# Departure date formats accepted in flight data, tried in order
+DATE_FORMATS = ["%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y"]
+
+
+def parse_date_flexible(date_str):
+    """
+    Parse a date string in various formats and return a datetime object.
+    Supports: YYYY-MM-DD, MM/DD/YYYY, DD/MM/YYYY
+    """
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except (ValueError, TypeError):
+            continue
+    raise ValueError(f"Unable to parse date: {date_str}")
+
+
+def parse_date_expr(column):
+    """
+    Polars expression parsing a date column in any of DATE_FORMATS.
+    Values that match none of them become null.
+    """
+    value = pl.col(column).str.strip_chars()
+    return pl.coalesce([value.str.strptime(pl.Date, fmt, strict=False) for fmt in DATE_FORMATS])
+
+
+def parse_time_expr(column):
+    """
+    Polars expression parsing an H:MM (or bare hour) time column.
+    Malformed values such as '.' or '' become null.
+    """
+    value = pl.col(column).str.strip_chars()
+    value = pl.when(value.str.contains(r'^\d{1,2}$')).then(value + ':00').otherwise(value)
+    return value.str.strptime(pl.Time, '%H:%M', strict=False)
+
+
+def parse_utc_datetime_expr(date_expr, column):
+    """
+    Polars expression combining a parsed date with a time column into a UTC datetime.
+    Null when either the date or the time is malformed.
+    """
+    return date_expr.dt.combine(parse_time_expr(column)).dt.replace_time_zone('UTC')
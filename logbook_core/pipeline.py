@@ -0,0 +1,676 @@
+"""
+Polars compute pipeline shared by the CLIs and the web app.
+
+scan_flights() opens a Flightmart download as a LazyFrame, enrich_flights()
+adds every computed column (night time, landings, takeoffs, approaches, crew
+times) as expressions and the writers in logbook_core.formats project the
+enriched frame into a specific logbook format. convert_flights() streams the
+whole plan to the output with sink_csv, so memory stays flat regardless of
+input size and polars runs the column work in parallel.
+"""
+import os
+from functools import partial
+
+import numpy as np
+import polars as pl
+
+from .airports import lookup_airports, timezone_diffs, utc_offsets
+from .crew import CREW_POSITION_DISTRIBUTION, crew_time_columns, join_oe, oe_match_report
+from .daylight import CIVIL_TWILIGHT_MINUTES
+from .formats import STREAMED_STAGES, column_names, get_writer, source_columns, write_outputs
+from .night import NIGHT_MODES, estimate_night_time_batch
+from .parsing import parse_date_expr, parse_time_expr, parse_utc_datetime_expr
+from .result_cache import row_keys
+from .solar import SECONDS_PER_DAY
+from .sun_table import sun_events_many
+from .telemetry import RunMetrics, log_event, timed, warn
+from .validation import (QUARANTINE_REASON, reason_counts, validation_reasons, with_required_columns,
+                         write_quarantine)
+
+# Input time columns and the parsed UTC datetime column added for each
+TIME_COLUMNS = {'OUT': 'Out UTC', 'OFF': 'Off UTC', 'ON': 'On UTC', 'IN': 'In UTC'}
+
+# Columns added by enrich_flights, in output order
+ENRICHED_COLUMNS = [
+    'Flight Date', 'Out UTC', 'Off UTC', 'On UTC', 'In UTC', 'Parse Issues', 'Night Time', 'Act Inst', 'Day Landings', 'Night Landings', 'Day Takeoffs',
+    'Night Takeoffs', 'Approaches', 'CrewPosition', 'PIC', 'SIC', 'XC'
+]
+
+# Unmatched OE rows listed by key in the warning
+OE_REPORT_EXAMPLES = 5
+
+# Columns identifying a flight already in a logbook (see append_flights), and
+# the fallback for formats that do not carry the flight number
+LOGBOOK_KEY_COLUMNS = ['FLIGHT', 'ORG', 'DEST', 'DEPT_DATE']
+LOGBOOK_KEY_FALLBACK = ['ORG', 'DEST', 'DEPT_DATE', 'OUT']
+
+# Inputs and result of the per-batch sun position work (see _sun_batch)
+SUN_INPUT_COLUMNS = ['Flight Date', 'Off UTC', 'On UTC', 'ORG', 'DEST', 'FLT_HRS', 'LANDING']
+SUN_RESULT_DTYPE = pl.Struct({
+    'Night Time': pl.Float64,
+    'Day Landings': pl.Int64,
+    'Night Landings': pl.Int64,
+    'Day Takeoffs': pl.Int64,
+    'Night Takeoffs': pl.Int64,
+})
+
+
+def scan_flights(flights_csv):
+    """
+    Open a flight data CSV as a LazyFrame with every column as a stripped string.
+
+    Reading as strings keeps values like "1 " in LANDING or "0115" in TAIL
+    from being coerced differently depending on what the file contains.
+    File-like objects are read eagerly and wrapped, since only paths can be scanned.
+    A file without one of validation.REQUIRED_COLUMNS is rejected here; missing
+    OPTIONAL_COLUMNS are added empty.
+    """
+    if isinstance(flights_csv, (str, os.PathLike)):
+        lf = pl.scan_csv(flights_csv, infer_schema_length=0)
+    else:
+        lf = pl.read_csv(flights_csv, infer_schema_length=0).lazy()
+    return with_required_columns(lf.with_columns(pl.col(pl.Utf8).str.strip_chars()))
+
+
+def load_flights(flights_csv):
+    """Read a flight data CSV into a DataFrame (see scan_flights)."""
+    return scan_flights(flights_csv).collect()
+
+
+def flight_time_columns(names):
+    """
+    Expressions parsing DEPT_DATE and OUT/OFF/ON/IN once, at load time.
+
+    Adds 'Flight Date' (date), one UTC datetime column per TIME_COLUMNS entry
+    and 'Parse Issues', which lists the malformed OUT/IN times of a row
+    separated by ';' (null when both parsed). Malformed values are null in
+    the parsed columns rather than reported row by row; a malformed date or
+    OFF/ON time quarantines the row (see validation).
+
+    Args:
+        names: Column names of the flight frame (missing time columns stay null)
+    """
+    date = parse_date_expr('DEPT_DATE')
+    parsed = [date.alias('Flight Date')]
+    for column, name in TIME_COLUMNS.items():
+        if column in names:
+            parsed.append(parse_utc_datetime_expr(date, column).alias(name))
+        else:
+            parsed.append(pl.lit(None, dtype=pl.Datetime('us', 'UTC')).alias(name))
+
+    issues = [
+        pl.when(date.is_not_null() & parse_utc_datetime_expr(date, column).is_null()).then(pl.lit(column))
+        for column in ['OUT', 'IN'] if column in names
+    ]
+    parsed.append(pl.concat_str(issues or [pl.lit(None, dtype=pl.Utf8)], separator=';', ignore_nulls=True)
+                  .replace('', None).alias('Parse Issues'))
+    return parsed
+
+
+def build_timeline(lf):
+    """
+    Make the parsed UTC times monotonic: OUT <= OFF <= ON <= IN.
+
+    Flightmart times carry no date of their own, so flight_time_columns()
+    puts all four on the departure date. Each time that is earlier than the
+    one before it (e.g. OFF 23:51, ON 1:17) is moved to the next day. A
+    missing time is skipped, so the next one is compared with the last
+    known time.
+
+    Args:
+        lf: Frame (lazy or eager) with the columns from flight_time_columns()
+
+    Returns:
+        Frame of the same kind with the UTC time columns rolled over
+    """
+    parsed = list(TIME_COLUMNS.values())
+    for i, name in enumerate(parsed[1:], start=1):
+        # Latest known earlier time; these columns have already been rolled over
+        previous = pl.coalesce([pl.col(c) for c in reversed(parsed[:i])])
+        current = pl.col(name)
+        lf = lf.with_columns(
+            pl.when(current < previous).then(current + pl.duration(days=1)).otherwise(current).alias(name)
+        )
+    return lf
+
+
+def validate_flights(lf, names):
+    """
+    Parse a flight frame and add the QUARANTINE_REASON of every row (see validation).
+
+    Args:
+        lf: LazyFrame of flight data as read by scan_flights
+        names: Its column names
+
+    Returns:
+        LazyFrame with the flight_time_columns(), rolled over, and QUARANTINE_REASON
+    """
+    return build_timeline(lf.with_columns(*flight_time_columns(names))).with_columns(validation_reasons(names))
+
+
+def valid_flights(lf, names):
+    """Rows of a flight frame that pass validation, with the parsed columns of validate_flights."""
+    return validate_flights(lf, names).filter(pl.col(QUARANTINE_REASON).is_null()).drop(QUARANTINE_REASON)
+
+
+def quarantined_flights(lf, names):
+    """Rows of a flight frame that fail validation, as read plus QUARANTINE_REASON."""
+    return validate_flights(lf, names).filter(pl.col(QUARANTINE_REASON).is_not_null()).select(
+        names + [QUARANTINE_REASON]
+    ).collect()
+
+
+def flight_time_arrays(df):
+    """
+    Parsed departure dates and OFF/ON times of a frame as Unix seconds.
+
+    Malformed dates and times are NaN; enrich_flights() quarantines those
+    rows before calling this.
+
+    Args:
+        df: DataFrame with the columns added by flight_time_columns()
+
+    Returns:
+        Tuple of (date_s, off_s, on_s) float arrays
+    """
+    date_s = df['Flight Date'].to_physical().cast(pl.Float64).to_numpy() * SECONDS_PER_DAY
+    off_s = df['Off UTC'].dt.epoch('us').cast(pl.Float64).to_numpy() / 1e6
+    on_s = df['On UTC'].dt.epoch('us').cast(pl.Float64).to_numpy() / 1e6
+    return date_s, off_s, on_s
+
+
+def estimate_night_time(df, off_s, on_s, date_s, mode='sampled', metrics=None):
+    """
+    Estimate night flying time for every flight in the frame at once.
+
+    Args:
+        df: Polars DataFrame with ORG, DEST and FLT_HRS columns
+        off_s, on_s: OFF/ON times as Unix seconds, one per row
+        date_s: UTC midnight of the departure date as Unix seconds (NaN
+            when the date is unknown; such rows get no night time)
+        mode: Long-haul night method, one of night.NIGHT_MODES
+        metrics: Optional telemetry.RunMetrics counting the flights per night rule
+
+    Returns:
+        NumPy array of night hours
+    """
+    org_lat, org_lon, org_tz = lookup_airports(df['ORG'].to_list())
+    dst_lat, dst_lon, dst_tz = lookup_airports(df['DEST'].to_list())
+
+    # Offsets at the OFF time, so the branch follows DST on the day flown
+    tz_diff = timezone_diffs(org_tz, dst_tz, off_s)
+
+    # Rows without a usable date are handled like unknown airports
+    dated = np.isfinite(date_s)
+    org_lat = np.where(dated, org_lat, np.nan)
+    dst_lat = np.where(dated, dst_lat, np.nan)
+    date_s = np.where(dated, date_s, 0.0)
+
+    # Destination sunrise/sunset for the simple rule on the local dates at OFF
+    # and at ON (as in night_flags), read from the sun table
+    dst_days = [np.floor(local_times(dst_tz, t) / SECONDS_PER_DAY) * SECONDS_PER_DAY for t in (off_s, on_s)]
+    dst_events = [sun_events_many(df['DEST'], dst_lat, dst_lon, np.where(np.isfinite(day), day, date_s))
+                  for day in dst_days]
+
+    return estimate_night_time_batch(
+        off_s=off_s,
+        on_s=on_s,
+        flt_hrs=df['FLT_HRS'].to_numpy(),
+        org_lat=org_lat,
+        org_lon=org_lon,
+        dst_lat=dst_lat,
+        dst_lon=dst_lon,
+        tz_diff=tz_diff,
+        date_s=date_s,
+        dst_sunrise=np.column_stack([events[:, 0] for events in dst_events]),
+        dst_sunset=np.column_stack([events[:, 1] for events in dst_events]),
+        decimals=2,
+        mode=mode,
+        route_keys=list(zip(df['ORG'], df['DEST'])),
+        metrics=metrics
+    )
+
+
+def local_times(tz_names, time_s):
+    """Instants shifted to local wall-clock time, as Unix seconds (UTC when the timezone is unknown)."""
+    offsets = utc_offsets(tz_names, time_s)
+    return np.asarray(time_s, dtype=np.float64) + np.where(np.isfinite(offsets), offsets, 0.0) * 3600
+
+
+def night_flags(airport_codes, time_s):
+    """
+    Whether each takeoff or landing time falls at night at its airport.
+
+    A time is night after sunset plus civil twilight or before sunrise at the
+    airport on the local calendar date of that instant (from the airport's UTC
+    offset at the time, see airports.utc_offsets), as in
+    daylight.is_night_time(). Sun events are looked up once per distinct
+    (airport, local date) and joined back onto the rows. Unknown airports and
+    times count as day.
+
+    Args:
+        airport_codes: IATA code per row
+        time_s: Takeoff/landing times as Unix seconds (NaN when unknown)
+
+    Returns:
+        Boolean array
+    """
+    time_s = np.asarray(time_s, dtype=np.float64)
+    # Joins do not keep row order in every polars version, so the rows are sorted back by _row
+    ops = pl.DataFrame({
+        'airport': pl.Series(list(airport_codes), dtype=pl.Utf8), 'time_s': time_s
+    }).with_row_index('_row')
+
+    airports = ops.select(pl.col('airport').unique().drop_nulls())
+    lat, lon, tz = lookup_airports(airports['airport'].to_list())
+    airports = airports.with_columns(
+        pl.Series('lat', lat), pl.Series('lon', lon), pl.Series('tz', tz, dtype=pl.Utf8)
+    ).filter(pl.col('lat').is_not_nan())
+    ops = ops.join(airports, on='airport', how='left').sort('_row')
+
+    # Local calendar date of each instant, as a day number
+    local_s = local_times(ops['tz'].to_list(), time_s)
+    ops = ops.with_columns(
+        pl.Series('day', np.floor(local_s / SECONDS_PER_DAY)).fill_nan(None).cast(pl.Int64)
+    )
+
+    days = ops.filter(pl.col('lat').is_not_null() & pl.col('day').is_not_null()).unique(
+        ['airport', 'day'], maintain_order=True
+    )
+    events = sun_events_many(days['airport'].to_list(), days['lat'].to_numpy(), days['lon'].to_numpy(),
+                             days['day'].to_numpy() * SECONDS_PER_DAY)
+    days = days.select('airport', 'day', pl.Series('sunrise', events[:, 0]), pl.Series('sunset', events[:, 1]))
+
+    return ops.join(days, on=['airport', 'day'], how='left').sort('_row').select(
+        ((pl.col('time_s') >= pl.col('sunset') + CIVIL_TWILIGHT_MINUTES * 60)
+         | (pl.col('time_s') <= pl.col('sunrise'))).fill_null(False)
+    ).to_series().to_numpy()
+
+
+def classify_day_night(performed, time_s, airport_codes):
+    """
+    Split performed takeoffs or landings into day and night counts (see night_flags).
+
+    Args:
+        performed: Boolean array, true where the takeoff/landing was performed
+        time_s: Takeoff/landing times as Unix seconds (NaN when unknown)
+        airport_codes: IATA code per row
+
+    Returns:
+        Tuple of (day, night) integer arrays
+    """
+    performed = np.asarray(performed, dtype=bool)
+    time_s = np.asarray(time_s, dtype=np.float64)
+    codes = list(airport_codes)
+
+    night = np.zeros(len(time_s), dtype=bool)
+    rows = np.flatnonzero(performed & np.isfinite(time_s))
+    if len(rows):
+        night[rows] = night_flags([codes[i] for i in rows], time_s[rows])
+
+    day = performed & ~night
+    return day.astype(np.int64), night.astype(np.int64)
+
+
+def classify_operations(performed, off_s, on_s, org_codes, dest_codes):
+    """
+    Day and night takeoff and landing counts for every flight in one pass.
+
+    Takeoffs (OFF at ORG) and landings (ON at DEST) are classified together,
+    so each distinct (airport, local date) is looked up once across both.
+
+    Args:
+        performed: Boolean array, true where this crew member performed the takeoff and landing
+        off_s, on_s: OFF/ON times as Unix seconds (NaN when unknown)
+        org_codes, dest_codes: Origin and destination IATA codes per row
+
+    Returns:
+        Tuple of (day_takeoffs, night_takeoffs, day_landings, night_landings) integer arrays
+    """
+    performed = np.asarray(performed, dtype=bool)
+    n = len(performed)
+    codes = list(org_codes) + list(dest_codes)
+    time_s = np.concatenate([np.asarray(off_s, dtype=np.float64), np.asarray(on_s, dtype=np.float64)])
+    day, night = classify_day_night(np.concatenate([performed, performed]), time_s, codes)
+    return day[:n], night[:n], day[n:], night[n:]
+
+
+def _sun_results(df, night_mode, metrics=None):
+    """Night time and day/night landing and takeoff counts as a DataFrame of SUN_RESULT_DTYPE fields."""
+    with timed(metrics, 'night'):
+        date_s, off_s, on_s = flight_time_arrays(df)
+        night = estimate_night_time(df, off_s, on_s, date_s, night_mode, metrics)
+
+    # Takeoffs and landings only count if this crew member performed the landing
+    with timed(metrics, 'landings'):
+        performed = df['LANDING'].to_numpy() == 1
+        day_takeoffs, night_takeoffs, day_landings, night_landings = classify_operations(
+            performed, np.where(np.isfinite(date_s), off_s, np.nan), np.where(np.isfinite(date_s), on_s, np.nan),
+            df['ORG'].to_list(), df['DEST'].to_list()
+        )
+
+    return pl.DataFrame({
+        'Night Time': night,
+        'Day Landings': day_landings,
+        'Night Landings': night_landings,
+        'Day Takeoffs': day_takeoffs,
+        'Night Takeoffs': night_takeoffs,
+    }, schema=SUN_RESULT_DTYPE.to_schema())
+
+
+def _sun_batch(batch, night_mode='sampled', result_cache=None, metrics=None):
+    """
+    Night time and day/night landing and takeoff counts for one batch of flights.
+
+    Called by polars through map_batches with a struct Series of
+    SUN_INPUT_COLUMNS; returns a struct Series of SUN_RESULT_DTYPE. With a
+    result cache, only the legs it does not hold yet are computed. Night
+    and landing work is timed into metrics.
+    """
+    df = batch.struct.unnest()
+    if df.is_empty():
+        return pl.Series(batch.name, [], dtype=SUN_RESULT_DTYPE)
+    if result_cache is None:
+        return _sun_results(df, night_mode, metrics).to_struct(batch.name)
+
+    keys = row_keys(df, SUN_INPUT_COLUMNS, night_mode)
+    cached = result_cache.get_many(keys)
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    if metrics is not None:
+        metrics.count('result_cache_hits', len(keys) - len(missing))
+        metrics.count('result_cache_misses', len(missing))
+    if missing:
+        computed = _sun_results(df[missing], night_mode, metrics)
+        result_cache.put_many([keys[i] for i in missing], computed)
+        cached.update(zip((keys[i] for i in missing), computed.iter_rows()))
+
+    return pl.DataFrame([cached[key] for key in keys], schema=SUN_RESULT_DTYPE.to_schema(),
+                        orient='row').to_struct(batch.name)
+
+
+def enrich_flights(df, crew_position='captain', oe_data=None, night_mode='sampled', result_cache=None,
+                   metrics=None):
+    """
+    Add every computed logbook column to a flight frame.
+
+    Args:
+        df: Polars DataFrame or LazyFrame as returned by load_flights/scan_flights
+        crew_position: One of CREW_POSITION_DISTRIBUTION, or 'auto' to take
+            the position from OE data (captain when a flight has no OE entry)
+        oe_data: Optional OE frame from load_oe_frame (or dictionary from load_oe_data)
+        night_mode: Long-haul night method, one of night.NIGHT_MODES
+        result_cache: Optional ResultCache; legs it already holds are not recomputed
+        metrics: Optional telemetry.RunMetrics for stage times and row counts
+
+    Returns:
+        Frame of the same kind (a LazyFrame stays lazy) with the original
+        columns plus TAIL formatted and ENRICHED_COLUMNS
+    """
+    if crew_position != 'auto' and crew_position not in CREW_POSITION_DISTRIBUTION:
+        raise ValueError(f"Invalid crew position: {crew_position}")
+    if night_mode not in NIGHT_MODES:
+        raise ValueError(f"Unknown night mode: {night_mode}. Available modes: {', '.join(NIGHT_MODES)}")
+
+    is_lazy = isinstance(df, pl.LazyFrame)
+    df = with_required_columns(df)
+    names = column_names(df)
+
+    # Quarantined rows are left out (convert_flights reports and writes them for lazy input)
+    if not is_lazy:
+        with timed(metrics, 'parse'):
+            _report_quarantine(df.height, quarantined_flights(df.lazy(), names))
+        with timed(metrics, 'crew'):
+            _report_oe(valid_flights(df.lazy(), names), oe_data, crew_position)
+
+    lf = valid_flights(df.lazy(), names)
+    lf = lf.with_columns(
+        # Numeric columns and tail numbers (e.g. 115 -> N115FE)
+        pl.col('FLT_HRS').cast(pl.Float64, strict=False).fill_null(0.0),
+        pl.col('BLK_HRS').cast(pl.Float64, strict=False).fill_null(0.0),
+        pl.col('LANDING').cast(pl.Int64, strict=False).fill_null(0),
+        pl.when(pl.col('TAIL').str.contains(r'^\d+$'))
+        .then(pl.lit('N') + pl.col('TAIL') + pl.lit('FE'))
+        .otherwise(pl.col('TAIL'))
+        .alias('TAIL'),
+    )
+
+    # Sun position work runs in NumPy, one batch at a time
+    lf = lf.with_columns(
+        pl.struct(SUN_INPUT_COLUMNS)
+        .map_batches(partial(_sun_batch, night_mode=night_mode, result_cache=result_cache, metrics=metrics),
+                     return_dtype=SUN_RESULT_DTYPE, is_elementwise=True)
+        .alias('_sun')
+    ).unnest('_sun')
+
+    # OE role and time overrides, looked up by flight key (see join_oe)
+    lf = join_oe(lf, oe_data).with_columns(
+        # Actual instrument is 50% of night time
+        (pl.col('Night Time') * 0.5).alias('Act Inst'),
+        (pl.col('LANDING') == 1).cast(pl.Int64).alias('Approaches'),
+        *crew_time_columns(crew_position),
+        pl.col('BLK_HRS').alias('XC'),  # XC time equals block time
+    ).select(names + ENRICHED_COLUMNS)
+
+    return lf if is_lazy else lf.collect()
+
+
+def _report_quarantine(rows, quarantined, quarantine_file=None):
+    """
+    Print one summary warning for the quarantined rows and write them to quarantine_file if given.
+    A quarantine file left by an earlier run is removed when nothing is quarantined.
+
+    Returns:
+        Number of rows that passed validation
+    """
+    if not quarantined.height:
+        if quarantine_file is not None and os.path.exists(quarantine_file):
+            os.remove(quarantine_file)
+        return rows
+
+    counts = reason_counts(quarantined)
+    reasons = ', '.join(f"{code}: {count}" for code, count in counts.items())
+    written = ''
+    if quarantine_file is not None:
+        write_quarantine(quarantined, quarantine_file)
+        written = f"; written to {quarantine_file}"
+    warn('quarantine', f"Quarantined {quarantined.height} of {rows} flights ({reasons}){written}",
+         quarantined=quarantined.height, rows=rows, reasons=counts, file=quarantine_file)
+    return rows - quarantined.height
+
+
+def _report_oe(lf, oe_data, crew_position):
+    """Print warnings for OE rows that matched no flight and flights without an OE entry."""
+    report = oe_match_report(lf, oe_data)
+    if report is None:
+        return
+    unmatched_oe, unmatched_flights = report
+    if unmatched_oe.height:
+        examples = ', '.join(unmatched_oe['OE Key'].head(OE_REPORT_EXAMPLES).to_list())
+        more = ', ...' if unmatched_oe.height > OE_REPORT_EXAMPLES else ''
+        warn('oe_unmatched', f"{unmatched_oe.height} OE rows matched no flight ({examples}{more})",
+             oe_rows=unmatched_oe.height)
+    if unmatched_flights:
+        fallback = 'captain' if crew_position == 'auto' else crew_position.replace('_', ' ')
+        warn('oe_missing', f"{unmatched_flights} flights have no OE entry and were logged as {fallback}",
+             flights=unmatched_flights, position=fallback)
+
+
+def convert_flights(flights_csv, output_csv, crew_position='captain', oe_data=None,
+                    output_format='faa', pilot_name='SELF', extra_outputs=None, night_mode='sampled',
+                    result_cache=None, quarantine_file=None, metrics=None):
+    """
+    Scan, enrich and write a flight data file in one or more formats.
+
+    The input is never fully materialized: the lazy plan is streamed to each
+    output with sink_csv. Night time, landings and crew time are computed
+    once; every output is a projection of the same enriched frame. Rows that
+    fail validation are left out and reported (see validation). Stage times
+    and counts are logged as a 'conversion' event at the end (see telemetry).
+
+    Args:
+        flights_csv: Input flight data CSV (path or file-like object)
+        output_csv: Output CSV path for output_format
+        crew_position: Crew position, or 'auto' to use OE data
+        oe_data: Optional OE frame from load_oe_frame (or dictionary from load_oe_data)
+        output_format: Name of a registered writer (see formats.WRITERS)
+        pilot_name: Name used for PIC_Name/SIC_Name in logbook.aero output
+        extra_outputs: Optional dict of additional format name -> output path
+        night_mode: Long-haul night method, one of night.NIGHT_MODES
+        result_cache: Optional ResultCache shared across runs (see result_cache)
+        quarantine_file: Optional CSV or JSON path for the rows that fail validation
+        metrics: Optional telemetry.RunMetrics to collect into (e.g. to read the stage times afterwards)
+
+    Returns:
+        Number of flights written (rows read minus the quarantined ones, which
+        are counted in metrics as rows_quarantined)
+    """
+    outputs = {output_format: output_csv}
+    outputs.update(extra_outputs or {})
+    for name in outputs:
+        get_writer(name)
+
+    if metrics is None:
+        metrics = RunMetrics()
+
+    with metrics.stage('load'):
+        lf = scan_flights(flights_csv)
+        names = column_names(lf)
+        rows_read = lf.select(pl.len()).collect().item()
+    enriched = enrich_flights(lf, crew_position, oe_data, night_mode, result_cache, metrics)
+
+    # Validation pass: every row is checked, only the failing ones are materialized
+    with metrics.stage('parse'):
+        complete = _report_quarantine(rows_read, quarantined_flights(lf, names), quarantine_file)
+    metrics.count('rows_read', rows_read)
+    metrics.count('rows_valid', complete)
+    metrics.count('rows_quarantined', rows_read - complete)
+    if not complete:
+        raise ValueError("No valid flight data could be processed")
+    with metrics.stage('crew'):
+        _report_oe(valid_flights(lf, names), oe_data, crew_position)
+
+    write_outputs(enriched, outputs, metrics=metrics, pilot_name=pilot_name)
+    reused = metrics.counts.get('result_cache_hits', 0)
+    if reused:
+        log_event('result_cache', f"Reused {reused} of {complete} flights from the result cache",
+                  reused=reused, flights=complete)
+    metrics.log(output_format=output_format, crew_position=crew_position, night_mode=night_mode)
+    return complete
+
+
+def logbook_key_expr(keys):
+    """
+    Expression combining the key columns into one normalized string.
+
+    Dates and times are parsed first, so a logbook written as 2024-11-11
+    matches a download reading 11/11/2024.
+    """
+    parts = []
+    for c in keys:
+        if c == 'DEPT_DATE':
+            value = parse_date_expr(c)
+        elif c in TIME_COLUMNS:
+            value = parse_time_expr(c)
+        else:
+            value = pl.col(c).str.strip_chars()
+        parts.append(value.cast(pl.Utf8).fill_null(''))
+    return pl.concat_str(parts, separator='|').alias('_logbook_key')
+
+
+def scan_logbook(logbook_csv, output_format='faa'):
+    """
+    Open a logbook written by one of the writers as a LazyFrame of strings,
+    with the columns that map back to input columns renamed (e.g. Route From -> ORG).
+    """
+    lf = pl.scan_csv(logbook_csv, infer_schema_length=0)
+    mapping = source_columns(output_format)
+    return lf.rename({c: mapping[c] for c in column_names(lf) if c in mapping})
+
+
+def append_flights(flights_csv, logbook_csv, crew_position='captain', oe_data=None,
+                   output_format='faa', pilot_name='SELF', night_mode='sampled', result_cache=None,
+                   quarantine_file=None, metrics=None):
+    """
+    Add the flights of a download that are not in an existing logbook yet.
+
+    Flights are matched on LOGBOOK_KEY_COLUMNS (LOGBOOK_KEY_FALLBACK when the
+    format has no flight number column). Only the new flights are enriched;
+    they are appended to the file, or the file is rewritten with the union
+    of both column sets when the columns differ. A logbook that does not
+    exist yet is written in full.
+
+    Args:
+        flights_csv: Input flight data CSV (path or file-like object)
+        logbook_csv: Logbook CSV previously written in output_format
+        crew_position, oe_data, output_format, pilot_name, night_mode,
+        result_cache, quarantine_file, metrics: As for convert_flights (only new flights are validated)
+
+    Returns:
+        Tuple of (new flights added, flights already in the logbook)
+    """
+    if not os.path.exists(logbook_csv):
+        added = convert_flights(flights_csv, logbook_csv, crew_position, oe_data, output_format=output_format,
+                                pilot_name=pilot_name, night_mode=night_mode, result_cache=result_cache,
+                                quarantine_file=quarantine_file, metrics=metrics)
+        return added, 0
+
+    if metrics is None:
+        metrics = RunMetrics()
+
+    with metrics.stage('load'):
+        existing = scan_logbook(logbook_csv, output_format)
+        lf = scan_flights(flights_csv)
+        names = column_names(lf)
+        existing_names = column_names(existing)
+        keys = next((k for k in (LOGBOOK_KEY_COLUMNS, LOGBOOK_KEY_FALLBACK)
+                     if set(k) <= set(existing_names) and set(k) <= set(names)), None)
+        if keys is None:
+            raise ValueError(f"Cannot match flights against {logbook_csv}: it needs the columns for "
+                             f"{', '.join(LOGBOOK_KEY_COLUMNS)} or {', '.join(LOGBOOK_KEY_FALLBACK)}")
+
+        # Only the key columns of the existing logbook are read
+        known = existing.select(logbook_key_expr(keys)).unique()
+        new = lf.with_columns(logbook_key_expr(keys)).join(known, on='_logbook_key', how='anti').drop('_logbook_key')
+
+        rows = new.select(pl.len()).collect().item()
+        duplicates = lf.select(pl.len()).collect().item() - rows
+
+    with metrics.stage('parse'):
+        complete = _report_quarantine(rows, quarantined_flights(new, names), quarantine_file)
+    metrics.count('rows_read', rows + duplicates)
+    metrics.count('rows_duplicate', duplicates)
+    metrics.count('rows_valid', complete)
+    metrics.count('rows_quarantined', rows - complete)
+    if not complete:
+        return 0, duplicates
+    with metrics.stage('crew'):
+        _report_oe(valid_flights(new, names), oe_data, crew_position)
+
+    # Timed like write_outputs: enrichment is only planned here and runs in the collect
+    enriched = enrich_flights(new, crew_position, oe_data, night_mode, result_cache, metrics)
+    with metrics.stage('rename'):
+        added = get_writer(output_format)(enriched, pilot_name=pilot_name)
+    with metrics.stage('write', exclude=STREAMED_STAGES):
+        _write_new_flights(added.collect(), logbook_csv, output_format)
+
+    metrics.log(output_format=output_format, crew_position=crew_position, night_mode=night_mode)
+    return complete, duplicates
+
+
+def _write_new_flights(added, logbook_csv, output_format):
+    """Append rows to a logbook, or rewrite it with the union of both column sets when the columns differ."""
+    header = pl.read_csv(logbook_csv, n_rows=0).columns
+    if added.columns == header:
+        with open(logbook_csv, 'rb+') as f:
+            # Make sure the new rows start on their own line
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    f.write(b'\n')
+            added.write_csv(f, include_header=False)
+    else:
+        warn('logbook_columns', f"Columns of {logbook_csv} differ from the {output_format} output; "
+                                f"rewriting it with the columns of both", logbook=logbook_csv)
+        merged = pl.concat([pl.read_csv(logbook_csv, infer_schema_length=0), added.cast(pl.Utf8)], how='diagonal')
+        merged.write_csv(logbook_csv)
@@ -0,0 +1,328 @@
+"""
+Prometheus metrics in the text exposition format, without a client library.
+
+Counters, gauges and histograms are kept in memory per process and rendered
+on demand, so a web app can serve them from a /metrics route:
+
+    registry = MetricsRegistry()
+    latency = registry.histogram('app_request_duration_seconds', 'Request latency', ['endpoint'])
+    latency.observe(0.12, endpoint='index')
+    registry.render()
+
+A counter or gauge can instead be read at render time from a collect
+function returning {label values tuple: value}, for figures that already
+live elsewhere (e.g. cache counters or job table counts).
+
+Processes forked from one parent (e.g. preforked web workers) can share a
+directory with registry.share(path) before forking: each process then writes
+a snapshot of its values there, and render() in any of them adds up every
+process's counters, histograms and gauges, so a scrape sees the same totals
+whichever worker answers it.
+"""
+import json
+import math
+import os
+import threading
+import time
+
+# Content type of render()'s output
+EXPOSITION_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Histogram buckets for durations, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Histogram buckets for sizes, in bytes (1 KB to 16 MB)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# Seconds between snapshots of a process's changed values, when shared
+FLUSH_SECONDS = 1.0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, int):
+        return str(value)
+    value = float(value)
+    if math.isnan(value):
+        return 'NaN'
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Metric:
+    """
+    Base class: a named family of samples, one per combination of label values.
+    """
+
+    kind = 'untyped'
+
+    # Whether a process that exited still counts towards the shared total
+    keep_exited = True
+
+    def __init__(self, name, help_text, labels=(), collect=None, per_process=True):
+        """
+        Args:
+            name: Metric name, e.g. logbook_rows_processed_total
+            help_text: One-line description for the HELP line
+            labels: Label names
+            collect: Optional function returning {label values tuple: value},
+                called on every render instead of keeping values here
+            per_process: Whether the values are this process's own, to be added
+                up across processes when the registry is shared; False for a
+                collect function that already reads a shared source
+        """
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.per_process = per_process
+        self._collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+        self._on_change = None
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {', '.join(self.labels) or '(none)'}, got {', '.join(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def _changed(self):
+        if self._on_change is not None:
+            self._on_change()
+
+    def values(self):
+        """{label values tuple: value} of this process."""
+        if self._collect is not None:
+            return dict(self._collect())
+        with self._lock:
+            return dict(self._values)
+
+    @staticmethod
+    def merge(value, other):
+        """Combine the values of one sample from two processes."""
+        return value + other
+
+    def samples(self, values=None):
+        """Yield (name suffix, label pairs, value) for every sample of values (default: this process's)."""
+        values = self.values() if values is None else values
+        for key, value in sorted(values.items()):
+            yield '', list(zip(self.labels, key)), value
+
+    def render(self, values=None):
+        """HELP, TYPE and sample lines of the metric."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, pairs, value in self.samples(values):
+            lines.append(f"{self.name}{suffix}{_format_labels(pairs)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """Value that only goes up (restarts from zero with the process)."""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError(f"Counter {self.name} cannot decrease")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._changed()
+
+
+class Gauge(Metric):
+    """Value that goes up and down (when shared, the sum over running processes)."""
+
+    kind = 'gauge'
+    keep_exited = False
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+        self._changed()
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+        self._changed()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total, count = self._values.get(key, ((0,) * len(self.buckets), 0.0, 0))
+            counts = tuple(n + (value <= bound) for n, bound in zip(counts, self.buckets))
+            self._values[key] = (counts, total + value, count + 1)
+        self._changed()
+
+    @staticmethod
+    def merge(value, other):
+        counts, total, count = value
+        return tuple(a + b for a, b in zip(counts, other[0])), total + other[1], count + other[2]
+
+    def samples(self, values=None):
+        values = self.values() if values is None else values
+        for key, (counts, total, count) in sorted(values.items()):
+            pairs = list(zip(self.labels, key))
+            for bound, n in zip(self.buckets, counts):
+                yield '_bucket', pairs + [('le', _format_value(bound))], n
+            yield '_bucket', pairs + [('le', '+Inf')], count
+            yield '_sum', pairs, total
+            yield '_count', pairs, count
+
+
+def _pid_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _from_json(value):
+    """Snapshot values back to the tuples the metrics keep (histogram bucket counts are lists in JSON)."""
+    if isinstance(value, list):
+        return tuple(_from_json(item) for item in value)
+    return value
+
+
+class MetricsRegistry:
+    """The metrics of one process, or of every process sharing a directory, rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+        self._shared_dir = None
+        self._dirty = threading.Event()
+        self._flusher_pid = None
+        self._flush_lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric; names must be unique."""
+        if any(m.name == metric.name for m in self._metrics):
+            raise ValueError(f"Metric {metric.name} is already registered")
+        metric._on_change = self._changed
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=(), collect=None, per_process=True):
+        return self.register(Counter(name, help_text, labels, collect, per_process))
+
+    def gauge(self, name, help_text, labels=(), collect=None, per_process=True):
+        return self.register(Gauge(name, help_text, labels, collect, per_process))
+
+    def histogram(self, name, help_text, labels=(), buckets=DURATION_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def share(self, directory):
+        """
+        Add up the metrics of every process that shares directory.
+
+        Call once in the parent before forking; snapshots left there by an
+        earlier run are removed. Each process writes its snapshot at most every
+        FLUSH_SECONDS after a change, from a background thread, and just before
+        it renders, so a scrape may miss the last second of the other processes.
+
+        Args:
+            directory: Directory for the per-process snapshots (created if missing)
+        """
+        os.makedirs(directory, exist_ok=True)
+        for filename in os.listdir(directory):
+            if filename.endswith('.json') or filename.endswith('.json.tmp'):
+                os.remove(os.path.join(directory, filename))
+        self._shared_dir = directory
+
+    def _changed(self):
+        if self._shared_dir is None:
+            return
+        if self._flusher_pid != os.getpid():
+            # First change in this process (threads do not survive a fork)
+            with self._flush_lock:
+                if self._flusher_pid != os.getpid():
+                    self._flusher_pid = os.getpid()
+                    threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+        self._dirty.set()
+
+    def _flush_loop(self):
+        while True:
+            self._dirty.wait()
+            self._dirty.clear()
+            self.flush()
+            time.sleep(FLUSH_SECONDS)
+
+    def flush(self):
+        """Write this process's snapshot to the shared directory (no-op when not shared)."""
+        if self._shared_dir is None:
+            return
+        snapshot = {metric.name: [[list(key), value] for key, value in metric.values().items()]
+                    for metric in self._metrics if metric.per_process}
+        path = os.path.join(self._shared_dir, f'{os.getpid()}.json')
+        with self._flush_lock:
+            with open(path + '.tmp', 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(path + '.tmp', path)
+
+    def _snapshots(self):
+        """(pid, running, snapshot) of every process that wrote one, this one included."""
+        self.flush()
+        snapshots = []
+        for filename in os.listdir(self._shared_dir):
+            pid, _, extension = filename.partition('.')
+            if extension != 'json' or not pid.isdigit():
+                continue
+            try:
+                with open(os.path.join(self._shared_dir, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue  # Removed or replaced while listing
+            snapshots.append((int(pid), _pid_running(int(pid)), snapshot))
+        return snapshots
+
+    def _merged(self, metric, snapshots):
+        if not metric.per_process or snapshots is None:
+            return metric.values()
+        merged = {}
+        for pid, running, snapshot in snapshots:
+            if not running and not metric.keep_exited:
+                continue
+            for key, value in snapshot.get(metric.name, []):
+                key, value = tuple(key), _from_json(value)
+                merged[key] = metric.merge(merged[key], value) if key in merged else value
+        return merged
+
+    def values(self, name):
+        """{label values tuple: value} of a counter or gauge, added up across processes when shared."""
+        metric = next(m for m in self._metrics if m.name == name)
+        return self._merged(metric, self._snapshots() if self._shared_dir is not None else None)
+
+    def render(self):
+        """Every metric in the text exposition format."""
+        snapshots = self._snapshots() if self._shared_dir is not None else None
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(self._merged(metric, snapshots)))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,157 @@
+"""
+Persistent cache of per-leg results across runs.
+
+Pilots upload overlapping Flightmart windows (the display is limited to 200
+flights), so most legs of an upload have been seen before. Night time and
+day/night landing and takeoff counts depend only on the parsed leg itself,
+so they are stored in a local SQLite file keyed on a hash of the normalized
+row (UTC date and times, airports, flight hours, landing flag) together with
+the night mode and ENGINE_VERSION. The pipeline computes only the legs that
+miss the cache.
+
+Crew times are not cached: they depend on the position and OE data, and are
+cheap column expressions anyway.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+
+import polars as pl
+
+from .telemetry import warn
+
+# Bump whenever night time, landing or takeoff results change for the same
+# input, so entries computed by an older engine are never served
+ENGINE_VERSION = '4'
+
+
+def _user_cache_dir():
+    """Per-user cache directory: $XDG_CACHE_HOME, ~/.cache, or the temp directory without a home."""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+    if base.startswith('~'):
+        base = tempfile.gettempdir()
+    return os.path.join(base, 'logbook_convert')
+
+
+# Outside the package, so installs in a read-only or shared site-packages work
+DEFAULT_RESULT_CACHE_PATH = os.environ.get('LOGBOOK_RESULT_CACHE',
+                                           os.path.join(_user_cache_dir(), 'results.sqlite'))
+
+# Result columns stored per leg, in table order
+RESULT_COLUMNS = ['Night Time', 'Day Landings', 'Night Landings', 'Day Takeoffs', 'Night Takeoffs']
+
+# Keys per SELECT, below SQLite's limit on bound parameters
+LOOKUP_CHUNK = 900
+
+_cache = None
+_cache_loaded = False
+
+
+def row_keys(df, key_columns, night_mode):
+    """
+    Cache keys for the rows of a frame.
+
+    Args:
+        df: DataFrame holding key_columns, already parsed and normalized
+            (e.g. "1:17" and "01:17" give the same key)
+        key_columns: Columns that determine the cached results
+        night_mode: Long-haul night method the results were computed with
+
+    Returns:
+        List of 16-byte keys, one per row
+    """
+    rows = df.select(
+        pl.concat_str([pl.col(c).cast(pl.Utf8).fill_null('') for c in key_columns], separator='|')
+    ).to_series().to_list()
+    prefix = f"{ENGINE_VERSION}|{night_mode}|"
+    return [hashlib.blake2b((prefix + row).encode('utf-8'), digest_size=16).digest() for row in rows]
+
+
+class ResultCache:
+    """
+    SQLite store of per-leg results.
+
+    One connection is shared by polars' worker threads behind a lock; separate
+    processes (batch mode) each open their own and rely on SQLite's locking.
+    hits and misses count the legs looked up through this instance.
+    """
+
+    def __init__(self, path=DEFAULT_RESULT_CACHE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'key BLOB PRIMARY KEY, night_time REAL, day_landings INTEGER, night_landings INTEGER, '
+            'day_takeoffs INTEGER, night_takeoffs INTEGER) WITHOUT ROWID'
+        )
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def get_many(self, keys):
+        """
+        Look up results for a list of keys.
+
+        Returns:
+            Dict of key -> tuple of RESULT_COLUMNS values, for the keys found
+        """
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_CHUNK):
+                chunk = keys[start:start + LOOKUP_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                for row in self._conn.execute(f"SELECT * FROM results WHERE key IN ({placeholders})", chunk):
+                    found[row[0]] = row[1:]
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, keys, results):
+        """
+        Store results for a list of keys.
+
+        Args:
+            keys: Keys from row_keys
+            results: DataFrame with RESULT_COLUMNS, one row per key
+        """
+        rows = [(key, *values) for key, values in zip(keys, results.select(RESULT_COLUMNS).iter_rows())]
+        with self._lock:
+            self._conn.executemany('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)', rows)
+            self._conn.commit()
+
+    def clear(self):
+        """Delete every cached result."""
+        with self._lock:
+            self._conn.execute('DELETE FROM results')
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_result_cache(path=DEFAULT_RESULT_CACHE_PATH):
+    """Open a ResultCache, or warn and return None if the file cannot be opened."""
+    try:
+        return ResultCache(path)
+    except (OSError, sqlite3.Error) as e:
+        warn('result_cache_unavailable', f"Result cache {path} unavailable, computing every flight: {e}", path=path)
+        return None
+
+
+def get_result_cache():
+    """Return the process-wide ResultCache at DEFAULT_RESULT_CACHE_PATH (None if unavailable)."""
+    global _cache, _cache_loaded
+    if not _cache_loaded:
+        _cache_loaded = True
+        _cache = open_result_cache(DEFAULT_RESULT_CACHE_PATH)
+    return _cache
@@ -0,0 +1,141 @@
+"""
+Great-circle route interpolation.
+
+Positions along a flight are taken on the great circle between origin and
+destination rather than by interpolating latitude and longitude linearly,
+which cuts the wrong way across the antimeridian and bows transpacific
+routes toward the equator.
+
+Each (ORG, DEST) pair's track is precomputed once as an array of unit
+vectors at evenly spaced fractions of the route and cached, so repeated city
+pairs reuse the same waypoints. Positions between waypoints are interpolated
+in 3D and projected back onto the sphere, which never crosses a longitude
+seam.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+# Waypoints per route (including both endpoints). Interpolating between
+# waypoints 1/64 of a 10,000 km route apart stays within a few meters of the
+# exact great-circle position.
+WAYPOINTS = 65
+
+# Upper bound on cached city pairs
+ROUTE_CACHE_SIZE = 4096
+
+
+def to_unit_vectors(lat, lon):
+    """Convert latitude/longitude in degrees to unit vectors of shape (..., 3)."""
+    lat_rad = np.radians(lat)
+    lon_rad = np.radians(lon)
+    return np.stack([np.cos(lat_rad) * np.cos(lon_rad),
+                     np.cos(lat_rad) * np.sin(lon_rad),
+                     np.sin(lat_rad)], axis=-1)
+
+
+def to_lat_lon(vectors):
+    """Convert vectors of shape (..., 3) back to latitude/longitude in degrees (-180..180)."""
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    lat = np.degrees(np.arctan2(z, np.hypot(x, y)))
+    lon = np.degrees(np.arctan2(y, x))
+    return lat, lon
+
+
+def great_circle_points(org_lat, org_lon, dst_lat, dst_lon, fraction):
+    """
+    Points at a fraction of the great-circle route between two positions.
+
+    All arguments broadcast against each other. Coincident or antipodal
+    endpoints fall back to the origin.
+
+    Returns:
+        Tuple of (lat, lon) arrays in degrees
+    """
+    start = to_unit_vectors(org_lat, org_lon)
+    end = to_unit_vectors(dst_lat, dst_lon)
+    fraction = np.asarray(fraction, dtype=np.float64)[..., np.newaxis]
+
+    # Spherical linear interpolation between the endpoint vectors
+    angle = np.arccos(np.clip(np.sum(start * end, axis=-1), -1.0, 1.0))[..., np.newaxis]
+    sin_angle = np.sin(angle)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        points = (np.sin((1.0 - fraction) * angle) * start + np.sin(fraction * angle) * end) / sin_angle
+    points = np.where(sin_angle > 1e-12, points, start)
+    return to_lat_lon(points)
+
+
+@lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def route_waypoints(org, dest, org_lat, org_lon, dst_lat, dst_lon):
+    """
+    Waypoint unit vectors for a city pair, shape (WAYPOINTS, 3), cached per route.
+
+    The airport codes are the cache key; coordinates are part of it too so a
+    corrected airport position is never served a stale track.
+    """
+    fraction = np.linspace(0.0, 1.0, WAYPOINTS)
+    lat, lon = great_circle_points(org_lat, org_lon, dst_lat, dst_lon, fraction)
+    waypoints = to_unit_vectors(lat, lon)
+    waypoints.flags.writeable = False
+    return waypoints
+
+
+class RouteTracks:
+    """
+    Great-circle tracks for a batch of flights.
+
+    Flights flying the same city pair share one waypoint array. position()
+    takes flight indices and route fractions and returns latitude/longitude.
+    """
+
+    def __init__(self, org_lat, org_lon, dst_lat, dst_lon, route_keys=None):
+        """
+        Args:
+            org_lat, org_lon, dst_lat, dst_lon: Endpoint coordinates per flight
+            route_keys: Optional (ORG, DEST) code pair per flight; enables the
+                per-route cache. Without it every flight gets its own track.
+        """
+        org_lat = np.asarray(org_lat, dtype=np.float64)
+        org_lon = np.asarray(org_lon, dtype=np.float64)
+        dst_lat = np.asarray(dst_lat, dtype=np.float64)
+        dst_lon = np.asarray(dst_lon, dtype=np.float64)
+
+        if route_keys is None:
+            fraction = np.linspace(0.0, 1.0, WAYPOINTS)
+            lat, lon = great_circle_points(org_lat[:, None], org_lon[:, None],
+                                           dst_lat[:, None], dst_lon[:, None], fraction)
+            self.waypoints = to_unit_vectors(lat, lon)
+            self.route_index = np.arange(len(org_lat))
+            return
+
+        routes = {}
+        route_index = np.empty(len(org_lat), dtype=np.int64)
+        tracks = []
+        for i, (org, dest) in enumerate(route_keys):
+            key = (org, dest, float(org_lat[i]), float(org_lon[i]), float(dst_lat[i]), float(dst_lon[i]))
+            if key not in routes:
+                routes[key] = len(tracks)
+                tracks.append(route_waypoints(*key))
+            route_index[i] = routes[key]
+        self.waypoints = np.stack(tracks) if tracks else np.empty((0, WAYPOINTS, 3))
+        self.route_index = route_index
+
+    def position(self, flight, fraction):
+        """
+        Positions along the tracks of the given flights.
+
+        Args:
+            flight: Flight indices into the batch
+            fraction: Fraction of the route flown (0 at OFF, 1 at ON)
+
+        Returns:
+            Tuple of (lat, lon) arrays in degrees
+        """
+        route = self.route_index[flight]
+        scaled = np.clip(fraction, 0.0, 1.0) * (WAYPOINTS - 1)
+        segment = np.minimum(scaled.astype(np.int64), WAYPOINTS - 2)
+        weight = (scaled - segment)[:, np.newaxis]
+
+        points = ((1.0 - weight) * self.waypoints[route, segment]
+                  + weight * self.waypoints[route, segment + 1])
+        return to_lat_lon(points)
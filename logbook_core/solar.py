@@ -0,0 +1,121 @@
+"""
+Vectorized solar geometry.
+
+Implements the NOAA solar position equations on NumPy arrays so that sun
+elevation, sunrise and sunset can be computed for whole columns of
+(UTC instant, latitude, longitude) in one pass instead of building an astral
+LocationInfo and calling sun() once per sample.
+
+All instants are float seconds since the Unix epoch (UTC).
+"""
+import numpy as np
+
+SECONDS_PER_DAY = 86400.0
+
+# Geometric sun elevation (degrees) at sunrise/sunset: the upper limb of the
+# sun touches the horizon after refraction (same convention astral uses)
+SUNRISE_ELEVATION = -0.833
+
+
+def _julian_century(epoch_seconds):
+    """Convert Unix seconds to Julian centuries since J2000.0."""
+    julian_day = np.asarray(epoch_seconds, dtype=np.float64) / SECONDS_PER_DAY + 2440587.5
+    return (julian_day - 2451545.0) / 36525.0
+
+
+def _declination_and_equation_of_time(t):
+    """
+    Solar declination (radians) and equation of time (minutes) for Julian century t.
+    """
+    mean_long = np.mod(280.46646 + t * (36000.76983 + t * 0.0003032), 360.0)
+    mean_anom = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    eccent = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+
+    center = (np.sin(mean_anom) * (1.914602 - t * (0.004817 + 0.000014 * t))
+              + np.sin(2 * mean_anom) * (0.019993 - 0.000101 * t)
+              + np.sin(3 * mean_anom) * 0.000289)
+    omega = np.radians(125.04 - 1934.136 * t)
+    apparent_long = np.radians(mean_long + center - 0.00569 - 0.00478 * np.sin(omega))
+
+    mean_obliq = 23.0 + (26.0 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60.0) / 60.0
+    obliq = np.radians(mean_obliq + 0.00256 * np.cos(omega))
+
+    declination = np.arcsin(np.sin(obliq) * np.sin(apparent_long))
+
+    y = np.tan(obliq / 2) ** 2
+    mean_long = np.radians(mean_long)
+    eq_time = 4.0 * np.degrees(
+        y * np.sin(2 * mean_long)
+        - 2 * eccent * np.sin(mean_anom)
+        + 4 * eccent * y * np.sin(mean_anom) * np.cos(2 * mean_long)
+        - 0.5 * y * y * np.sin(4 * mean_long)
+        - 1.25 * eccent * eccent * np.sin(2 * mean_anom)
+    )
+    return declination, eq_time
+
+
+def solar_elevation(epoch_seconds, lat, lon):
+    """
+    Geometric sun elevation in degrees.
+
+    Args:
+        epoch_seconds: UTC instants as Unix seconds (scalar or array)
+        lat: Observer latitude in degrees (broadcastable against epoch_seconds)
+        lon: Observer longitude in degrees, east positive
+
+    Returns:
+        Array of elevations in degrees
+    """
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)
+    declination, eq_time = _declination_and_equation_of_time(_julian_century(epoch_seconds))
+
+    minutes_utc = np.mod(epoch_seconds, SECONDS_PER_DAY) / 60.0
+    true_solar_minutes = np.mod(minutes_utc + eq_time + 4.0 * np.asarray(lon), 1440.0)
+    hour_angle = np.radians(true_solar_minutes / 4.0 - 180.0)
+
+    lat_rad = np.radians(lat)
+    cos_zenith = (np.sin(lat_rad) * np.sin(declination)
+                  + np.cos(lat_rad) * np.cos(declination) * np.cos(hour_angle))
+    return 90.0 - np.degrees(np.arccos(np.clip(cos_zenith, -1.0, 1.0)))
+
+
+def sunrise_sunset(day_seconds, lat, lon, elevation=SUNRISE_ELEVATION):
+    """
+    Sunrise and sunset instants for the local solar day of each date.
+
+    Args:
+        day_seconds: UTC midnight of each calendar date as Unix seconds
+        lat: Latitude in degrees
+        lon: Longitude in degrees, east positive
+        elevation: Sun elevation defining the event (default: sunrise/sunset)
+
+    Returns:
+        Tuple of (sunrise, sunset) arrays in Unix seconds. Where the sun never
+        crosses the given elevation, polar day is encoded as (-inf, +inf) and
+        polar night as (+inf, -inf), so ordinary comparisons keep working.
+    """
+    day_seconds = np.asarray(day_seconds, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat_rad = np.radians(lat)
+
+    # Two passes: estimate solar noon, then re-evaluate the sun at that noon
+    noon_minutes = 720.0 - 4.0 * lon
+    for _ in range(2):
+        declination, eq_time = _declination_and_equation_of_time(
+            _julian_century(day_seconds + noon_minutes * 60.0))
+        noon_minutes = 720.0 - 4.0 * lon - eq_time
+
+    cos_hour_angle = ((np.sin(np.radians(elevation)) - np.sin(lat_rad) * np.sin(declination))
+                      / (np.cos(lat_rad) * np.cos(declination)))
+    hour_angle_minutes = 4.0 * np.degrees(np.arccos(np.clip(cos_hour_angle, -1.0, 1.0)))
+
+    noon = day_seconds + noon_minutes * 60.0
+    sunrise = noon - hour_angle_minutes * 60.0
+    sunset = noon + hour_angle_minutes * 60.0
+
+    polar_day = cos_hour_angle < -1.0
+    polar_night = cos_hour_angle > 1.0
+    sunrise = np.where(polar_day, -np.inf, np.where(polar_night, np.inf, sunrise))
+    sunset = np.where(polar_day, np.inf, np.where(polar_night, -np.inf, sunset))
+    return sunrise, sunset
@@ -0,0 +1,335 @@
+"""
+Precomputed per-airport sun-event table.
+
+A build step computes sunrise, sunset, civil dawn and civil dusk for every
+airport in airportsdata over a configurable year range and writes them to a
+NumPy array on disk (plus a small JSON index). At runtime the array is
+memory-mapped, so a lookup for (airport, date) is two index calculations and
+a read, with no astral call on the hot path.
+
+Build the table with:
+
+    python -m logbook_core build-sun-table --start-year 2020 --end-year 2026
+
+Dates or airports outside the table are computed on the fly with the
+vectorized NOAA equations in logbook_core.solar and kept in a bounded
+per-process LRU. Every (airport, date) sun lookup goes through SunEventCache
+(see get_sun_cache), which counts table hits, memory hits and computed misses.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from .solar import SECONDS_PER_DAY, SUNRISE_ELEVATION, sunrise_sunset
+
+# Sun elevation marking civil dawn and dusk
+CIVIL_TWILIGHT_ELEVATION = -6.0
+
+# Column order of the last axis of the table
+EVENTS = ('sunrise', 'sunset', 'dawn', 'dusk')
+
+DEFAULT_TABLE_PATH = os.environ.get(
+    'LOGBOOK_SUN_TABLE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'sun_table')
+)
+
+# Computed (airport, date) events kept per process, for dates or airports
+# outside the table
+SUN_CACHE_SIZE = int(os.environ.get('LOGBOOK_SUN_CACHE_SIZE', 50_000))
+
+_table = None
+_table_loaded = False
+_sun_cache = None
+
+
+def _day_seconds(value):
+    """UTC midnight of a date/datetime as Unix seconds."""
+    return datetime(value.year, value.month, value.day, tzinfo=timezone.utc).timestamp()
+
+
+def compute_sun_events(day_s, lat, lon):
+    """
+    Compute all sun events for arrays of dates and coordinates.
+
+    Returns:
+        Array of shape (..., 4) with sunrise, sunset, dawn and dusk in Unix seconds
+    """
+    sunrise, sunset = sunrise_sunset(day_s, lat, lon, SUNRISE_ELEVATION)
+    dawn, dusk = sunrise_sunset(day_s, lat, lon, CIVIL_TWILIGHT_ELEVATION)
+    return np.stack([sunrise, sunset, dawn, dusk], axis=-1)
+
+
+class SunTable:
+    """
+    Memory-mapped (airport, day) -> sun events table.
+
+    Events are stored as float32 seconds relative to UTC midnight of the day,
+    which keeps sub-second precision while halving the file size; polar day
+    and night are stored as infinities (see solar.sunrise_sunset).
+    """
+
+    def __init__(self, path=DEFAULT_TABLE_PATH):
+        with open(f"{path}.json") as f:
+            meta = json.load(f)
+        self.codes = {code: i for i, code in enumerate(meta['codes'])}
+        self.start_s = float(meta['start_s'])
+        self.days = int(meta['days'])
+        self.offsets = np.load(f"{path}.npy", mmap_mode='r')
+
+    def lookup(self, code, day):
+        """
+        Sun events for one airport on one date.
+
+        Returns:
+            Dict of event name -> Unix seconds, or None if not in the table
+        """
+        row = self.codes.get(code)
+        day_s = _day_seconds(day)
+        index = int((day_s - self.start_s) // SECONDS_PER_DAY)
+        if row is None or not 0 <= index < self.days:
+            return None
+        values = self.offsets[row, index].astype(np.float64) + day_s
+        return dict(zip(EVENTS, values.tolist()))
+
+    def lookup_many(self, codes, day_s):
+        """
+        Sun events for arrays of airport codes and dates.
+
+        Args:
+            codes: Sequence of IATA codes
+            day_s: UTC midnight of each date as Unix seconds
+
+        Returns:
+            Tuple of (events, found) where events has shape (n, 4) in Unix
+            seconds and found marks rows served from the table
+        """
+        day_s = np.asarray(day_s, dtype=np.float64)
+        rows = np.array([self.codes.get(code, -1) for code in codes], dtype=np.int64)
+        index = np.floor((day_s - self.start_s) / SECONDS_PER_DAY).astype(np.int64)
+        found = (rows >= 0) & (index >= 0) & (index < self.days)
+
+        events = np.full((len(day_s), len(EVENTS)), np.nan)
+        if found.any():
+            events[found] = self.offsets[rows[found], index[found]].astype(np.float64) + day_s[found, None]
+        return events, found
+
+
+def get_sun_table():
+    """Return the process-wide SunTable, or None if it has not been built."""
+    global _table, _table_loaded
+    if not _table_loaded:
+        _table_loaded = True
+        try:
+            _table = SunTable(DEFAULT_TABLE_PATH)
+        except (OSError, ValueError, KeyError):
+            _table = None
+    return _table
+
+
+class SunEventCache:
+    """
+    (airport, date) -> sun events, in front of the sun table.
+
+    The memory-mapped table is the shared backend: every CLI run and web
+    worker maps the same file, so its pages are read once per machine (and
+    serve.py faults them in before forking). Events the table does not hold
+    are computed once per (airport, date) and kept in an LRU of at most
+    max_entries. table_hits, memory_hits and misses count the lookups served
+    by each layer; rows without coordinates are not counted.
+    """
+
+    def __init__(self, table=None, max_entries=SUN_CACHE_SIZE):
+        self.table = table
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # polars may run pipeline batches on several threads
+        self._lock = threading.Lock()
+        self.table_hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _computed(self, keys, lat, lon):
+        """
+        Events for (code, day number) keys outside the table, from the LRU or computed.
+
+        Args:
+            keys: List of (code, day number) keys, one per row
+            lat, lon: Coordinates per row
+
+        Returns:
+            Array of shape (len(keys), 4)
+        """
+        # First row of each distinct key, in order of appearance
+        first = {}
+        for i, key in enumerate(keys):
+            first.setdefault(key, i)
+
+        with self._lock:
+            values = {}
+            for key in first:
+                values[key] = self._entries.get(key)
+                if values[key] is not None:
+                    self._entries.move_to_end(key)
+            hits = sum(1 for key in keys if values[key] is not None)
+            self.memory_hits += hits
+            self.misses += len(keys) - hits
+
+        new = [key for key, value in values.items() if value is None]
+        if new:
+            rows = np.array([first[key] for key in new], dtype=np.int64)
+            days = np.array([key[1] for key in new], dtype=np.float64)
+            computed = compute_sun_events(days * SECONDS_PER_DAY, lat[rows], lon[rows])
+            with self._lock:
+                for key, events in zip(new, computed):
+                    values[key] = events
+                    self._entries[key] = events
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+
+        return np.array([values[key] for key in keys], dtype=np.float64).reshape(len(keys), len(EVENTS))
+
+    def lookup(self, code, lat, lon, day):
+        """
+        Sun events for an airport on a date.
+
+        Returns:
+            Dict of event name -> Unix seconds (may be +/-inf at high latitude)
+        """
+        if self.table is not None:
+            events = self.table.lookup(code, day)
+            if events is not None:
+                with self._lock:
+                    self.table_hits += 1
+                return events
+        key = (code, int(_day_seconds(day) // SECONDS_PER_DAY))
+        values = self._computed([key], np.array([lat], dtype=np.float64), np.array([lon], dtype=np.float64))
+        return dict(zip(EVENTS, values[0].tolist()))
+
+    def lookup_many(self, codes, lat, lon, day_s):
+        """
+        Sun events for whole columns.
+
+        Args:
+            codes: Sequence of IATA codes
+            lat, lon: Airport coordinates (NaN when unknown)
+            day_s: UTC midnight of each date as Unix seconds
+
+        Returns:
+            Array of shape (n, 4) with sunrise, sunset, dawn and dusk in Unix seconds
+        """
+        codes = list(codes)
+        day_s = np.asarray(day_s, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+
+        if self.table is not None:
+            events, found = self.table.lookup_many(codes, day_s)
+        else:
+            events, found = np.full((len(day_s), len(EVENTS)), np.nan), np.zeros(len(day_s), dtype=bool)
+        with self._lock:
+            self.table_hits += int(found.sum())
+
+        missing = np.flatnonzero(~found & np.isfinite(lat) & np.isfinite(lon))
+        if len(missing):
+            days = np.floor(day_s[missing] / SECONDS_PER_DAY).astype(np.int64).tolist()
+            keys = [(codes[i], day) for i, day in zip(missing.tolist(), days)]
+            events[missing] = self._computed(keys, lat[missing], lon[missing])
+        return events
+
+    def stats(self):
+        """Lookup counters, cache size and overall hit ratio (None before any lookup)."""
+        with self._lock:
+            total = self.table_hits + self.memory_hits + self.misses
+            return {
+                'table_hits': self.table_hits,
+                'memory_hits': self.memory_hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hit_ratio': round((self.table_hits + self.memory_hits) / total, 4) if total else None,
+            }
+
+    def clear(self):
+        """Drop the computed events and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.table_hits = self.memory_hits = self.misses = 0
+
+
+def get_sun_cache():
+    """Return the process-wide SunEventCache over the sun table."""
+    global _sun_cache
+    if _sun_cache is None:
+        _sun_cache = SunEventCache(get_sun_table())
+    return _sun_cache
+
+
+def sun_events(code, lat, lon, day):
+    """
+    Sun events for an airport on a date, from the table when possible.
+
+    Args:
+        code: IATA airport code
+        lat, lon: Airport coordinates, used when the table has no entry
+        day: date or datetime
+
+    Returns:
+        Dict of event name -> Unix seconds (may be +/-inf at high latitude)
+    """
+    return get_sun_cache().lookup(code, lat, lon, day)
+
+
+def sun_events_many(codes, lat, lon, day_s):
+    """
+    Vectorized sun_events for whole columns.
+
+    Returns:
+        Array of shape (n, 4) with sunrise, sunset, dawn and dusk in Unix seconds
+    """
+    return get_sun_cache().lookup_many(codes, lat, lon, day_s)
+
+
+def build_sun_table(path, start_year, end_year):
+    """
+    Compute and write the sun-event table for all airports in airportsdata.
+
+    Args:
+        path: Output path without extension (.npy and .json are written)
+        start_year: First year covered
+        end_year: Last year covered (inclusive)
+
+    Returns:
+        Number of airports written
+    """
+    import airportsdata
+
+    airports = airportsdata.load('IATA')
+    codes = sorted(code for code, a in airports.items() if a.get('lat') is not None and a.get('lon') is not None)
+    lat = np.array([float(airports[code]['lat']) for code in codes])
+    lon = np.array([float(airports[code]['lon']) for code in codes])
+
+    start_s = _day_seconds(date(start_year, 1, 1))
+    days = (date(end_year + 1, 1, 1) - date(start_year, 1, 1)).days
+    day_s = start_s + np.arange(days) * SECONDS_PER_DAY
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    offsets = np.lib.format.open_memmap(f"{path}.npy", mode='w+', dtype=np.float32,
+                                        shape=(len(codes), days, len(EVENTS)))
+    # One airport row at a time keeps peak memory to a single airport's date range
+    for row in range(len(codes)):
+        offsets[row] = compute_sun_events(day_s, lat[row], lon[row]) - day_s[:, None]
+    offsets.flush()
+    del offsets
+
+    with open(f"{path}.json", 'w') as f:
+        json.dump({'codes': codes, 'start_s': start_s, 'days': days,
+                   'start_year': start_year, 'end_year': end_year}, f)
+    return len(codes)
+
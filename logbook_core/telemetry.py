@@ -0,0 +1,231 @@
+"""
+Structured logging and per-run metrics for the pipeline.
+
+Messages go through the 'logbook' logger instead of print. In the default
+text format they read exactly as before ("Warning: ..." on stdout); in the
+json format every message is one JSON object per line on stderr, with an
+event name and its fields, so logs of the CLIs and the web app can be
+collected and queried alike. Warnings are rate limited per event, so a
+file with thousands of bad rows cannot flood the output.
+
+RunMetrics collects what one conversion did: the time spent in each stage,
+row counts (valid, quarantined, simple vs. advanced night rule) and the hits
+and misses of the sun-event and timezone caches. convert_flights() logs it
+as one 'conversion' event when it finishes.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+from .airports import timezone_transitions
+from .sun_table import get_sun_cache
+
+LOGGER_NAME = 'logbook'
+
+LOG_FORMATS = ('text', 'json')
+
+# Log format used when configure_logging() is not called (e.g. in spawned
+# workers); configure_logging() sets it, so workers follow their parent
+LOG_FORMAT_ENV = 'LOGBOOK_LOG_FORMAT'
+
+# Pipeline stages timed by RunMetrics, in order
+STAGES = ('load', 'parse', 'night', 'landings', 'crew', 'rename', 'write')
+
+# Warnings logged per event within WARNING_WINDOW_SECONDS; the rest are only
+# counted and reported with the next warning logged for the event
+WARNING_LIMIT = 5
+WARNING_WINDOW_SECONDS = 60
+
+_configured = False
+_warnings_lock = threading.Lock()
+_warning_windows = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, event, message and the record's fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname.lower(),
+            'event': getattr(record, 'event', 'message'),
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The message as the converters used to print it ("Warning: ..." / "Error: ...")."""
+
+    PREFIXES = {logging.WARNING: 'Warning: ', logging.ERROR: 'Error: '}
+
+    def format(self, record):
+        return self.PREFIXES.get(record.levelno, '') + record.getMessage()
+
+
+def configure_logging(log_format=None):
+    """
+    Send the 'logbook' logger to stdout as text or to stderr as JSON lines.
+
+    Args:
+        log_format: One of LOG_FORMATS (default: LOGBOOK_LOG_FORMAT, else text)
+    """
+    global _configured
+    log_format = log_format or os.environ.get(LOG_FORMAT_ENV) or 'text'
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format: {log_format}. Available formats: {', '.join(LOG_FORMATS)}")
+    os.environ[LOG_FORMAT_ENV] = log_format
+
+    handler = logging.StreamHandler(sys.stderr if log_format == 'json' else sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+    logger = logging.getLogger(LOGGER_NAME)
+    for old in list(logger.handlers):
+        logger.removeHandler(old)
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    _configured = True
+    return logger
+
+
+def get_logger():
+    """The 'logbook' logger, configured from the environment on first use."""
+    if not _configured:
+        configure_logging()
+    return logging.getLogger(LOGGER_NAME)
+
+
+def log_event(event, message, level=logging.INFO, **fields):
+    """Log a message with an event name and structured fields (see JsonFormatter)."""
+    get_logger().log(level, message, extra={'event': event, 'fields': fields})
+
+
+def warn(event, message, level=logging.WARNING, **fields):
+    """
+    Log a warning (or error), at most WARNING_LIMIT times per event every WARNING_WINDOW_SECONDS.
+
+    Warnings over the limit are counted; the next one logged for the event
+    carries the count in a 'suppressed' field.
+
+    Returns:
+        True if the warning was logged
+    """
+    now = time.monotonic()
+    with _warnings_lock:
+        window = _warning_windows.get(event)
+        if window is None or now - window['start'] >= WARNING_WINDOW_SECONDS:
+            window = {'start': now, 'logged': 0, 'suppressed': window['suppressed'] if window else 0}
+            _warning_windows[event] = window
+        if window['logged'] >= WARNING_LIMIT:
+            window['suppressed'] += 1
+            return False
+        window['logged'] += 1
+        suppressed, window['suppressed'] = window['suppressed'], 0
+
+    if suppressed:
+        fields['suppressed'] = suppressed
+        message = f"{message} ({suppressed} similar warnings suppressed)"
+    log_event(event, message, level, **fields)
+    return True
+
+
+def timed(metrics, stage, exclude=()):
+    """RunMetrics.stage() of metrics, or a no-op block when metrics is None."""
+    return nullcontext() if metrics is None else metrics.stage(stage, exclude)
+
+
+def _ratio(hits, total):
+    return round(hits / total, 4) if total else None
+
+
+class RunMetrics:
+    """
+    Stage times, row counts and cache activity of one conversion.
+
+    Stages can be timed from polars' worker threads. Cache figures are the
+    change in the process-wide counters since the metrics were created, so
+    conversions running at the same time in one process see each other's lookups.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._sun_start = self._sun_counters()
+        self._tz_start = timezone_transitions.cache_info()
+
+    @staticmethod
+    def _sun_counters():
+        stats = get_sun_cache().stats()
+        return stats['table_hits'], stats['memory_hits'], stats['misses']
+
+    def add_time(self, stage, seconds):
+        """Add seconds to a stage."""
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def count(self, name, n=1):
+        """Add n to a counter."""
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + int(n)
+
+    @contextmanager
+    def stage(self, name, exclude=()):
+        """
+        Time a block as a stage.
+
+        Args:
+            name: Stage name, normally one of STAGES
+            exclude: Stages timed inside the block (e.g. night and landings,
+                which run inside the streamed write); their time is not
+                counted twice
+        """
+        inner = sum(self.stages.get(s, 0.0) for s in exclude)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            inner = sum(self.stages.get(s, 0.0) for s in exclude) - inner
+            self.add_time(name, max(elapsed - inner, 0.0))
+
+    def cache_stats(self):
+        """Hits, misses and hit ratio of the sun-event and timezone caches since the metrics were created."""
+        table_hits, memory_hits, misses = (now - then for now, then in zip(self._sun_counters(), self._sun_start))
+        tz = timezone_transitions.cache_info()
+        tz_hits, tz_misses = tz.hits - self._tz_start.hits, tz.misses - self._tz_start.misses
+        return {
+            'sun': {'table_hits': table_hits, 'memory_hits': memory_hits, 'misses': misses,
+                    'hit_ratio': _ratio(table_hits + memory_hits, table_hits + memory_hits + misses)},
+            'timezone': {'hits': tz_hits, 'misses': tz_misses, 'hit_ratio': _ratio(tz_hits, tz_hits + tz_misses)},
+        }
+
+    def summary(self):
+        """Everything collected so far as a JSON-ready dict."""
+        with self._lock:
+            stages = {s: round(self.stages[s], 4) for s in STAGES if s in self.stages}
+            stages.update({s: round(t, 4) for s, t in self.stages.items() if s not in STAGES})
+            counts = dict(self.counts)
+        return {
+            'seconds': round(time.perf_counter() - self.started, 4),
+            'stages': stages,
+            'counts': counts,
+            'caches': self.cache_stats(),
+        }
+
+    def log(self, **fields):
+        """Log the summary as a 'conversion' event, with extra fields (e.g. the input file)."""
+        summary = dict(fields, **self.summary())
+        timings = ', '.join(f"{stage} {seconds:.2f}s" for stage, seconds in summary['stages'].items())
+        log_event('conversion', f"Converted {summary['counts'].get('rows_valid', 0)} flights in "
+                                f"{summary['seconds']:.2f}s ({timings})", **summary)
+        return summary
@@ -0,0 +1,148 @@
+"""
+Bulk validation of flight rows.
+
+Every check is one column expression over the whole frame: required fields,
+date and OFF/ON time formats, known airports and possible durations. Rows
+failing any check are quarantined instead of logged. They are left out of
+the logbook and written, with the codes of the checks they failed, to a
+sidecar CSV or JSON file, so they can be fixed and converted again.
+"""
+import json
+import os
+
+import polars as pl
+
+from .airports import known_airport_codes
+
+# Columns that must be present and non-empty for a row to be processed
+CRITICAL_COLUMNS = ['ORG', 'DEST', 'DEPT_DATE']
+
+# Columns a flight file must have; without them no row can be converted
+REQUIRED_COLUMNS = CRITICAL_COLUMNS + ['OFF', 'ON']
+
+# Columns a flight file may leave out; they are added empty, so FLT_HRS,
+# BLK_HRS and LANDING count as 0
+OPTIONAL_COLUMNS = ['TAIL', 'FLT_HRS', 'BLK_HRS', 'LANDING']
+
+# Column of the quarantine file listing the failed checks of a row
+QUARANTINE_REASON = 'Quarantine Reason'
+
+# Longest plausible flight or block time, in hours
+MAX_HOURS = 24
+
+# Largest allowed gap between OFF to ON and FLT_HRS, in hours
+TIME_TOLERANCE_HOURS = 1.0
+
+# Reason codes, in the order they are listed, with their meaning
+VALIDATION_REASONS = {
+    'missing_field': 'ORG, DEST or DEPT_DATE is empty',
+    'bad_date': 'DEPT_DATE is not a valid date',
+    'bad_time': 'OFF or ON is not a valid time',
+    'unknown_airport': 'ORG or DEST is not a known airport',
+    'bad_hours': f"FLT_HRS or BLK_HRS is not a number from 0 to {MAX_HOURS}",
+    'flight_exceeds_block': 'FLT_HRS is greater than BLK_HRS',
+    'time_mismatch': f"OFF to ON differs from FLT_HRS by more than {TIME_TOLERANCE_HOURS:g} hour",
+}
+
+
+def _present(column):
+    return pl.col(column).is_not_null() & (pl.col(column) != '')
+
+
+def _hours(column):
+    return pl.col(column).cast(pl.Float64, strict=False)
+
+
+def with_required_columns(lf):
+    """
+    Check that a flight frame has REQUIRED_COLUMNS and add the missing OPTIONAL_COLUMNS as nulls.
+
+    Raises:
+        ValueError: naming the missing required columns
+    """
+    names = lf.collect_schema().names() if isinstance(lf, pl.LazyFrame) else lf.columns
+    missing = [c for c in REQUIRED_COLUMNS if c not in names]
+    if missing:
+        raise ValueError(f"Flight data is missing required columns: {', '.join(missing)}")
+    return lf.with_columns([pl.lit(None, dtype=pl.Utf8).alias(c) for c in OPTIONAL_COLUMNS if c not in names])
+
+
+def validation_reasons(names):
+    """
+    Expression listing the failed checks of each row.
+
+    Needs the parsed columns added by pipeline.flight_time_columns() and
+    rolled over by build_timeline(); FLT_HRS and BLK_HRS are checked as read.
+
+    Args:
+        names: Column names of the flight frame (see with_required_columns)
+
+    Returns:
+        Expression named QUARANTINE_REASON: VALIDATION_REASONS codes separated by ';', null for valid rows
+    """
+    complete = pl.all_horizontal([_present(c) for c in CRITICAL_COLUMNS])
+    dated = complete & pl.col('Flight Date').is_not_null()
+    airports = known_airport_codes()
+
+    checks = {
+        'missing_field': ~complete,
+        'bad_date': complete & pl.col('Flight Date').is_null(),
+        'bad_time': dated & (pl.col('Off UTC').is_null() | pl.col('On UTC').is_null()),
+        'unknown_airport': complete & ~(pl.col('ORG').is_in(airports) & pl.col('DEST').is_in(airports)),
+    }
+
+    checks['bad_hours'] = pl.any_horizontal([
+        _present(c) & (_hours(c).is_null() | (_hours(c) < 0) | (_hours(c) > MAX_HOURS)) for c in ('FLT_HRS', 'BLK_HRS')
+    ])
+    checks['flight_exceeds_block'] = _hours('FLT_HRS') > _hours('BLK_HRS')
+    elapsed = (pl.col('On UTC') - pl.col('Off UTC')).dt.total_seconds() / 3600
+    checks['time_mismatch'] = ((_hours('FLT_HRS') > 0)
+                               & ((elapsed - _hours('FLT_HRS')).abs() > TIME_TOLERANCE_HOURS))
+
+    return pl.concat_str(
+        [pl.when(check.fill_null(False)).then(pl.lit(code)) for code, check in checks.items()],
+        separator=';', ignore_nulls=True
+    ).replace('', None).alias(QUARANTINE_REASON)
+
+
+def reason_counts(quarantined):
+    """
+    Quarantined rows per reason code.
+
+    Returns:
+        Dict of code -> count, in VALIDATION_REASONS order, for the codes that occur
+    """
+    counts = dict(quarantined[QUARANTINE_REASON].str.split(';').explode().value_counts().iter_rows())
+    return {code: counts[code] for code in VALIDATION_REASONS if code in counts}
+
+
+def default_quarantine_path(output_csv):
+    """Quarantine file written next to an output CSV (None for file-like outputs)."""
+    if not isinstance(output_csv, (str, os.PathLike)):
+        return None
+    return f"{os.path.splitext(output_csv)[0]}_quarantine.csv"
+
+
+def write_quarantine(quarantined, path):
+    """
+    Write quarantined rows to a sidecar file.
+
+    A .json path gets a report with the reason descriptions, the count per
+    reason and the rows as records; any other path gets the rows as CSV.
+
+    Args:
+        quarantined: DataFrame of input columns plus QUARANTINE_REASON
+        path: Output file path
+    """
+    if os.path.splitext(path)[1].lower() == '.json':
+        counts = reason_counts(quarantined)
+        report = {
+            'quarantined': quarantined.height,
+            'reasons': {code: {'count': count, 'description': VALIDATION_REASONS[code]}
+                        for code, count in counts.items()},
+            'flights': quarantined.to_dicts(),
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        quarantined.write_csv(path)
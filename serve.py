@@ -0,0 +1,186 @@
+"""
+Production server for the web app.
+
+    python serve.py --host 0.0.0.0 --port 8000 --workers 4 --threads 8
+
+The master process imports the app and loads the airport table, sun table and
+templates, then forks the workers, so those pages are shared copy-on-write
+instead of being loaded once per worker. Polars is not run in the master (its
+thread pool does not survive a fork); each worker runs a one-leg conversion
+before it accepts connections, so the first request does not pay for it.
+Workers that die are replaced; SIGTERM or Ctrl-C stops them all. The
+workers share their /metrics through snapshots in the job directory, so every
+worker reports the totals of all of them.
+"""
+import argparse
+import gc
+import io
+import os
+import signal
+import socket
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from app import METRICS, app
+from logbook_core import convert_flights, get_airport_data, get_airport_table, get_logger, get_sun_cache
+
+# One leg converted by each worker at startup
+WARMUP_FLIGHTS = (
+    b"FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING\n"
+    b"6159,11/11/2024,B767,115,BKK,PEN,23:35,23:51,1:17,1:25,1.43,1.83,1\n"
+)
+
+
+class RequestHandler(WSGIRequestHandler):
+    # One request per connection, so idle keep-alive clients cannot hold pool threads
+    protocol_version = 'HTTP/1.0'
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI server on an inherited socket that handles connections on a fixed pool of threads."""
+
+    multithread = True
+
+    def __init__(self, host, port, wsgi_app, threads, fd):
+        super().__init__(host, port, wsgi_app, handler=RequestHandler, fd=fd)
+        self.pool = ThreadPoolExecutor(max_workers=threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def preload():
+    """Load the shared read-only tables in the master so every worker inherits them."""
+    if get_airport_table() is None:
+        get_airport_data('MEM')  # Loads airportsdata instead
+
+    table = get_sun_cache().table
+    if table is not None:
+        table.offsets.max()  # Fault the memory-mapped pages in once, for all workers
+
+    app.jinja_env.get_template('index.html')
+
+
+def warm_worker():
+    """Run a one-leg conversion so polars and the pipeline are ready before the first request."""
+    logger = get_logger()
+    logger.disabled = True  # Keep the warmup conversion out of the logs
+    try:
+        convert_flights(io.BytesIO(WARMUP_FLIGHTS), io.BytesIO(), 'captain')
+    finally:
+        logger.disabled = False
+
+
+def run_worker(sock, host, port, threads):
+    """Serve requests on the shared socket until SIGTERM. Runs in a forked worker."""
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    signal.signal(signal.SIGINT, lambda signum, frame: sys.exit(0))
+    warm_worker()
+
+    server = PooledWSGIServer(host, port, app, threads, fd=sock.fileno())
+    try:
+        server.serve_forever()
+    finally:
+        server.pool.shutdown(wait=True)
+        server.server_close()
+        METRICS.flush()
+
+
+def serve(host, port, workers, threads):
+    """
+    Preload, fork the workers and supervise them.
+
+    Args:
+        host, port: Address to listen on
+        workers: Number of worker processes
+        threads: Request threads per worker
+    """
+    sock = socket.create_server((host, port), backlog=128)
+    METRICS.share(os.path.join(app.config['JOB_DIR'], 'metrics'))
+    preload()
+    gc.freeze()  # Keep the preloaded objects out of the workers' garbage collection, so their pages stay shared
+
+    children = set()
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            try:
+                run_worker(sock, host, port, threads)
+            finally:
+                os._exit(0)
+        children.add(pid)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+    print(f"Serving on http://{host}:{port} with {workers} workers x {threads} threads")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        if pid not in children:
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"Warning: Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            spawn()
+    sock.close()
+
+
+def parse_args():
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Run the Logbook Formatter web application with preforked workers.',
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter
+    )
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host to run the web server on')
+    parser.add_argument('--port', type=int, default=8000, help='Port to run the web server on')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='Request threads per worker')
+    parser.add_argument('--job-workers', type=int,
+                        help='Conversion processes per worker for /jobs (default: CPUs divided among the workers)')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        parser.error('serve.py needs fork(); use "python app.py" on this platform')
+    if args.workers < 1 or args.threads < 1:
+        parser.error('--workers and --threads must be at least 1')
+    return args
+
+
+def main():
+    args = parse_args()
+    if args.job_workers:
+        app.config['JOB_WORKERS'] = args.job_workers
+    elif app.config['JOB_WORKERS'] is None:
+        app.config['JOB_WORKERS'] = max(1, (os.cpu_count() or 1) // args.workers)
+    serve(args.host, args.port, args.workers, args.threads)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Tests for the web app's /convert and /metrics endpoints.
+
+Run with: python -m pytest
+"""
+import builtins
+import io
+import sqlite3
+import tempfile
+
+import polars as pl
+import pytest
+
+from app import app
+from logbook_core import EXPOSITION_CONTENT_TYPE
+
+FLIGHTS = (
+    b"FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING\n"
+    b"6159,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0\n"
+    b"6159,11/11/2024,B767,115,BKK,PEN,23:35,23:51,1:17,1:25,1.43,1.83,1\n"
+)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'JOB_DIR', str(tmp_path / 'jobs'))
+    return app.test_client()
+
+
+@pytest.fixture
+def no_disk_writes(monkeypatch):
+    """Fail on temporary files and SQLite databases (e.g. the result cache), and record files opened for writing."""
+    def refuse(*args, **kwargs):
+        raise AssertionError('/convert touched the disk')
+
+    for name in ('mkstemp', 'mkdtemp', 'NamedTemporaryFile', 'TemporaryFile', 'TemporaryDirectory'):
+        monkeypatch.setattr(tempfile, name, refuse)
+    monkeypatch.setattr(sqlite3, 'connect', refuse)
+
+    written = []
+    real_open = builtins.open
+
+    def recording_open(file, mode='r', *args, **kwargs):
+        if any(flag in mode for flag in 'wax+'):
+            written.append(file)
+        return real_open(file, mode, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', recording_open)
+    return written
+
+
+def _upload(**fields):
+    return dict({'flights_file': (io.BytesIO(FLIGHTS), 'flights.csv'), 'crew_position': 'captain'}, **fields)
+
+
+def test_convert_returns_logbook_without_disk_writes(client, tmp_path, no_disk_writes):
+    response = client.post('/convert', data=_upload())
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert 'attachment; filename=FAA_Logbook_' in response.headers['Content-Disposition']
+    logbook = pl.read_csv(io.BytesIO(response.data))
+    assert logbook['Route To'].to_list() == ['BKK', 'PEN']
+    assert no_disk_writes == []
+    assert not (tmp_path / 'jobs').exists()
+
+
+def test_convert_with_oe_and_other_format(client, no_disk_writes):
+    oe = b"FLIGHT,FLT_DT,ORG,DEST,SEAT\n6159,11NOV2024,CAN,BKK,FO\n"
+    response = client.post('/convert', data=_upload(oe_file=(io.BytesIO(oe), 'oe.csv'), crew_position='auto',
+                                                    output_format='logbook_aero'))
+
+    assert response.status_code == 200
+    assert 'filename=Logbook_Aero_' in response.headers['Content-Disposition']
+    logbook = pl.read_csv(io.BytesIO(response.data))
+    # The second leg matches the OE row on the flight number
+    assert logbook['CoPilot_Time'].to_list() == [2.6, 1.8]
+    assert no_disk_writes == []
+
+
+@pytest.mark.parametrize('fields, error', [
+    ({'flights_file': (io.BytesIO(FLIGHTS), 'flights.txt')}, 'Invalid file type'),
+    ({'crew_position': 'purser'}, 'Invalid crew position'),
+    ({'output_format': 'pdf'}, 'Unknown output format'),
+    ({'flights_file': (io.BytesIO(b"FLIGHT,DEPT_DATE\n1,11/11/2024\n"), 'flights.csv')}, 'missing required columns'),
+])
+def test_convert_rejects_bad_uploads(client, fields, error):
+    response = client.post('/convert', data=_upload(**fields))
+    assert response.status_code == 400
+    assert error in response.get_json()['error']
+
+
+def _samples(client):
+    """Samples of a /metrics scrape as {name with labels: value}."""
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == EXPOSITION_CONTENT_TYPE
+    lines = response.get_data(as_text=True).splitlines()
+    return dict(line.rsplit(' ', 1) for line in lines if not line.startswith('#'))
+
+
+def test_metrics_count_conversions(client):
+    before = _samples(client)
+    client.post('/convert', data=_upload())
+    after = _samples(client)
+
+    def delta(sample):
+        return float(after[sample]) - float(before.get(sample, 0))
+
+    assert delta('logbook_conversions_total{source="convert",status="done"}') == 1
+    assert delta('logbook_rows_processed_total{source="convert",result="valid"}') == 2
+    assert delta('logbook_http_requests_total{endpoint="convert",method="POST",status="200"}') == 1
+    assert delta('logbook_http_request_duration_seconds_count{endpoint="convert",method="POST"}') == 1
+    assert delta('logbook_upload_size_bytes_count{file="flights"}') == 1
+    assert delta('logbook_stage_duration_seconds_count{source="convert",stage="write"}') == 1
+    assert after['logbook_upload_size_bytes_bucket{file="flights",le="1024"}'] == \
+        after['logbook_upload_size_bytes_count{file="flights"}']
+    assert after['logbook_conversions_in_flight'] == '0'
+    assert after['logbook_jobs{status="queued"}'] == '0'
+    assert 0 <= float(after['logbook_sun_cache_hit_ratio']) <= 1
+
+
+def test_metrics_exposition_format(client):
+    text = client.get('/metrics').get_data(as_text=True)
+    assert text.endswith('\n')
+    assert '# HELP logbook_conversions_total Finished conversions by source and status\n' \
+           '# TYPE logbook_conversions_total counter\n' in text
+    assert '# TYPE logbook_http_request_duration_seconds histogram\n' in text
+    assert '# TYPE logbook_conversions_in_flight gauge\n' in text
@@ -0,0 +1,77 @@
+"""
+Tests for appending a download to an existing logbook (append_flights).
+
+Run with: python -m pytest
+"""
+import io
+
+import polars as pl
+import pytest
+
+from logbook_core import RunMetrics, append_flights, convert_flights
+
+FLIGHT_HEADER = "FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING\n"
+
+# Legs already in the logbook
+LOGGED_LEGS = [
+    "6159,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0",
+    "6159,11/11/2024,B767,115,BKK,PEN,23:35,23:51,1:17,1:25,1.43,1.83,1",
+]
+
+# A leg the logbook does not have yet
+NEW_LEG = "6160,11/12/2024,B767,115,PEN,CAN,3:00,3:10,6:00,6:10,2.83,3.17,1"
+
+
+def _flights(*legs):
+    return io.BytesIO((FLIGHT_HEADER + ''.join(leg + '\n' for leg in legs)).encode())
+
+
+@pytest.fixture(params=['faa', 'logbook_aero'])
+def logbook(request, tmp_path):
+    """A logbook of LOGGED_LEGS in each output format, as (path, format)."""
+    path = str(tmp_path / f'{request.param}.csv')
+    convert_flights(_flights(*LOGGED_LEGS), path, 'captain', output_format=request.param)
+    return path, request.param
+
+
+def test_append_adds_only_new_legs(logbook):
+    path, output_format = logbook
+    metrics = RunMetrics()
+
+    added, duplicates = append_flights(_flights(*LOGGED_LEGS, NEW_LEG), path, output_format=output_format,
+                                       metrics=metrics)
+
+    assert (added, duplicates) == (1, 2)
+    counts = metrics.summary()['counts']
+    assert counts['rows_read'] == 3
+    assert counts['rows_duplicate'] == 2
+    assert counts['rows_valid'] == 1
+    assert pl.read_csv(path, infer_schema_length=0).height == 3
+
+
+def test_append_matches_dates_in_another_format(logbook):
+    path, output_format = logbook
+    leg = LOGGED_LEGS[1].replace('11/11/2024', '2024-11-11')
+    assert append_flights(_flights(leg), path, output_format=output_format) == (0, 1)
+    assert pl.read_csv(path, infer_schema_length=0).height == 2
+
+
+def test_append_is_idempotent(logbook):
+    path, output_format = logbook
+    append_flights(_flights(NEW_LEG), path, output_format=output_format)
+    assert append_flights(_flights(*LOGGED_LEGS, NEW_LEG), path, output_format=output_format) == (0, 3)
+    assert pl.read_csv(path, infer_schema_length=0).height == 3
+
+
+def test_append_keys_on_flight_number(tmp_path):
+    # Same route and date under another flight number is another leg
+    path = str(tmp_path / 'faa.csv')
+    convert_flights(_flights(*LOGGED_LEGS), path, 'captain')
+    assert append_flights(_flights(LOGGED_LEGS[0].replace('6159', '6161', 1)), path) == (1, 0)
+    assert pl.read_csv(path, infer_schema_length=0)['Route From'].to_list() == ['CAN', 'BKK', 'CAN']
+
+
+def test_append_to_missing_logbook_writes_it(tmp_path):
+    path = str(tmp_path / 'new.csv')
+    assert append_flights(_flights(*LOGGED_LEGS), path) == (2, 0)
+    assert pl.read_csv(path, infer_schema_length=0).height == 2
@@ -0,0 +1,129 @@
+"""
+Tests for the background job queue: queued, done and downloaded, failed, and expired jobs.
+
+Jobs run in spawned worker processes, so these tests take a few seconds.
+
+Run with: python -m pytest
+"""
+import io
+import os
+import sqlite3
+import time
+
+import polars as pl
+import pytest
+
+from logbook_core import JobQueue
+from logbook_core.jobs import DB_NAME, STALE_JOB_SECONDS
+
+FLIGHTS = (
+    b"FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING\n"
+    b"6159,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0\n"
+    b"6159,11/11/2024,B767,115,BKK,PEN,23:35,23:51,1:17,1:25,1.43,1.83,1\n"
+)
+
+# Seconds to wait for a job to finish (includes starting a worker)
+JOB_TIMEOUT = 60
+
+
+def _wait(queue, job_id):
+    """Poll a job until it is done or failed."""
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in ('done', 'failed'):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"Job {job_id} did not finish within {JOB_TIMEOUT}s")
+
+
+def _set(job_dir, job_id, **fields):
+    conn = sqlite3.connect(os.path.join(job_dir, DB_NAME))
+    with conn:
+        conn.execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                     (*fields.values(), job_id))
+    conn.close()
+
+
+@pytest.fixture
+def queue(tmp_path):
+    finished = []
+    queue = JobQueue(str(tmp_path), workers=1, on_finished=finished.append)
+    queue.finished = finished
+    yield queue
+    queue.shutdown()
+
+
+def test_job_runs_and_downloads(queue):
+    job_id = queue.submit(io.BytesIO(FLIGHTS), crew_position='first_officer', output_format='logbook_aero')
+    assert queue.get(job_id)['status'] in ('queued', 'running')
+    assert queue.output_path(job_id) is None
+
+    job = _wait(queue, job_id)
+    assert job['status'] == 'done'
+    assert job['rows'] == 2
+    assert job['error'] is None
+    assert job['crew_position'] == 'first_officer'
+    assert job['started'] is not None and job['finished'] is not None
+
+    output = pl.read_csv(queue.output_path(job_id))
+    assert output.height == 2
+    assert 'Departure_Airfield' in output.columns
+    assert queue.status_counts()['done'] == 1
+    assert [result['id'] for result in queue.finished] == [job_id]
+
+
+def test_queued_jobs_run_after_restart(tmp_path, monkeypatch):
+    with monkeypatch.context() as patch:
+        patch.setattr(JobQueue, '_dispatch', lambda self, job_id: None)
+        stopped = JobQueue(str(tmp_path), workers=1)
+        job_id = stopped.submit(io.BytesIO(FLIGHTS))
+        assert stopped.get(job_id)['status'] == 'queued'
+        assert stopped.status_counts() == {'queued': 1, 'running': 0, 'done': 0, 'failed': 0}
+
+    restarted = JobQueue(str(tmp_path), workers=1)
+    try:
+        assert _wait(restarted, job_id)['status'] == 'done'
+    finally:
+        restarted.shutdown()
+
+
+def test_failed_job_keeps_its_error(queue):
+    no_off = FLIGHTS.replace(b',OFF', b'', 1)
+    job_id = queue.submit(io.BytesIO(no_off))
+
+    job = _wait(queue, job_id)
+    assert job['status'] == 'failed'
+    assert 'missing required columns: OFF' in job['error']
+    assert job['rows'] is None
+    assert queue.output_path(job_id) is None
+
+
+def test_cleanup_expires_old_jobs(queue):
+    job_id = queue.submit(io.BytesIO(FLIGHTS))
+    _wait(queue, job_id)
+    assert os.path.isdir(os.path.join(queue.job_dir, job_id))
+
+    queue.cleanup()
+    assert queue.get(job_id) is not None
+
+    _set(queue.job_dir, job_id, finished=time.time() - 2 * 24 * 60 * 60)
+    queue.cleanup()
+    assert queue.get(job_id) is None
+    assert not os.path.exists(os.path.join(queue.job_dir, job_id))
+
+
+def test_cleanup_fails_stale_running_jobs(queue):
+    job_id = queue.submit(io.BytesIO(FLIGHTS))
+    _wait(queue, job_id)
+    _set(queue.job_dir, job_id, status='running', finished=None, started=time.time() - STALE_JOB_SECONDS - 1)
+
+    queue.cleanup()
+    job = queue.get(job_id)
+    assert job['status'] == 'failed'
+    assert 'interrupted' in job['error']
+
+
+def test_unknown_job(queue):
+    assert queue.get('no-such-job') is None
+    assert queue.output_path('no-such-job') is None
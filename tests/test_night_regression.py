@@ -0,0 +1,88 @@
+"""
+Regression tests for sunrise/sunset and night time against reference values.
+
+Sunrise and sunset references come from astral 3.2 (the library the
+converters used before the sun table), for the airport coordinates in
+airportsdata. Night time references are the engine's own results for a few
+known legs, pinned so a change to the solar model, the route geometry or the
+night rules shows up here; analytic mode is also checked against sampling
+every second.
+
+Run with: python -m pytest
+"""
+import io
+from datetime import datetime, timezone
+
+import pytest
+
+from logbook_core import enrich_flights, estimate_night_time_batch, get_airport_data, get_sunrise_sunset, load_flights
+
+# Sunrise/sunset may differ from astral by this many seconds (the NOAA
+# equations in solar are evaluated once per day; astral iterates on the
+# sun's position at the event itself)
+SUN_TOLERANCE_SECONDS = 60
+
+# (airport, date, sunrise UTC, sunset UTC) computed with astral 3.2
+SUN_REFERENCES = [
+    ('MEM', '2024-06-21', '2024-06-21T10:46:35', '2024-06-22T01:17:09'),
+    ('ANC', '2024-12-21', '2024-12-21T19:15:07', '2024-12-22T00:41:55'),  # Shortest day, high latitude
+    ('SYD', '2024-01-15', '2024-01-14T18:59:11', '2024-01-15T09:09:12'),  # Southern summer, sunrise on the previous UTC day
+    ('HKG', '2024-03-20', '2024-03-19T22:28:30', '2024-03-20T10:35:15'),
+    ('LAX', '2024-11-03', '2024-11-03T14:15:40', '2024-11-04T00:58:13'),  # DST change day
+]
+
+FLIGHT_HEADER = "FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING\n"
+
+# Legs with their night hours in sampled and analytic mode
+NIGHT_REFERENCES = [
+    ("1,11/03/2024,B777,801,LAX,SYD,6:20,6:30,21:30,21:40,15.0,15.33,1", 11.17, 11.02),   # Crosses the date line
+    ("2,12/20/2024,B777,802,HKG,ANC,13:10,13:20,21:50,22:00,8.5,8.83,1", 7.5, 7.44),      # Crosses the date line
+    ("3,01/15/2024,B777,803,CDG,ANC,10:00,10:15,19:45,19:55,9.5,9.92,1", 6.0, 5.99),      # Polar, 81N in polar night
+    ("4,06/21/2024,B777,804,DXB,LAX,0:20,0:35,16:35,16:45,16.0,16.42,1", 0.83, 0.73),     # Polar, 85N in midnight sun
+    ("5,11/11/2024,B767,115,MEM,IND,6:00,6:10,7:10,7:20,1.0,1.33,1", 1.0, 1.0),           # Destination rule, night
+    ("6,11/11/2024,B767,116,MEM,IND,17:00,17:10,18:10,18:20,1.0,1.33,1", 0.0, 0.0),       # Destination rule, day
+    ("7,11/11/2024,B767,115,BKK,PEN,23:35,23:51,1:17,1:25,1.43,1.83,1", 0.0, 0.0),      # Past UTC midnight, 06:51-08:17 local
+]
+
+# Long-haul legs (origin, destination, OFF UTC, flight hours) for the analytic check
+LONG_HAUL_LEGS = [
+    ('LAX', 'SYD', '2024-11-03T06:30', 15.0),
+    ('HKG', 'ANC', '2024-12-20T13:20', 8.5),
+    ('CDG', 'ANC', '2024-01-15T10:15', 9.5),
+    ('DXB', 'LAX', '2024-06-21T00:35', 16.0),
+]
+
+# Analytic night time may differ from 1-second sampling by this many hours
+# (1/3600 h is the sampling step itself)
+ANALYTIC_TOLERANCE_HOURS = 0.0005
+
+
+def _utc(value):
+    return datetime.fromisoformat(value).replace(tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('airport, day, sunrise, sunset', SUN_REFERENCES)
+def test_sunrise_sunset_matches_astral(airport, day, sunrise, sunset):
+    got_sunrise, got_sunset = get_sunrise_sunset(airport, datetime.strptime(day, '%Y-%m-%d'))
+    assert abs((got_sunrise - _utc(sunrise)).total_seconds()) <= SUN_TOLERANCE_SECONDS
+    assert abs((got_sunset - _utc(sunset)).total_seconds()) <= SUN_TOLERANCE_SECONDS
+
+
+@pytest.mark.parametrize('night_mode, column', [('sampled', 1), ('analytic', 2)])
+def test_night_time_of_known_legs(night_mode, column):
+    csv = FLIGHT_HEADER + ''.join(leg[0] + '\n' for leg in NIGHT_REFERENCES)
+    night = enrich_flights(load_flights(io.BytesIO(csv.encode())), night_mode=night_mode)['Night Time'].to_list()
+    assert night == pytest.approx([leg[column] for leg in NIGHT_REFERENCES], abs=0.01)
+
+
+@pytest.mark.parametrize('origin, destination, off, hours', LONG_HAUL_LEGS)
+def test_analytic_night_matches_one_second_sampling(origin, destination, off, hours):
+    _, _, org_lat, org_lon = get_airport_data(origin)
+    _, _, dst_lat, dst_lon = get_airport_data(destination)
+    off_s = _utc(off).timestamp()
+    leg = dict(off_s=[off_s], on_s=[off_s + hours * 3600], flt_hrs=[hours], org_lat=[org_lat], org_lon=[org_lon],
+               dst_lat=[dst_lat], dst_lon=[dst_lon], tz_diff=[24.0], date_s=[off_s - off_s % 86400], decimals=6)
+
+    sampled = estimate_night_time_batch(**leg, increment_minutes=1 / 60)[0]
+    analytic = estimate_night_time_batch(**leg, mode='analytic')[0]
+    assert analytic == pytest.approx(sampled, abs=ANALYTIC_TOLERANCE_HOURS)
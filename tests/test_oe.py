@@ -0,0 +1,67 @@
+"""
+Tests for matching Operating Experience (OE) rows to flights.
+
+Run with: python -m pytest
+"""
+import io
+
+import polars as pl
+import pytest
+
+from logbook_core import convert_flights, join_oe, load_flights, load_oe_data, load_oe_frame
+
+OE_CSV = b"""FLIGHT,FLT_DT,ORG,DEST,SEAT,ROLE,PIC_OE,SIC_OE
+6159,11NOV2024,CAN,BKK,FO,SIC,0.00,2.65
+6159,11NOV2024,BKK,PEN,CA,PIC,1.83,0.00
+42,12NOV2024,XXX,YYY,FO,SIC,0.00,3.17
+"""
+
+FLIGHTS_CSV = b"""FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING
+7777,11/13/2024,B767,115,CAN,PEN,3:00,3:10,6:00,6:10,2.83,3.17,1
+6159,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0
+6159,11/11/2024,B767,115,BKK,PEN,23:35,23:51,1:17,1:25,1.43,1.83,1
+0042,11/12/2024,B767,115,PEN,CAN,3:00,3:10,6:00,6:10,2.83,3.17,1
+6159,11/14/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0
+"""
+
+# (OE Role, OE PIC, OE SIC) expected per flight row, in file order
+EXPECTED_OE = [
+    (None, None, None),                # No OE row for the flight number
+    ('first_officer', 0.0, 2.65),      # Full key
+    ('captain', 1.83, 0.0),            # Full key
+    ('first_officer', 0.0, 3.17),      # Flight number only (OE route is wrong), zero-padded
+    ('captain', 1.83, 0.0),            # Flight number only (other date): last OE row of 6159
+]
+
+
+def _joined(oe_data):
+    flights = load_flights(io.BytesIO(FLIGHTS_CSV)).lazy()
+    return join_oe(flights, oe_data).collect()
+
+
+@pytest.mark.parametrize('loader', [load_oe_frame, load_oe_data])
+def test_oe_rows_match_by_key_then_flight_number(loader):
+    joined = _joined(loader(io.BytesIO(OE_CSV)))
+    assert joined.select('OE Role', 'OE PIC', 'OE SIC').rows() == EXPECTED_OE
+    # Rows keep their order
+    assert joined['DEPT_DATE'].to_list() == load_flights(io.BytesIO(FLIGHTS_CSV))['DEPT_DATE'].to_list()
+
+
+def test_last_oe_row_wins():
+    oe = OE_CSV + b"6159,11NOV2024,CAN,BKK,CA,PIC,2.65,0.00\n"
+    joined = _joined(load_oe_frame(io.BytesIO(oe)))
+    assert joined.row(1, named=True)['OE Role'] == 'captain'
+    assert joined.row(4, named=True)['OE PIC'] == 2.65
+
+
+def test_without_oe_data_columns_are_null():
+    joined = _joined(None)
+    assert joined.select('OE Role', 'OE PIC', 'OE SIC').rows() == [(None, None, None)] * 5
+    assert joined.schema['OE PIC'] == pl.Float64
+
+
+def test_auto_position_follows_oe():
+    output = io.BytesIO()
+    convert_flights(io.BytesIO(FLIGHTS_CSV), output, 'auto', load_oe_frame(io.BytesIO(OE_CSV)))
+    logbook = pl.read_csv(io.BytesIO(output.getvalue()))
+    assert logbook.select('PIC', 'SIC').rows() == [(3.2, 0.0), (0.0, 2.6), (1.8, 0.0), (0.0, 3.2), (1.8, 0.0)]
@@ -0,0 +1,104 @@
+"""
+Tests for the Prometheus metrics registry, alone and shared between processes.
+
+Run with: python -m pytest
+"""
+import os
+
+import pytest
+
+from logbook_core import MetricsRegistry
+
+needs_fork = pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork()')
+
+
+def _run_child(work):
+    """Run work in a forked child and wait for it to exit."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            work()
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+
+def test_render_exposition_format():
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', 'Requests', ['endpoint'])
+    latency = registry.histogram('app_latency_seconds', 'Latency', buckets=(0.1, 1))
+    registry.gauge('app_queue', 'Queued "jobs"\nby status', ['status'], collect=lambda: {('queued',): 3})
+    requests.inc(endpoint='index')
+    requests.inc(2, endpoint='a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    assert registry.render() == (
+        '# HELP app_requests_total Requests\n'
+        '# TYPE app_requests_total counter\n'
+        'app_requests_total{endpoint="a\\"b"} 2\n'
+        'app_requests_total{endpoint="index"} 1\n'
+        '# HELP app_latency_seconds Latency\n'
+        '# TYPE app_latency_seconds histogram\n'
+        'app_latency_seconds_bucket{le="0.1"} 1\n'
+        'app_latency_seconds_bucket{le="1"} 2\n'
+        'app_latency_seconds_bucket{le="+Inf"} 2\n'
+        'app_latency_seconds_sum 0.55\n'
+        'app_latency_seconds_count 2\n'
+        '# HELP app_queue Queued "jobs"\nby status\n'
+        '# TYPE app_queue gauge\n'
+        'app_queue{status="queued"} 3\n'
+    )
+
+
+def test_labels_and_counters_are_checked():
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', 'Requests', ['endpoint'])
+    with pytest.raises(ValueError, match='takes labels endpoint'):
+        requests.inc(status=200)
+    with pytest.raises(ValueError, match='cannot decrease'):
+        requests.inc(-1, endpoint='index')
+    with pytest.raises(ValueError, match='already registered'):
+        registry.gauge('app_requests_total', 'Duplicate')
+
+
+@needs_fork
+def test_shared_registry_adds_up_processes(tmp_path):
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', 'Requests')
+    latency = registry.histogram('app_latency_seconds', 'Latency', buckets=(0.1, 1))
+    in_flight = registry.gauge('app_in_flight', 'In flight')
+    registry.gauge('app_jobs', 'Jobs', collect=lambda: {(): 5}, per_process=False)
+    registry.share(str(tmp_path))
+
+    def child():
+        requests.inc(2)
+        latency.observe(0.5)
+        in_flight.inc()  # Left behind by an exited process, so not counted
+        registry.flush()
+
+    _run_child(child)
+    requests.inc()
+    latency.observe(0.05)
+    in_flight.set(1)
+
+    text = registry.render()
+    assert 'app_requests_total 3\n' in text
+    assert 'app_latency_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'app_latency_seconds_bucket{le="1"} 2\n' in text
+    assert 'app_latency_seconds_count 2\n' in text
+    assert 'app_in_flight 1\n' in text
+    assert 'app_jobs 5\n' in text  # Read once, not added up
+    assert registry.values('app_requests_total') == {(): 3}
+
+
+@needs_fork
+def test_share_removes_snapshots_of_an_earlier_run(tmp_path):
+    registry = MetricsRegistry()
+    requests = registry.counter('app_requests_total', 'Requests')
+    registry.share(str(tmp_path))
+    _run_child(lambda: (requests.inc(5), registry.flush()))
+    assert registry.values('app_requests_total') == {(): 5}
+
+    registry.share(str(tmp_path))
+    assert registry.values('app_requests_total') == {}
@@ -0,0 +1,58 @@
+"""
+Tests for the per-leg result cache shared across runs.
+
+Run with: python -m pytest
+"""
+import io
+
+import pytest
+
+from logbook_core import ResultCache, RunMetrics, convert_flights
+from logbook_core import result_cache
+
+FLIGHTS = (
+    b"FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING\n"
+    b"6159,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0\n"
+    b"6159,11/11/2024,B767,115,BKK,PEN,23:35,23:51,1:17,1:25,1.43,1.83,1\n"
+    b"1,11/03/2024,B777,801,LAX,SYD,6:20,6:30,21:30,21:40,15.0,15.33,1\n"
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'))
+    yield cache
+    cache.close()
+
+
+def _convert(cache, night_mode='sampled'):
+    """Converted logbook and the result cache counts of one run."""
+    output, metrics = io.BytesIO(), RunMetrics()
+    convert_flights(io.BytesIO(FLIGHTS), output, 'captain', night_mode=night_mode, result_cache=cache,
+                    metrics=metrics)
+    counts = metrics.summary()['counts']
+    return output.getvalue(), (counts.get('result_cache_hits', 0), counts.get('result_cache_misses', 0))
+
+
+def test_second_run_is_served_from_cache(cache):
+    first, first_counts = _convert(cache)
+    second, second_counts = _convert(cache)
+
+    assert first_counts == (0, 3)
+    assert second_counts == (3, 0)
+    assert len(cache) == 3
+    assert second == first
+    assert first == _convert(None)[0]
+
+
+def test_engine_version_change_invalidates(cache, monkeypatch):
+    _convert(cache)
+    monkeypatch.setattr(result_cache, 'ENGINE_VERSION', result_cache.ENGINE_VERSION + '-next')
+
+    assert _convert(cache)[1] == (0, 3)
+    assert _convert(cache)[1] == (3, 0)
+
+
+def test_night_mode_is_part_of_the_key(cache):
+    _convert(cache, 'sampled')
+    assert _convert(cache, 'analytic')[1] == (0, 3)
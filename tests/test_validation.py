@@ -0,0 +1,88 @@
+"""
+Tests for flight row validation and the quarantine sidecar file.
+
+Run with: python -m pytest
+"""
+import io
+import json
+
+import polars as pl
+import pytest
+
+from logbook_core import QUARANTINE_REASON, VALIDATION_REASONS, convert_flights
+
+FLIGHT_HEADER = "FLIGHT,DEPT_DATE,EQUIP,TAIL,ORG,DEST,OUT,OFF,ON,IN,FLT_HRS,BLK_HRS,LANDING\n"
+
+VALID_LEG = "6159,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0"
+
+# One leg failing each check, with the reason codes it is quarantined with
+INVALID_LEGS = [
+    ("1,,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0", 'missing_field'),
+    ("2,13/45/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.23,2.65,0", 'bad_date'),
+    ("3,11/11/2024,B767,115,CAN,BKK,19:33,25:99,22:04,22:12,2.23,2.65,0", 'bad_time'),
+    ("4,11/11/2024,B767,115,CAN,ZZZ,19:33,19:50,22:04,22:12,2.23,2.65,0", 'unknown_airport'),
+    ("5,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,abc,2.65,0", 'bad_hours'),
+    ("6,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,2.9,2.65,0", 'flight_exceeds_block'),
+    ("7,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,5.0,6.0,0", 'time_mismatch'),
+    ("8,11/11/2024,B767,115,CAN,BKK,19:33,19:50,22:04,22:12,30,2.65,0", 'bad_hours;flight_exceeds_block;time_mismatch'),
+]
+
+
+def _flights(*legs, header=FLIGHT_HEADER):
+    return io.BytesIO((header + ''.join(leg + '\n' for leg in legs)).encode())
+
+
+def test_invalid_rows_are_quarantined_with_reasons(tmp_path):
+    output, quarantine = tmp_path / 'out.csv', tmp_path / 'quarantine.csv'
+    legs = [VALID_LEG] + [leg for leg, _ in INVALID_LEGS]
+
+    rows = convert_flights(_flights(*legs), str(output), 'captain', quarantine_file=str(quarantine))
+
+    assert rows == 1
+    assert pl.read_csv(output).height == 1
+    quarantined = pl.read_csv(quarantine, infer_schema_length=0)
+    assert quarantined['FLIGHT'].to_list() == [leg.split(',')[0] for leg, _ in INVALID_LEGS]
+    assert quarantined[QUARANTINE_REASON].to_list() == [reasons for _, reasons in INVALID_LEGS]
+    # Rows are written as they were read, to be fixed and converted again
+    assert quarantined['OFF'][2] == '25:99'
+
+
+def test_json_quarantine_report(tmp_path):
+    quarantine = tmp_path / 'quarantine.json'
+    convert_flights(_flights(VALID_LEG, *(leg for leg, _ in INVALID_LEGS)), str(tmp_path / 'out.csv'), 'captain',
+                    quarantine_file=str(quarantine))
+
+    report = json.loads(quarantine.read_text())
+    assert report['quarantined'] == len(INVALID_LEGS)
+    assert list(report['reasons']) == list(VALIDATION_REASONS)
+    assert report['reasons']['bad_hours'] == {'count': 2, 'description': VALIDATION_REASONS['bad_hours']}
+    assert report['reasons']['missing_field']['count'] == 1
+    assert [flight['FLIGHT'] for flight in report['flights']] == [leg.split(',')[0] for leg, _ in INVALID_LEGS]
+
+
+def test_quarantine_file_removed_when_all_rows_valid(tmp_path):
+    quarantine = tmp_path / 'quarantine.csv'
+    quarantine.write_text('left by an earlier run\n')
+    assert convert_flights(_flights(VALID_LEG), str(tmp_path / 'out.csv'), 'captain',
+                           quarantine_file=str(quarantine)) == 1
+    assert not quarantine.exists()
+
+
+def test_missing_required_column_is_rejected(tmp_path):
+    header = FLIGHT_HEADER.replace(',OFF', '')
+    leg = VALID_LEG.replace(',19:50', '', 1)
+    with pytest.raises(ValueError, match='missing required columns: OFF'):
+        convert_flights(_flights(leg, header=header), str(tmp_path / 'out.csv'), 'captain')
+
+
+def test_missing_optional_columns_count_as_zero(tmp_path):
+    header = "FLIGHT,DEPT_DATE,EQUIP,ORG,DEST,OUT,OFF,ON,IN\n"
+    leg = "6159,11/11/2024,B767,BKK,PEN,23:35,23:51,1:17,1:25"
+    output, quarantine = tmp_path / 'out.csv', tmp_path / 'quarantine.csv'
+
+    assert convert_flights(_flights(leg, header=header), str(output), 'captain', quarantine_file=str(quarantine)) == 1
+
+    logbook = pl.read_csv(output)
+    assert logbook['Duration'].to_list() == [0.0]
+    assert logbook['Day Landings'].to_list() == [0]
+    assert not quarantine.exists()